@@ -0,0 +1 @@
+"""Shared tools for the deterministic and stochastic models."""
@@ -0,0 +1,188 @@
+"""Typed asset data of data/input/assets, read and validated once per process.
+
+The assets of main_d and model_s (Chp, Boiler, HeatStorage, ElectricalGrid,
+HeatGrid) and common.plant used to read their CSV with pandas in every
+constructor and looked up single values with .loc inside the constraint rules,
+i.e. for every time step, scenario and day. The specs here are read once per
+file (again only if the file changes), validated and hold every number the
+rules need as plain floats:
+
+    spec = unit_spec(path_in + 'assets/chp_operation_1.csv')
+    spec.heat_min, spec.heat_max               # breakpoints 1 and 3
+    slope, intercept = spec.segment('gas', 0)  # region 1 (breakpoints 1 to 2)
+
+All models of a process share the same (immutable) spec objects. Only the
+standard library is used, the module is cheap to import.
+"""
+import csv
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+# Größen der Betriebskennlinien, die über die Wärmeleistung linear interpoliert werden
+CURVE_QUANTITIES = ['gas', 'power', 'eta_th', 'eta_el']
+BREAKPOINTS = ['1', '2', '3']
+
+
+@dataclass(frozen=True)
+class UnitSpec:
+    """Operating curve of a CHP or boiler: breakpoints 1 (min), 2 and 3 (max) and the lines between them."""
+
+    file: str
+    kind: str
+    heat: tuple
+    eta_th: tuple
+    eta_el: tuple
+    gas: tuple
+    power: tuple
+    segments: dict
+
+    @property
+    def heat_min(self):
+        return self.heat[0]
+
+    @property
+    def heat_max(self):
+        return self.heat[2]
+
+    def segment(self, quantity, region):
+        """(slope, intercept) of a quantity over the heat in region 0 (breakpoints 1-2) or 1 (breakpoints 2-3)."""
+        return self.segments[quantity][region]
+
+
+@dataclass(frozen=True)
+class StorageSpec:
+    """Limits of a heat storage (heat_storage.csv)."""
+
+    file: str
+    min_heat: float
+    max_heat: float
+    min_content: float
+    max_content: float
+
+    @property
+    def initial_soc(self):
+        return self.max_content * 0.8
+
+
+@dataclass(frozen=True)
+class LimitSpec:
+    """Limits of a grid connection (power_grid.csv, heat_grid.csv, ngas_grid.csv)."""
+
+    file: str
+    quantity: str
+    min: float
+    max: float
+
+
+def line(x1, x2, y1, y2):
+    """(slope, intercept) of the line through (x1, y1) and (x2, y2)."""
+    # Gleiche Rechenschritte wie linear_function der Assets (identische Koeffizienten)
+    a = (y2 - y1) / (x2 - x1)
+    b = y1 - a * x1
+    return a, b
+
+
+def _read(file):
+    """Rows of an asset CSV as {index: {column: float}}."""
+    with open(file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [column.strip() for column in next(reader, [])]
+        rows = {}
+        for row in reader:
+            if not row or not ''.join(row).strip():
+                continue
+            if len(row) != len(header):
+                raise ValueError(f"{file}: row {row} does not match the columns {header}")
+            try:
+                values = {column: float(value) for column, value in zip(header[1:], row[1:])}
+            except ValueError:
+                raise ValueError(f"{file}: row {row} is not numeric") from None
+            if not all(math.isfinite(value) for value in values.values()):
+                raise ValueError(f"{file}: row {row} is not finite")
+            rows[row[0].strip()] = values
+    return header[1:], rows
+
+
+def _require(file, columns, rows, required_columns, required_rows):
+    missing = [column for column in required_columns if column not in columns] + \
+              [row for row in required_rows if row not in rows]
+    if missing:
+        raise ValueError(f"{file}: missing {', '.join(missing)}")
+
+
+def _stamp(file):
+    """Absolute path and modification time of a file (cache key of the specs)."""
+    file = os.path.abspath(file)
+    return file, os.stat(file).st_mtime_ns
+
+
+@lru_cache(maxsize=None)
+def _unit_spec(file, mtime):
+    columns, rows = _read(file)
+    _require(file, columns, rows, ['heat', 'eta_th'], BREAKPOINTS)
+
+    heat = tuple(rows[i]['heat'] for i in BREAKPOINTS)
+    eta_th = tuple(rows[i]['eta_th'] for i in BREAKPOINTS)
+    if not heat[0] < heat[1] < heat[2]:
+        raise ValueError(f"{file}: heat of the breakpoints must increase, got {heat}")
+    if min(heat) < 0 or min(eta_th) <= 0:
+        raise ValueError(f"{file}: heat must be non-negative and eta_th positive")
+
+    # Ohne Spalte eta_el (Kessel) keine Stromerzeugung
+    kind = 'chp' if 'eta_el' in columns else 'boiler'
+    eta_el = tuple(rows[i]['eta_el'] for i in BREAKPOINTS) if kind == 'chp' else (0.0, 0.0, 0.0)
+    if min(eta_el) < 0:
+        raise ValueError(f"{file}: eta_el must be non-negative")
+    gas = tuple(h / e for h, e in zip(heat, eta_th))
+    power = tuple(e * g for e, g in zip(eta_el, gas))
+
+    curves = {'gas': gas, 'power': power, 'eta_th': eta_th, 'eta_el': eta_el}
+    segments = {
+        quantity: tuple(line(heat[k], heat[k + 1], values[k], values[k + 1]) for k in range(2))
+        for quantity, values in curves.items()
+    }
+    return UnitSpec(file, kind, heat, eta_th, eta_el, gas, power, segments)
+
+
+@lru_cache(maxsize=None)
+def _storage_spec(file, mtime):
+    columns, rows = _read(file)
+    _require(file, columns, rows, ['heat', 'content'], ['min', 'max'])
+    spec = StorageSpec(file, rows['min']['heat'], rows['max']['heat'], rows['min']['content'], rows['max']['content'])
+    if not 0 <= spec.min_content <= spec.max_content or spec.max_heat < 0:
+        raise ValueError(f"{file}: storage limits must satisfy 0 <= min <= max")
+    return spec
+
+
+@lru_cache(maxsize=None)
+def _limit_spec(file, mtime, quantity):
+    columns, rows = _read(file)
+    _require(file, columns, rows, [quantity], ['min', 'max'])
+    spec = LimitSpec(file, quantity, rows['min'][quantity], rows['max'][quantity])
+    if spec.min > spec.max:
+        raise ValueError(f"{file}: min {quantity} is larger than max")
+    return spec
+
+
+def unit_spec(file):
+    """UnitSpec of a CHP or boiler operation CSV."""
+    return _unit_spec(*_stamp(file))
+
+
+def storage_spec(file):
+    """StorageSpec of heat_storage.csv."""
+    return _storage_spec(*_stamp(file))
+
+
+def limit_spec(file, quantity):
+    """LimitSpec of a grid CSV for the column quantity ('power', 'heat', 'gas')."""
+    return _limit_spec(*_stamp(file), quantity)
+
+
+def clear():
+    """Forget all read specs (files are read again on the next access)."""
+    for cached in (_unit_spec, _storage_spec, _limit_spec):
+        cached.cache_clear()
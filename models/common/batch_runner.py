@@ -0,0 +1,172 @@
+"""Pipelined batch runs: loading inputs, solving and writing results of several days overlap.
+
+The run loops of main_d and main_s load, build, solve and write one day after
+the other. With run_batch every day goes through three stages:
+
+    prepare  load the inputs and build the model (background threads, `prefetch` days ahead)
+    solve    solve the prepared model (calling thread, one day at a time)
+    write    extract and write the results (one writer thread, at most `max_pending_writes` queued)
+
+While day i is solved, day i+1 is built and day i-1 written. The solver runs
+in native code or as its own process, so the Python work of the other stages
+uses the time it waits. The writer keeps the order of the days; outputs of a
+day that failed in a later stage are still written.
+
+prepare returns None for days without a solve (e.g. restored from the result
+cache). With prefetch=0 and background_writes=False all stages run one after
+another in the calling thread, exactly like the previous loops.
+
+Every batch is appended to batch_timings.csv in the output directory (stage
+seconds and wall-clock seconds); the report compares the seconds per day of
+pipelined and sequential batches of the same name:
+
+    python -m common.batch_runner report
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from common.config import data_path
+
+
+STAGES = ['prepare', 'solve', 'write']
+TIMINGS_COLUMNS = ['created', 'name', 'mode', 'days', 'skipped', *STAGES, 'wall']
+
+
+def timings_file(config=None):
+    """batch_timings.csv in the output directory of the data."""
+    return os.path.join(data_path(config), 'output', 'batch_timings.csv')
+
+
+class BatchStats:
+    """Seconds per stage (summed over the days) and wall-clock seconds of a batch."""
+
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.days = 0
+        self.skipped = 0
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.wall = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] += seconds
+
+    @property
+    def gain(self):
+        """Sum of the stage seconds divided by the wall-clock seconds (1.0 without overlap)."""
+        return sum(self.seconds.values()) / self.wall if self.wall else 1.0
+
+    def summary(self):
+        stages = ', '.join(f'{stage} {seconds:.1f} s' for stage, seconds in self.seconds.items())
+        return (f'{self.name} ({self.mode}): {self.days} days ({self.skipped} skipped) in {self.wall:.1f} s, '
+                f'stages {stages}, overlap gain {self.gain:.2f}x')
+
+    def save(self, file=None):
+        """Append the batch to the timings file."""
+        file = file or timings_file()
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        write_header = not os.path.exists(file)
+        with open(file, 'a') as f:
+            if write_header:
+                f.write(','.join(TIMINGS_COLUMNS) + '\n')
+            f.write(f"{datetime.now().isoformat(timespec='seconds')},{self.name},{self.mode},{self.days},{self.skipped},"
+                    + ','.join(f'{self.seconds[stage]:.3f}' for stage in STAGES) + f',{self.wall:.3f}\n')
+
+
+def run_batch(items, prepare, solve, write, prefetch=1, background_writes=True, max_pending_writes=2, name='batch',
+              save_timings=True):
+    """Run prepare, solve and write for all items with overlapping stages, returns the BatchStats.
+
+    prepare(item) -> job or None, solve(job) -> result, write(result). The
+    first exception of a stage is raised after the writes already queued have
+    finished.
+    """
+    items = list(items)
+    stats = BatchStats(name, 'pipelined' if prefetch or background_writes else 'sequential')
+
+    def timed(stage, function, argument):
+        stage_start = time.perf_counter()
+        try:
+            return function(argument)
+        finally:
+            stats.add(stage, time.perf_counter() - stage_start)
+
+    preparer = ThreadPoolExecutor(prefetch, thread_name_prefix='prepare') if prefetch else None
+    writer = ThreadPoolExecutor(1, thread_name_prefix='write') if background_writes else None
+    prepared, pending_writes = deque(), deque()
+    start = time.perf_counter()
+    try:
+        if preparer is not None:
+            prepared.extend(preparer.submit(timed, 'prepare', prepare, item) for item in items[:prefetch])
+
+        for i, item in enumerate(items):
+            if preparer is None:
+                job = timed('prepare', prepare, item)
+            else:
+                # Nächsten Tag nachschieben, bevor auf den aktuellen gewartet wird
+                if i + prefetch < len(items):
+                    prepared.append(preparer.submit(timed, 'prepare', prepare, items[i + prefetch]))
+                job = prepared.popleft().result()
+
+            stats.days += 1
+            if job is None:
+                stats.skipped += 1
+                continue
+
+            result = timed('solve', solve, job)
+
+            if writer is None:
+                timed('write', write, result)
+            else:
+                pending_writes.append(writer.submit(timed, 'write', write, result))
+                # Begrenzte Warteschlange: gelöste Modelle bleiben nicht unbegrenzt im Speicher
+                while len(pending_writes) > max_pending_writes:
+                    pending_writes.popleft().result()
+
+        while pending_writes:
+            pending_writes.popleft().result()
+    finally:
+        if preparer is not None:
+            preparer.shutdown(wait=True, cancel_futures=True)
+        if writer is not None:
+            writer.shutdown(wait=True)
+        stats.wall = time.perf_counter() - start
+
+    print(f'\n### {stats.summary()} ###')
+    if save_timings:
+        stats.save()
+    return stats
+
+
+def report(file=None):
+    """Mean seconds per solved day of the pipelined and sequential batches per name, and the speedup."""
+    file = file or timings_file()
+    if not os.path.exists(file):
+        return pd.DataFrame()
+    timings = pd.read_csv(file)
+    timings = timings[timings['days'] > timings['skipped']]
+    solved = timings['days'] - timings['skipped']
+    per_day = (timings['wall'] / solved).groupby([timings['name'], timings['mode']]).mean().unstack()
+    per_day = per_day.reindex(columns=['sequential', 'pipelined'])
+    per_day.columns = [f'{mode}_seconds_per_day' for mode in per_day.columns]
+    per_day['speedup'] = per_day['sequential_seconds_per_day'] / per_day['pipelined_seconds_per_day']
+    per_day['overlap_gain'] = (timings[STAGES].sum(axis=1) / timings['wall']).groupby(
+        [timings['name'], timings['mode']]).mean().unstack().get('pipelined')
+    return per_day
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if command == 'report':
+        print(report().to_string())
+    else:
+        print("Usage: python -m common.batch_runner report")
@@ -0,0 +1,343 @@
+"""Command line of the models: list the days, show the status, run a case for a range of dates.
+
+Instead of editing the options under `if __name__ == "__main__":` of main_d.py
+and main_s.py and starting them in their directories, a run is
+
+    python spma.py run --model stochastic --dates 2023-03-16..2023-07-10 --case special
+    python spma.py run --model deterministic --case actual --dates 20230316 20230622
+    python spma.py list [--model stochastic]
+    python spma.py status
+
+(spma.py in the models directory, from any working directory; also
+`python -m common.cli` from the models directory).
+
+Heavy modules are imported only by the subcommand that needs them: list and
+status use the standard library only. run first computes the result cache
+key of every day (common.run_keys) and restores the unchanged days; NumPy is
+imported for the weighted heat demand, Pyomo, mpisppy and the model module
+only if a day is left to solve.
+
+Cases: deterministic weighted (default), forecast, scenarios (wait-and-see),
+actual; stochastic base (default), special (EXTENSION_COST special case),
+decision-rule. Dates are YYYY-MM-DD or YYYYMMDD, single or as an inclusive
+range A..B (several separated by spaces or commas).
+"""
+import argparse
+import csv
+import glob
+import importlib
+import json
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+from common import run_keys
+from common.config import BASE_PATH, data_path, load_config, resolve_path
+from common.demand_files import FILE_PATTERNS, extract_scenario_info, load_heat_demand, load_heat_demand_scenarios
+from common.result_cache import ResultCache
+from common.run_config import SPECIAL_CASE, RunConfig
+
+
+MODELS_PATH = os.path.normpath(os.path.join(BASE_PATH, '..'))
+MODULES = {'deterministic': 'main_d', 'stochastic': 'main_s'}
+CASES = {
+    'deterministic': ['weighted', 'forecast', 'scenarios', 'actual'],
+    'stochastic': ['base', 'special', 'decision-rule'],
+}
+
+# Zielfunktionswerte je Fall (Modell, Pfad der config.json, Dateiname), Kennzeichen eines fertigen Laufs
+RESULT_FILES = {
+    'weighted': ('deterministic', 'objectives_path', 'd_weighted_{key}_obj.csv'),
+    'forecast': ('deterministic', 'objectives_path', 'd_{key}_obj.csv'),
+    'scenarios': ('deterministic', 'scenarios_path', 'd_scenarios_{key}_obj.csv'),
+    'actual': ('deterministic', 'actual_path', 'd_actual_{key}_obj.csv'),
+    'base': ('stochastic', 'objectives_path', 's_{key}_obj.csv'),
+    'special': ('stochastic', 'objectives_path', 's_{key}{special_case}_obj.csv'),
+    'decision-rule': ('stochastic', 'objectives_path', 's_{key}_DecisionRule_obj.csv'),
+}
+
+# Eingangsdateien, die ein Tag je Fall braucht
+REQUIRED_INPUTS = {
+    'weighted': ['forecast', 'scenarios'],
+    'forecast': ['forecast'],
+    'scenarios': ['scenarios'],
+    'actual': ['actual'],
+    'base': ['forecast', 'scenarios'],
+    'special': ['forecast', 'scenarios'],
+    'decision-rule': ['forecast', 'scenarios'],
+}
+
+# Wie common.batch_runner.timings_file und common.pipeline.default_state_file, ohne deren Importe
+BATCH_TIMINGS = os.path.join('output', 'batch_timings.csv')
+PIPELINE_STATE = os.path.join('output', 'pipeline', 'state.json')
+
+
+def parse_dates(values):
+    """Start dates (YYYYMMDD) of date arguments such as 2023-03-16, 20230316 or 2023-03-16..2023-07-10."""
+    if not values:
+        return None
+    dates = []
+    for value in ','.join(values).split(','):
+        value = value.strip()
+        if not value:
+            continue
+        first, _, last = value.partition('..')
+        start = _parse_date(first)
+        end = _parse_date(last) if last else start
+        if end < start:
+            raise argparse.ArgumentTypeError(f'empty date range {value}')
+        dates += [(start + timedelta(days=i)).strftime('%Y%m%d') for i in range((end - start).days + 1)]
+    return sorted(set(dates))
+
+
+def _parse_date(value):
+    digits = value.replace('-', '')
+    if len(digits) != 8 or not digits.isdigit():
+        raise argparse.ArgumentTypeError(f'invalid date {value} (YYYY-MM-DD or YYYYMMDD)')
+    try:
+        return date(int(digits[:4]), int(digits[4:6]), int(digits[6:]))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f'invalid date {value} ({e})')
+
+
+def inventory(config=None):
+    """Input files per (start date, end date, period): {kind: file} with kind forecast, scenarios, actual, weighted."""
+    config = config or load_config()
+    demands_path = resolve_path(config, 'deterministic', 'input_path') + 'demands'
+    files = glob.glob(os.path.join(demands_path, '*.json')) + \
+        glob.glob(os.path.join(demands_path, 'weighted_heat_demand', '*.json'))
+
+    days = {}
+    for file in files:
+        for kind, pattern in FILE_PATTERNS:
+            if re.match(pattern, os.path.basename(file)):
+                days.setdefault(extract_scenario_info(file), {})[kind] = file
+                break
+    return dict(sorted(days.items()))
+
+
+def result_file(case, key, config, special_case):
+    """Objective file of a finished run of the case ({start}_to_{end}_{period})."""
+    model, path_key, name = RESULT_FILES[case]
+    return resolve_path(config, model, path_key) + name.format(key=key, special_case=special_case)
+
+
+def days_of_case(case, dates=None, config=None, days=None):
+    """(start date, end date, period) and input files of all days the case can run on (optionally only the given dates)."""
+    days = inventory(config) if days is None else days
+    return [(info, files) for info, files in days.items()
+            if all(kind in files for kind in REQUIRED_INPUTS[case]) and (dates is None or info[0] in dates)]
+
+
+def command_list(args):
+    config = load_config()
+    days = inventory(config)
+    cases = [case for model in ([args.model] if args.model else CASES) for case in CASES[model]]
+    print(f"{'start date':<10} {'period':<6} {'inputs':<8} " + ' '.join(f'{case:>13}' for case in cases))
+    for (start_date, end_date, period), files in days.items():
+        if args.dates and start_date not in args.dates:
+            continue
+        inputs = ''.join(kind[0].upper() if kind in files else '-' for kind in ('forecast', 'scenarios', 'actual', 'weighted'))
+        key = f'{start_date}_to_{end_date}_{period}'
+        status = []
+        for case in cases:
+            if not all(kind in files for kind in REQUIRED_INPUTS[case]):
+                status.append('')
+            else:
+                status.append('done' if os.path.exists(result_file(case, key, config, SPECIAL_CASE)) else 'open')
+        print(f"{start_date:<10} {period:<6} {inputs:<8} " + ' '.join(f'{value:>13}' for value in status))
+    print('\ninputs: F forecast, S scenarios, A actual, W weighted heat demand')
+    return 0
+
+
+def command_status(args):
+    config = load_config()
+    print('Result cache:')
+    for name, value in ResultCache(config=config).stats().items():
+        print(f"  {name:<10} {value:.3f}" if isinstance(value, float) else f"  {name:<10} {value}")
+
+    timings_file = os.path.join(data_path(config), BATCH_TIMINGS)
+    print('\nLast batch runs:')
+    if os.path.exists(timings_file):
+        with open(timings_file) as f:
+            for row in list(csv.DictReader(f))[-args.last:]:
+                print(f"  {row['created']}  {row['name']:<24} {row['mode']:<10} {row['days']:>4} days "
+                      f"({row['skipped']} skipped) {float(row['wall']):8.1f} s")
+    else:
+        print('  none')
+
+    state_file = os.path.join(data_path(config), PIPELINE_STATE)
+    print('\nStudy pipeline:')
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+        counts = {}
+        for entry in state.values():
+            counts[entry.get('status')] = counts.get(entry.get('status'), 0) + 1
+        print('  ' + ', '.join(f'{count} {status}' for status, count in sorted(counts.items())))
+        for name, entry in state.items():
+            if entry.get('status') != 'done':
+                print(f"  {name:<28} {entry.get('status')}: {entry.get('error')}")
+    else:
+        print('  no state')
+    return 0
+
+
+def _solve_options(args):
+    solver_options = dict(run_keys.SOLVER_OPTIONS)
+    for name, value in (('MIPGap', args.mip_gap), ('TimeLimit', args.time_limit), ('Threads', args.threads)):
+        if value is not None:
+            solver_options[name] = value
+    solve_options = {'solver_name': args.solver, 'solver_options': solver_options}
+    if args.model == 'deterministic':
+        solve_options['use_heuristic_start'] = not args.no_heuristic_start
+    return solve_options
+
+
+def _run_config(args):
+    return RunConfig.from_config(
+        args.model,
+        use_weighted_heat_demand=args.case == 'weighted' or (args.model == 'stochastic' and args.weighted),
+        use_decision_rule=args.case == 'decision-rule',
+        special_case=SPECIAL_CASE if args.case == 'special' else '',
+    )
+
+
+def _cache_key(args, cache, run_config, info, files, solve_options):
+    """Result cache key of a day, computed like main_d/main_s do (common.run_keys)."""
+    run_config = run_config.for_day(info[0])
+    if args.case == 'weighted':
+        weighted_file = os.path.join(run_config.path_in, 'demands', run_config.weighted_heat_demand_file)
+        forecast = load_heat_demand(files['forecast']) if args.service_level is not None else None
+        return run_keys.forecast_key(cache, run_config, load_heat_demand(weighted_file), True, args.service_level,
+                                     forecast, **solve_options)
+    if args.case == 'forecast':
+        return run_keys.forecast_key(cache, run_config, load_heat_demand(files['forecast']), False, args.service_level,
+                                     **solve_options)
+    if args.case == 'scenarios':
+        return run_keys.scenarios_key(cache, run_config, load_heat_demand_scenarios(files['scenarios']), **solve_options)
+    if args.case == 'actual':
+        return run_keys.actual_key(cache, run_config, load_heat_demand(files['actual']), **solve_options)
+    key, _ = run_keys.stochastic_key(cache, run_config, files['forecast'], files['scenarios'], scen_count=args.scenarios,
+                                     use_saa=args.saa, **solve_options)
+    return key
+
+
+def model_module(model):
+    """Import main_d or main_s (Pyomo, mpisppy); their 'assets' package is in the model directory."""
+    sys.path.insert(0, os.path.join(MODELS_PATH, model))
+    return importlib.import_module(MODULES[model])
+
+
+def command_run(args):
+    if args.case is None:
+        args.case = CASES[args.model][0]
+    if args.case not in CASES[args.model]:
+        print(f"Case {args.case} is not a case of the {args.model} model ({', '.join(CASES[args.model])})")
+        return 2
+
+    days = days_of_case(args.case, args.dates)
+    if not days:
+        print('No days with the inputs of this case')
+        return 1
+    dates = [info[0] for info, _ in days]
+    solve_options = _solve_options(args)
+
+    if args.case == 'weighted' or (args.model == 'stochastic' and args.weighted):
+        from common import weighted_demand
+
+        # run_forecast und main_s.run erzeugen die gewichteten Bedarfe nicht selbst: fehlende oder veraltete zuerst erzeugen
+        for start_date in dates:
+            weighted_demand.build(start_date, start_date)
+
+    if not args.no_cache:
+        cache = ResultCache()
+        run_config = _run_config(args)
+        pending = []
+        for info, files in days:
+            key = _cache_key(args, cache, run_config, info, files, solve_options)
+            if cache.contains(key):
+                cache.get(key)
+                print(f"{info[0]} {args.case}: restored from the cache")
+            else:
+                pending.append(info[0])
+        if not pending:
+            print(f"All {len(dates)} days restored from the cache")
+            return 0
+        dates = pending
+
+    print(f"Solving {args.model} {args.case} for {len(dates)} days: {', '.join(dates)}")
+    module = model_module(args.model)
+    options = {'use_cache': not args.no_cache, 'use_snapshots': args.snapshots, 'pipelined': not args.sequential,
+               'use_demand_store': args.demand_store}
+    if args.model == 'deterministic':
+        if args.case in ('weighted', 'forecast'):
+            module.run_forecast(dates, weighted=args.case == 'weighted', service_level=args.service_level, **options,
+                                **solve_options)
+        elif args.case == 'scenarios':
+            module.run_scenarios(dates, **options, **solve_options)
+        else:
+            module.run_actual(dates, **options, **solve_options)
+    else:
+        module.run(dates, use_special_case=args.case == 'special', use_weighted_heat_demand=args.weighted,
+                   use_decision_rule=args.case == 'decision-rule', scen_count=args.scenarios, use_saa=args.saa,
+                   use_indexed_scenarios=args.indexed_scenarios, **options, **solve_options)
+    return 0
+
+
+def parser():
+    parser = argparse.ArgumentParser(prog='spma', description='Run the deterministic and stochastic models.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='days with their inputs and finished cases')
+    list_parser.add_argument('--model', choices=list(CASES), default=None)
+    list_parser.add_argument('--dates', nargs='+', type=str, default=None, help='e.g. 2023-03-16..2023-07-10')
+    list_parser.set_defaults(function=command_list)
+
+    status_parser = commands.add_parser('status', help='result cache, last batch runs and study pipeline')
+    status_parser.add_argument('--last', type=int, default=5, help='number of batch runs shown')
+    status_parser.set_defaults(function=command_status)
+
+    run_parser = commands.add_parser('run', help='run a case of a model for a range of dates')
+    run_parser.add_argument('--model', choices=list(CASES), required=True)
+    run_parser.add_argument('--case', default=None,
+                            help='deterministic: weighted (default), forecast, scenarios, actual; '
+                                 'stochastic: base (default), special, decision-rule')
+    run_parser.add_argument('--dates', nargs='+', type=str, default=None,
+                            help='start dates or ranges, e.g. 2023-03-16..2023-07-10 (default: all days)')
+    run_parser.add_argument('--weighted', action='store_true', help='stochastic: use the weighted heat demand')
+    run_parser.add_argument('--service-level', type=float, default=None,
+                            help='deterministic weighted/forecast: chance constraints with this service level')
+    run_parser.add_argument('--scenarios', type=int, default=10, help='stochastic: scenarios of the EF (without --saa)')
+    run_parser.add_argument('--saa', action='store_true',
+                            help='stochastic: sampled EFs with adaptive scenario count instead of the scenario file')
+    run_parser.add_argument('--indexed-scenarios', action='store_true',
+                            help='stochastic: read the scenarios one by one from an indexed store of the scenario file')
+    run_parser.add_argument('--no-heuristic-start', action='store_true', help='deterministic: no MIP start')
+    run_parser.add_argument('--solver', default='gurobi')
+    run_parser.add_argument('--mip-gap', type=float, default=None, help='Gurobi MIPGap')
+    run_parser.add_argument('--time-limit', type=float, default=None, help='Gurobi TimeLimit in seconds')
+    run_parser.add_argument('--threads', type=int, default=None, help='Gurobi Threads')
+    run_parser.add_argument('--no-cache', action='store_true', help='solve every day, ignoring the result cache')
+    run_parser.add_argument('--snapshots', action='store_true', help='reuse built instances (common.model_snapshot)')
+    run_parser.add_argument('--demand-store', action='store_true',
+                            help='load the demands and scenarios from the demand store (common.demand_store)')
+    run_parser.add_argument('--sequential', action='store_true', help='no overlap of loading, solving and writing')
+    run_parser.set_defaults(function=command_run)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if getattr(args, 'dates', None) is not None:
+        try:
+            args.dates = parse_dates(args.dates)
+        except argparse.ArgumentTypeError as e:
+            print(e)
+            sys.exit(2)
+    sys.exit(args.function(args))
+
+
+if __name__ == "__main__":
+    main()
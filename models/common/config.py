@@ -0,0 +1,31 @@
+"""config.json and the paths of the data directory.
+
+Only the standard library is imported here, so modules that need nothing
+but the configuration (result cache, run config, command line) start
+without NumPy and pandas.
+"""
+import json
+import os
+
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_PATH, '..', 'config.json')
+
+
+def load_config(config_file=CONFIG_FILE):
+    """Load the config.json."""
+    with open(config_file, 'r') as f:
+        return json.load(f)
+
+
+def resolve_path(config, model_type, key):
+    """Resolve a path of the config relative to the models directory."""
+    # data_path ist relativ zu models/<model_type>, common liegt auf derselben Ebene
+    data_path = os.path.join(BASE_PATH, config['global']['data_path'])
+    return os.path.normpath(os.path.join(data_path, config[model_type][key])) + os.sep
+
+
+def data_path(config=None):
+    """The data directory (parent of the input directory)."""
+    config = config or load_config()
+    return os.path.normpath(os.path.join(resolve_path(config, 'deterministic', 'input_path'), '..'))
@@ -0,0 +1,59 @@
+"""File names and JSON files of data/input/demands.
+
+Only the standard library is imported here (see common.config); the
+validation data and the error model are in common.demands.
+"""
+import json
+import os
+import re
+
+
+# Validierungsdaten der Prognose (Grundlage der Szenariogenerierung)
+VALIDATION_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'preprocessing', 'data', 'raw', '240624_validation_data.csv'
+)
+
+# Muster der Dateinamen im Ordner data/input/demands
+FILE_PATTERNS = [
+    ('forecast', r'heat_demand_(\d{8})_to_(\d{8})_(\w+)\.json$'),
+    ('weighted', r'weighted_heat_demand_(\d{8})\.json$'),
+    ('scenarios', r'reduced_heat_demand_scenarios_(\d{8})_to_(\d{8})_(\w+)\.json$'),
+    ('actual', r'actual_heat_demand_(\d{8})_to_(\d{8})_(\w+)\.json$'),
+]
+
+
+def extract_scenario_info(file):
+    """Extract the start date, end date, and period from the file name."""
+    base_name = os.path.basename(file)
+
+    for kind, pattern in FILE_PATTERNS:
+        match = re.match(pattern, base_name)
+        if match is None:
+            continue
+        if kind == 'weighted':
+            # Kein Enddatum und kein Zeitraum in diesem Dateinamen
+            return match.group(1), match.group(1), 'day'
+        return match.group(1), match.group(2), match.group(3)
+
+    return None, None, None
+
+
+def load_heat_demand(file):
+    """Load a heat demand file and return the hourly values keyed by int hour."""
+    with open(file) as f:
+        heat_demand_data = json.load(f)
+
+    if 'heat_demand' in heat_demand_data:
+        heat_demand_data = heat_demand_data['heat_demand']
+
+    return {int(k): v for k, v in heat_demand_data.items()}
+
+
+def load_heat_demand_scenarios(file):
+    """Load a scenario file and return the hourly values of every scenario without "Probability"."""
+    with open(file) as f:
+        heat_demand_scenarios = json.load(f)
+
+    for scenario in heat_demand_scenarios.values():
+        scenario.pop('Probability', None)
+    return heat_demand_scenarios
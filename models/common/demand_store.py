@@ -0,0 +1,221 @@
+"""Columnar store of heat demand forecasts, actual demands and scenarios.
+
+All JSON files of data/input/demands (heat_demand_*, actual_heat_demand_*,
+weighted_heat_demand_*, reduced_heat_demand_scenarios_*) are collected into
+one directory:
+
+    values.npy  all hourly values, concatenated (float64, memory-mapped on read)
+    index.csv   one row per series: kind, start_date, end_date, period,
+                scenario, probability, offset, length
+
+kind is 'forecast', 'actual', 'weighted' or 'scenarios'; scenario and
+probability are only set for scenarios. A date range is one filter on the
+index and one slice per series of the memory-mapped array, instead of
+globbing and parsing the JSON files. JSON export keeps the old files usable.
+
+Usage (from the models directory):
+    python -m common.demand_store build
+    python -m common.demand_store export scenarios 20230316 [period]
+"""
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from common.demands import extract_scenario_info
+from common.config import load_config, resolve_path
+from common.scenario_provider import ScenarioSet
+
+
+KINDS = {
+    'forecast': 'heat_demand',
+    'actual': 'actual_heat_demand',
+    'weighted': 'weighted_heat_demand',
+    'scenarios': 'reduced_heat_demand_scenarios',
+}
+INDEX_COLUMNS = ['kind', 'start_date', 'end_date', 'period', 'scenario', 'probability', 'offset', 'length']
+
+
+def default_paths():
+    """Demand directory of the models and the store inside it."""
+    demands_path = resolve_path(load_config(), 'deterministic', 'input_path') + 'demands'
+    return demands_path, os.path.join(demands_path, 'store')
+
+
+def _kind(file):
+    """Kind of a demand file from its name (None for other files)."""
+    base_name = os.path.basename(file)
+    # Längste Präfixe zuerst, da 'heat_demand_' auch in den anderen Namen steckt
+    for kind, prefix in sorted(KINDS.items(), key=lambda item: -len(item[1])):
+        if base_name.startswith(prefix + '_'):
+            return kind
+    return None
+
+
+def _series(values):
+    """Hourly values of a JSON dict with string hour keys, ignoring 'Probability'."""
+    hours = sorted(int(key) for key in values if key.isdigit())
+    return [values[str(t)] for t in hours]
+
+
+class DemandStore:
+    """Read access to a store written by DemandStore.build."""
+
+    def __init__(self, path=None, mmap=True):
+        if path is None:
+            _, path = default_paths()
+        self.path = path
+        self.index = pd.read_csv(
+            os.path.join(path, 'index.csv'),
+            dtype={'start_date': str, 'end_date': str, 'scenario': str},
+            keep_default_na=False, na_values={'probability': ['']}, float_precision='round_trip'
+        )
+        self.data = np.load(os.path.join(path, 'values.npy'), mmap_mode='r' if mmap else None)
+
+    @classmethod
+    def build(cls, path=None, demands_path=None):
+        """Collect all demand JSON files below demands_path into a new store."""
+        default_demands_path, default_store_path = default_paths()
+        demands_path = demands_path or default_demands_path
+        path = path or default_store_path
+
+        rows, chunks, offset = [], [], 0
+        for file in sorted(glob.glob(os.path.join(demands_path, '**', '*.json'), recursive=True)):
+            kind = _kind(file)
+            if kind is None:
+                continue
+            start_date, end_date, period = extract_scenario_info(file)
+            with open(file) as f:
+                data = json.load(f)
+
+            if kind == 'scenarios':
+                series = [(name, values.get('Probability'), _series(values)) for name, values in data.items()]
+            else:
+                series = [('', None, _series(data.get('heat_demand', data)))]
+
+            for scenario, probability, values in series:
+                rows.append([kind, start_date, end_date, period, scenario, probability, offset, len(values)])
+                chunks.append(np.asarray(values, dtype=float))
+                offset += len(values)
+
+        os.makedirs(path, exist_ok=True)
+        # Über temporäre Dateien ersetzen, damit parallele Läufe nie eine halb geschriebene Datei lesen;
+        # der Index zuletzt, sein Zeitstempel markiert den Stand des Stores
+        values_file, index_file = os.path.join(path, 'values.npy'), os.path.join(path, 'index.csv')
+        with open(f'{values_file}.{os.getpid()}.tmp', 'wb') as f:
+            np.save(f, np.concatenate(chunks) if chunks else np.zeros(0))
+        os.replace(f'{values_file}.{os.getpid()}.tmp', values_file)
+        pd.DataFrame(rows, columns=INDEX_COLUMNS).to_csv(f'{index_file}.{os.getpid()}.tmp', index=False)
+        os.replace(f'{index_file}.{os.getpid()}.tmp', index_file)
+        return cls(path)
+
+    @classmethod
+    def open(cls, path=None, demands_path=None):
+        """Store at path, built first if it is missing or older than a demand JSON file."""
+        default_demands_path, default_store_path = default_paths()
+        demands_path = demands_path or default_demands_path
+        path = path or default_store_path
+
+        index_file = os.path.join(path, 'index.csv')
+        files = [file for file in glob.glob(os.path.join(demands_path, '**', '*.json'), recursive=True) if _kind(file)]
+        if os.path.exists(index_file) and all(os.path.getmtime(file) <= os.path.getmtime(index_file) for file in files):
+            return cls(path)
+        print(f"Building the demand store in {path} ...")
+        return cls.build(path, demands_path)
+
+    def select(self, kind=None, start_date=None, end_date=None, period=None):
+        """Index rows of the series, optionally filtered by kind, period and start date range (YYYYMMDD)."""
+        mask = np.ones(len(self.index), dtype=bool)
+        if kind is not None:
+            mask &= self.index['kind'] == kind
+        if period is not None:
+            mask &= self.index['period'] == period
+        if start_date is not None:
+            mask &= self.index['start_date'] >= str(start_date)
+        if end_date is not None:
+            mask &= self.index['start_date'] <= str(end_date)
+        return self.index[mask]
+
+    def values(self, row):
+        """Hourly values of one index row (a view on the memory-mapped array)."""
+        return self.data[row['offset']:row['offset'] + row['length']]
+
+    def frame(self, kind, start_date=None, end_date=None, period='day'):
+        """All series of a kind in a date range, one row per series and one column per hour."""
+        rows = self.select(kind, start_date, end_date, period)
+        if rows.empty:
+            return pd.DataFrame()
+        # Alle Reihen in einem Zugriff auf das Array; kürzere Reihen (z.B. Monate) mit NaN aufgefüllt
+        hours = np.arange(rows['length'].max())[None, :]
+        valid = hours < rows['length'].to_numpy()[:, None]
+        positions = np.minimum(rows['offset'].to_numpy()[:, None] + hours, len(self.data) - 1)
+        df_values = pd.DataFrame(np.where(valid, self.data[positions], np.nan), columns=range(1, hours.shape[1] + 1))
+        df_values.index = pd.MultiIndex.from_frame(rows[['start_date', 'scenario']].reset_index(drop=True))
+        df_values.insert(0, 'probability', rows['probability'].to_numpy())
+        return df_values
+
+    def _row(self, kind, start_date, period):
+        rows = self.select(kind, start_date, start_date, period)
+        if rows.empty:
+            raise KeyError(f"No {kind} for {start_date} ({period}) in {self.path}")
+        return rows
+
+    def heat_demand(self, start_date, period='day', kind='forecast'):
+        """Demand of one period keyed by int hour, as common.demands.load_heat_demand."""
+        values = self.values(self._row(kind, start_date, period).iloc[0])
+        return {t: float(value) for t, value in enumerate(values, start=1)}
+
+    def scenarios(self, start_date, period='day', forecast=None):
+        """Scenarios of one period as ScenarioSet (usable as scenario provider of model_s).
+
+        forecast: demand the deviations are taken from (default the forecast of
+        the period; model_s passes the weighted demand with use_weighted_heat_demand).
+        """
+        rows = self._row('scenarios', start_date, period)
+        offsets, lengths = rows['offset'].to_numpy(), rows['length'].to_numpy()
+        if (lengths == lengths[0]).all() and (np.diff(offsets) == lengths[0]).all():
+            # Szenarien liegen hintereinander: View (n_scenarios, T) ohne Kopie
+            values = self.data[offsets[0]:offsets[0] + lengths.sum()].reshape(len(rows), lengths[0])
+        else:
+            values = np.vstack([self.values(row) for _, row in rows.iterrows()])
+        if forecast is None:
+            forecast = self.heat_demand(start_date, period)
+            forecast = [forecast[t] for t in sorted(forecast)]
+        return ScenarioSet(rows['scenario'], values, rows['probability'].to_numpy(), forecast)
+
+    def export_json(self, kind, start_date, period='day', file=None):
+        """Write one period in the JSON format of the original files."""
+        rows = self._row(kind, start_date, period)
+        if kind == 'scenarios':
+            data = {}
+            for _, row in rows.iterrows():
+                data[row['scenario']] = {'Probability': float(row['probability'])}
+                data[row['scenario']].update({str(t): float(v) for t, v in enumerate(self.values(row), start=1)})
+        else:
+            data = {'heat_demand': {str(t): v for t, v in self.heat_demand(start_date, period, kind).items()}}
+
+        if file is None:
+            row = rows.iloc[0]
+            if kind == 'weighted':
+                file = f"{KINDS[kind]}_{row['start_date']}.json"
+            else:
+                file = f"{KINDS[kind]}_{row['start_date']}_to_{row['end_date']}_{row['period']}.json"
+        with open(file, 'w') as json_file:
+            json.dump(data, json_file, indent=4)
+        return file
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if command == 'build':
+        store = DemandStore.build()
+        print(f"{len(store.index)} series written to {store.path}")
+    elif command == 'export':
+        kind, start_date = sys.argv[2], sys.argv[3]
+        period = sys.argv[4] if len(sys.argv) > 4 else 'day'
+        print(f"Written to {DemandStore().export_json(kind, start_date, period)}")
+    else:
+        print("Usage: python -m common.demand_store build | export KIND START_DATE [PERIOD]")
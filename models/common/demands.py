@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# Dateinamen und JSON-Dateien der Bedarfe (bleiben über common.demands importierbar)
+from common.demand_files import FILE_PATTERNS, VALIDATION_FILE, extract_scenario_info, load_heat_demand
+
+
+# Fehlerbereich mu +/- 3 sigma wie in der Szenariogenerierung
+SIGMA_RANGE = 3
+
+
+def load_validation_data(file=VALIDATION_FILE):
+    """Load the validation data with actual and forecast demand and the forecast error.
+
+    Same preparation as preprocessing/scenario_generation.ipynb: time in UTC,
+    error = delivered heat - predicted heat.
+    """
+    dataset = pd.read_csv(file)
+    time = pd.to_datetime(dataset['time'], utc=True)
+    df_data = pd.DataFrame({
+        'time': time,
+        'hour': time.dt.hour,
+        'actual_demand': dataset['delivered heat'],
+        'forecast_demand': dataset['predicted heat'],
+    })
+    df_data['error'] = df_data['actual_demand'] - df_data['forecast_demand']
+    return df_data
+
+
+def load_forecast_errors(file=VALIDATION_FILE):
+    """Mean and standard deviation of the forecast error per hour of the day (UTC)."""
+    df_data = load_validation_data(file)
+    stats = df_data.groupby('hour')['error'].agg(['mean', 'std']).reindex(range(24))
+    return stats['mean'].to_numpy(), stats['std'].to_numpy()
+
+
+def sample_heat_demand(forecast, n_samples, errors=None, seed=None):
+    """Sample demand paths around a forecast from the hourly error model.
+
+    Errors are drawn from N(mu, sigma) of each hour truncated to
+    mu +/- 3 sigma, the range covered by the scenario generation (draws
+    outside are drawn again, no point masses at the bounds).
+    Returns an array of shape (n_samples, T).
+    """
+    if errors is None:
+        errors = load_forecast_errors()
+    mu, sigma = errors
+
+    forecast = np.asarray(forecast, dtype=float)
+    # t = 1 entspricht Stunde 0 des Tages
+    hours = np.arange(len(forecast)) % 24
+    mu, sigma = mu[hours], sigma[hours]
+
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n_samples, len(forecast)))
+    outside = np.abs(z) > SIGMA_RANGE
+    while outside.any():
+        z[outside] = rng.standard_normal(outside.sum())
+        outside = np.abs(z) > SIGMA_RANGE
+    error = z * sigma + mu
+    return np.maximum(forecast + error, 0.0)
@@ -0,0 +1,349 @@
+"""Fast heuristic dispatch: dynamic programming over the storage state of charge.
+
+The production cost of the two CHPs and the boiler is piecewise linear in the
+heat output of each unit (between heat_1 and heat_2, see Unit.heat_max). For a
+given total heat output the cheapest split has at most one unit off a
+breakpoint, so all commitment patterns can be enumerated and evaluated
+vectorized. The dynamic programming then runs over a discretized
+state of charge of the heat storage, from the initial SOC back to the initial
+SOC (soc_cycle_constr). The result is a feasible dispatch of the deterministic
+model, usable as MIP start or as fallback answer.
+"""
+import glob
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.demands import extract_scenario_info, load_heat_demand
+from common.plant import Plant, resolve_path
+from common.price_series import PRICE_FILES
+
+
+# Tolerance for the unit limits and the all-off pattern
+TOLERANCE = 1e-9
+
+
+class Dispatch:
+    """Dispatch of one horizon with the objective value of the deterministic model."""
+
+    def __init__(self, heat_demand, units, storage, objective_value, runtime):
+        self.heat_demand = heat_demand
+        self.units = units
+        self.storage = storage
+        self.objective_value = objective_value
+        self.runtime = runtime
+
+    def variables(self):
+        """Values of the model variables by component name, e.g. 'chp1.heat'."""
+        values = {}
+        for name, unit in self.units.items():
+            for var_name, var_values in unit.items():
+                values[f'{name}.{var_name}'] = var_values
+        for var_name, var_values in self.storage.items():
+            values[f'heat_storage1.{var_name}'] = var_values
+
+        chp1, chp2, boiler1 = self.units['chp1'], self.units['chp2'], self.units['boiler1']
+        heat_charge = self.storage['heat_charge']
+        heat_discharge = self.storage['heat_discharge']
+        power_feedin = chp1['power'] + chp2['power']
+
+        values['ngas_grid.gas_balance'] = chp1['gas'] + boiler1['gas']
+        values['power_grid.power_supply'] = np.zeros_like(power_feedin)
+        values['power_grid.power_feedin'] = power_feedin
+        values['power_grid.power_balance'] = -power_feedin
+        values['heat_grid.heat_supply'] = heat_charge
+        values['heat_grid.heat_feedin'] = chp1['heat'] + chp2['heat'] + boiler1['heat'] + heat_discharge
+        values['heat_grid.heat_balance'] = np.zeros_like(heat_charge)
+
+        # Variables of the expanded arcs (see Model.add_arcs)
+        values['arc01_expanded.power'] = chp1['power']
+        values['arc02_expanded.power'] = chp2['power']
+        values['arc03_expanded.heat'] = chp1['heat']
+        values['arc04_expanded.heat'] = chp2['heat']
+        values['arc05_expanded.heat'] = boiler1['heat']
+        values['arc06_expanded.gas'] = boiler1['gas']
+        values['arc07_expanded.gas'] = chp1['gas']
+        values['arc08_expanded.heat'] = heat_discharge
+        values['arc09_expanded.heat'] = heat_charge
+        return values
+
+    def to_frame(self):
+        """Return the dispatch as a DataFrame indexed by t."""
+        df_output = pd.DataFrame(self.variables())
+        df_output.insert(0, 'heat_demand', self.heat_demand)
+        df_output.index = np.arange(1, len(self.heat_demand) + 1)
+        df_output.index.name = 't'
+        return df_output
+
+
+def _commitment_patterns(plant):
+    """Enumerate the patterns (units on, free unit, fixed breakpoints of the others)."""
+    # Breakpoints heat_1 and heat_2 of the operating range
+    units = plant.units
+    patterns = []
+    for size in range(1, len(units) + 1):
+        for on in itertools.combinations(range(len(units)), size):
+            for free in on:
+                fixed = [u for u in on if u != free]
+                for breakpoints in itertools.product(range(2), repeat=len(fixed)):
+                    levels = np.zeros(len(units))
+                    for u, b in zip(fixed, breakpoints):
+                        levels[u] = units[u].heat[b]
+                    patterns.append((on, free, levels))
+    return patterns
+
+
+def production_cost(plant, heat):
+    """Cheapest cost to produce the given total heat with the CHPs and the boiler.
+
+    Returns the cost (inf if infeasible) and the heat output of every unit,
+    the latter with shape (n_units,) + heat.shape.
+    """
+    heat = np.asarray(heat, dtype=float)
+    units = plant.units
+    unit_costs = [plant.unit_cost(unit, unit.heat) for unit in units]
+
+    best_cost = np.where(np.abs(heat) <= TOLERANCE, 0.0, np.inf)
+    best_levels = np.zeros((len(units),) + heat.shape)
+
+    for on, free, levels in _commitment_patterns(plant):
+        free_unit = units[free]
+        free_heat = heat - levels.sum()
+        valid = (free_heat >= free_unit.heat_min - TOLERANCE) & (free_heat <= free_unit.heat_max + TOLERANCE)
+        free_heat = np.clip(free_heat, free_unit.heat_min, free_unit.heat_max)
+
+        fixed_cost = sum(plant.unit_cost(units[u], levels[u]) for u in on if u != free)
+        cost = np.where(valid, fixed_cost + np.interp(free_heat, free_unit.heat, unit_costs[free]), np.inf)
+
+        better = cost < best_cost
+        best_cost = np.where(better, cost, best_cost)
+        for u in range(len(units)):
+            unit_heat = free_heat if u == free else levels[u]
+            best_levels[u] = np.where(better, unit_heat, best_levels[u])
+
+    return best_cost, best_levels
+
+
+def _unit_variables(unit, heat):
+    """Values of the unit variables for the given heat output (0 = off)."""
+    on = heat > TOLERANCE
+    variables = {
+        'bin': on.astype(float),
+        'heat': np.where(on, heat, 0.0),
+        'gas': np.where(on, unit.interp(heat, unit.gas), 0.0),
+        'eta_th': np.where(on, unit.interp(heat, unit.eta_th), 0.0),
+        'y1': (on & (heat <= unit.heat[1])).astype(float),
+        'y2': (on & (heat > unit.heat[1])).astype(float),
+    }
+    if unit.kind == 'chp':
+        variables['power'] = np.where(on, unit.interp(heat, unit.power), 0.0)
+        variables['eta_el'] = np.where(on, unit.interp(heat, unit.eta_el), 0.0)
+    return variables
+
+
+def storage_limits(storage, n_hours, reserves=None):
+    """Hourly limits of the heat storage, tightened by the reserves of the chance constraints.
+
+    reserves: (reserve_up, reserve_down) per hour as in
+    main_d.Model.add_chance_constraints, or None for the plain limits.
+    """
+    reserve_up, reserve_down = (0.0, 0.0) if reserves is None else reserves
+    reserve_up = np.broadcast_to(np.asarray(reserve_up, dtype=float), (n_hours,))
+    reserve_down = np.broadcast_to(np.asarray(reserve_down, dtype=float), (n_hours,))
+    return {
+        'max_charge': storage.max_heat - reserve_down,
+        'max_discharge': storage.max_heat - reserve_up,
+        'min_content': storage.min_content + reserve_up,
+        'max_content': storage.max_content - reserve_down,
+    }
+
+
+def dispatch(heat_demand, plant=None, soc_steps=(1.0, 0.9, 0.8), reserves=None):
+    """Build a feasible dispatch for the given hourly heat demand.
+
+    heat_demand: sequence or dict {hour: value} ordered by hour.
+    soc_steps: approximate resolutions of the production and SOC grid in kWh.
+    The dynamic programming runs once per resolution and the cheapest
+    dispatch is returned, which evens out unlucky grids.
+    reserves: (reserve_up, reserve_down) per hour of the chance constraints;
+    the dispatch then keeps the tightened storage limits (storage_limits).
+    With hourly prices (Plant.from_run_config) the plant must cover the hours
+    of heat_demand.
+    """
+    start = time.perf_counter()
+
+    if plant is None:
+        plant = Plant()
+    if isinstance(heat_demand, dict):
+        heat_demand = [heat_demand[t] for t in sorted(heat_demand, key=int)]
+    heat_demand = np.asarray(heat_demand, dtype=float)
+    limits = storage_limits(plant.heat_storage1, len(heat_demand), reserves)
+    if plant.hourly and any(np.size(plant.prices[key]) not in (1, len(heat_demand)) for key in PRICE_FILES):
+        raise ValueError(f"The hourly prices of the plant do not cover the {len(heat_demand)} hours of the heat demand")
+
+    best = None
+    for soc_step in soc_steps:
+        try:
+            result = _dispatch_on_grid(heat_demand, plant, soc_step, limits)
+        except ValueError:
+            continue
+        if best is None or result.objective_value < best.objective_value:
+            best = result
+
+    if best is None:
+        raise ValueError("No feasible dispatch found on the production grids")
+
+    best.runtime = time.perf_counter() - start
+    return best
+
+
+def _dispatch_on_grid(heat_demand, plant, soc_step, limits):
+    """Dynamic programming on one production grid.
+
+    The state is the cumulative production. Its grid step is adjusted so that
+    the total demand is a multiple of it, hence the SOC returns exactly to the
+    initial SOC at the end of the horizon and hours without production can be
+    served from the storage alone.
+    """
+    storage = plant.heat_storage1
+
+    # Cumulative demand D_t, t = 0..T
+    cumulative_demand = np.concatenate(([0.0], np.cumsum(heat_demand)))
+    n_steps = max(int(round(cumulative_demand[-1] / soc_step)), 1)
+    step = cumulative_demand[-1] / n_steps
+    if step <= 0:
+        raise ValueError("The total heat demand must be positive")
+
+    # Production cost for every production level k * step, once per distinct set of hourly prices
+    max_production = sum(unit.heat_max for unit in plant.units)
+    production = np.arange(int(np.floor(max_production / step)) + 1) * step
+    costs = {}
+    hour_costs = []
+    for t in range(len(heat_demand)):
+        hour = plant.hour(t)
+        prices = tuple(hour.prices[key] for key in PRICE_FILES)
+        if prices not in costs:
+            costs[prices] = production_cost(hour, production)
+        hour_costs.append(costs[prices])
+
+    # Feasible states m (cumulative production m * step) per t from the SOC limits (t = 0 is fixed below)
+    min_content = np.concatenate(([storage.initial_soc], limits['min_content']))
+    max_content = np.concatenate(([storage.initial_soc], limits['max_content']))
+    lower = np.ceil((cumulative_demand + min_content - storage.initial_soc) / step - TOLERANCE)
+    upper = np.floor((cumulative_demand + max_content - storage.initial_soc) / step + TOLERANCE)
+    if not min_content[-1] - TOLERANCE <= storage.initial_soc <= max_content[-1] + TOLERANCE:
+        raise ValueError("The initial SOC of the last hour is outside the storage limits")
+    lower = np.clip(lower, 0, n_steps).astype(int)
+    upper = np.clip(upper, 0, n_steps).astype(int)
+    lower[0] = upper[0] = 0
+    lower[-1] = upper[-1] = n_steps
+    if np.any(lower > upper):
+        raise ValueError("The storage limits leave no feasible state of charge")
+
+    windows = [np.arange(lower[t], upper[t] + 1) for t in range(len(cumulative_demand))]
+    value = np.zeros(1)
+    predecessors = []
+
+    for t in range(1, len(cumulative_demand)):
+        # Production steps k within the charge and discharge limits of the storage
+        k_min = max(int(np.ceil((heat_demand[t - 1] - limits['max_discharge'][t - 1]) / step - TOLERANCE)), 0)
+        k_max = min(int(np.floor((heat_demand[t - 1] + limits['max_charge'][t - 1]) / step + TOLERANCE)), len(production) - 1)
+        if k_max < k_min:
+            raise ValueError("The storage power leaves no feasible production")
+        k = np.arange(k_min, k_max + 1)
+        flow = production[k] - heat_demand[t - 1]
+        step_cost = hour_costs[t - 1][0][k] + plant.storage_cost(np.maximum(flow, 0.0), np.maximum(-flow, 0.0))
+
+        # Previous state of every (state, step) pair, padded with inf outside the window
+        padded = np.concatenate((np.full(len(k), np.inf), value, np.full(len(k), np.inf)))
+        previous = windows[t][:, None] - k[None, :] - windows[t - 1][0]
+        outside = (previous < 0) | (previous >= len(value))
+        previous = np.where(outside, -len(k) - 1, previous)
+
+        transition = padded[previous + len(k)] + step_cost[None, :]
+        best = np.argmin(transition, axis=1)
+        value = transition[np.arange(len(windows[t])), best]
+        predecessors.append(k[best])
+
+    if not np.isfinite(value[0]):
+        raise ValueError("No feasible dispatch found on the production grid")
+
+    # Backtracking from the final state (SOC = initial SOC)
+    path = np.zeros(len(cumulative_demand), dtype=int)
+    path[-1] = n_steps
+    for t in range(len(cumulative_demand) - 1, 0, -1):
+        path[t - 1] = path[t] - predecessors[t - 1][path[t] - windows[t][0]]
+
+    chosen = np.diff(path)
+    flow = production[chosen] - heat_demand
+    unit_heat = np.stack([hour_costs[t][1][:, k] for t, k in enumerate(chosen)], axis=1)
+
+    units = {
+        unit.name: _unit_variables(unit, unit_heat[u])
+        for u, unit in enumerate(plant.units)
+    }
+    heat_charge = np.maximum(flow, 0.0)
+    heat_discharge = np.maximum(-flow, 0.0)
+    storage_values = {
+        'heat_charge': heat_charge,
+        'bin_charge': (heat_charge > TOLERANCE).astype(float),
+        'heat_discharge': heat_discharge,
+        'bin_discharge': (heat_discharge > TOLERANCE).astype(float),
+        'heat_balance': heat_discharge - heat_charge,
+        'heat_capacity': storage.initial_soc + path[1:] * step - cumulative_demand[1:],
+    }
+
+    return Dispatch(heat_demand, units, storage_values, float(value[0]), runtime=None)
+
+
+def gap_report(plant=None, soc_steps=(1.0, 0.9, 0.8)):
+    """Compare the heuristic with the stored MIP objective values on the historical days."""
+    if plant is None:
+        plant = Plant()
+
+    path_in = resolve_path(plant.config, 'deterministic', 'input_path')
+    path_objectives = resolve_path(plant.config, 'deterministic', 'objectives_path')
+    path_actual = resolve_path(plant.config, 'deterministic', 'actual_path')
+
+    # (case, heat demand files, objective file template)
+    cases = [
+        ('forecast', f'{path_in}demands/heat_demand_*.json', path_objectives + 'd_{}_to_{}_{}_obj.csv'),
+        ('weighted', f'{path_in}demands/weighted_heat_demand/weighted_heat_demand_*.json', path_objectives + 'd_weighted_{}_to_{}_{}_obj.csv'),
+        ('actual', f'{path_in}demands/actual_heat_demand_*.json', path_actual + 'd_actual_{}_to_{}_{}_obj.csv'),
+    ]
+
+    rows = []
+    for case, pattern, objective_template in cases:
+        for heat_demand_file in sorted(glob.glob(pattern)):
+            start_date, end_date, period = extract_scenario_info(heat_demand_file)
+            objective_file = objective_template.format(start_date, end_date, period)
+            if not os.path.exists(objective_file):
+                continue
+
+            df_objective = pd.read_csv(objective_file)
+            if df_objective.get('Status', pd.Series(dtype=object)).eq('heuristic').any():
+                # Fallback-Ergebnis, kein MIP-Zielfunktionswert
+                continue
+            mip_objective = df_objective['ObjectiveValue'].iloc[0]
+            result = dispatch(load_heat_demand(heat_demand_file), plant, soc_steps)
+            rows.append({
+                'Case': case,
+                'StartDate': start_date,
+                'Period': period,
+                'MIPObjective': mip_objective,
+                'HeuristicObjective': result.objective_value,
+                'Gap': result.objective_value - mip_objective,
+                'GapPercent': 100 * (result.objective_value - mip_objective) / abs(mip_objective),
+                'RuntimeMs': 1000 * result.runtime,
+            })
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    df_report = gap_report()
+    print(df_report.to_string(index=False))
+    print(f"\nMean gap: {df_report['GapPercent'].mean():.3f} %, mean runtime: {df_report['RuntimeMs'].mean():.1f} ms")
@@ -0,0 +1,237 @@
+"""Vectorized dispatch simulator and validator, independent of Pyomo.
+
+Takes the dispatch of one or many schedules as arrays keyed by the variable
+names of the models ('chp1.heat', 'heat_storage1.heat_charge', ...), with
+shape (T,) or (n_schedules, T). It recomputes the state of charge of the heat
+storage, checks the constraints of the CHPs, the boiler, the storage and the
+heat balance hour by hour and evaluates the cost terms of the objective
+(_gas_costs through _chp_revenue).
+
+Usage (from the models directory): python -m common.dispatch_simulator
+validates the stored deterministic timeseries against their objective values.
+"""
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from common.demands import extract_scenario_info
+from common.plant import Plant, resolve_path
+from common.price_series import PRICE_FILES
+
+
+# Order of the cost terms as in objective_expr: costs are added, revenues subtracted
+COST_TERMS = ['gas_costs', 'power_costs', 'storage_costs', 'maintenance_costs']
+REVENUE_TERMS = ['power_revenue', 'heat_revenue', 'chp_revenue']
+
+
+class Simulation:
+    """Result of simulate(): SOC, cost terms and violations, each of shape (n_schedules, T)."""
+
+    def __init__(self, heat_capacity, costs, violations):
+        self.heat_capacity = heat_capacity
+        self.costs = costs
+        self.violations = violations
+
+    @property
+    def objective_value(self):
+        """Objective value of every schedule."""
+        objective = sum(self.costs[term] for term in COST_TERMS) - sum(self.costs[term] for term in REVENUE_TERMS)
+        return objective.sum(axis=-1)
+
+    def violations_per_hour(self):
+        """Number of violated constraints per schedule and hour."""
+        return sum((v > 0).astype(int) for v in self.violations.values())
+
+    @property
+    def feasible(self):
+        """True for every schedule without any violation."""
+        return self.violations_per_hour().sum(axis=-1) == 0
+
+    def cost_breakdown(self):
+        """Cost terms summed over the horizon, one row per schedule."""
+        return pd.DataFrame({term: values.sum(axis=-1) for term, values in self.costs.items()})
+
+    def report(self, schedule=0):
+        """Violation magnitudes of one schedule per hour (only violated constraints)."""
+        df_report = pd.DataFrame({name: v[schedule] for name, v in self.violations.items() if v[schedule].any()})
+        df_report.index = np.arange(1, self.heat_capacity.shape[-1] + 1)
+        df_report.index.name = 't'
+        return df_report
+
+
+def _get(schedule, name, default=None):
+    """Return a schedule entry as 2D float array (n_schedules, T)."""
+    if name not in schedule:
+        return default
+    return np.atleast_2d(np.asarray(schedule[name], dtype=float))
+
+
+def _excess(values, limit):
+    """Amount by which the values exceed the limit (0 if within)."""
+    return np.maximum(values - limit, 0.0)
+
+
+def simulate(schedule, plant=None, tolerance=1e-4):
+    """Recompute SOC, costs and constraint violations of the given schedules.
+
+    schedule: dict or DataFrame with 'heat_demand' and the unit heat outputs
+    ('chp1.heat', ...) and storage flows ('heat_storage1.heat_charge',
+    'heat_storage1.heat_discharge'). Binaries, gas, power, eta_th, eta_el and
+    heat_capacity are optional; missing values are derived from the operating
+    curves and given values are checked against them (the efficiencies only
+    if given, the costs do not depend on them).
+    plant: with hourly prices (Plant.from_run_config) every hour of the
+    schedules is priced with its own gas, power and heat price.
+    """
+    if plant is None:
+        plant = Plant()
+    p = plant.prices
+
+    heat_demand = _get(schedule, 'heat_demand')
+    if plant.hourly and any(np.size(p[key]) not in (1, heat_demand.shape[-1]) for key in PRICE_FILES):
+        raise ValueError(f"The hourly prices of the plant do not cover the {heat_demand.shape[-1]} hours of the schedules")
+    violations = {}
+    units = {}
+
+    for unit in plant.units:
+        heat = _get(schedule, f'{unit.name}.heat')
+        on = _get(schedule, f'{unit.name}.bin', (heat > tolerance).astype(float))
+        gas = _get(schedule, f'{unit.name}.gas', np.where(on > 0.5, unit.interp(heat, unit.gas), 0.0))
+        power = _get(schedule, f'{unit.name}.power', np.where(on > 0.5, unit.interp(heat, unit.power), 0.0))
+        units[unit.name] = (on, heat, gas, power)
+
+        violations[f'{unit.name}.binary'] = np.minimum(np.abs(on), np.abs(on - 1))
+        violations[f'{unit.name}.min_heat'] = _excess(unit.heat_min * on, heat)
+        violations[f'{unit.name}.max_heat'] = _excess(heat, unit.heat_max * on)
+        violations[f'{unit.name}.gas_curve'] = np.abs(gas - on * unit.interp(heat, unit.gas))
+        if unit.kind == 'chp':
+            violations[f'{unit.name}.power_curve'] = np.abs(power - on * unit.interp(heat, unit.power))
+
+        # Efficiency curves (eta_th_*_bound, eta_el_*_bound), if part of the schedule
+        eta_th = _get(schedule, f'{unit.name}.eta_th')
+        if eta_th is not None:
+            violations[f'{unit.name}.eta_th_curve'] = np.abs(eta_th - on * unit.interp(heat, unit.eta_th))
+        eta_el = _get(schedule, f'{unit.name}.eta_el')
+        if eta_el is not None and unit.kind == 'chp':
+            violations[f'{unit.name}.eta_el_curve'] = np.abs(eta_el - on * unit.interp(heat, unit.eta_el))
+
+        # Region binaries of the piecewise linear curve, if part of the schedule
+        y1 = _get(schedule, f'{unit.name}.y1')
+        y2 = _get(schedule, f'{unit.name}.y2')
+        if y1 is not None and y2 is not None:
+            violations[f'{unit.name}.y_activation'] = np.abs(y1 + y2 - on)
+            violations[f'{unit.name}.heat_upper_bound_y1'] = _excess(heat, unit.heat[1] * y1)
+            violations[f'{unit.name}.heat_lower_bound_y2'] = _excess(unit.heat[1] * y2, heat)
+
+    # Heat storage
+    storage = plant.heat_storage1
+    heat_charge = _get(schedule, 'heat_storage1.heat_charge')
+    heat_discharge = _get(schedule, 'heat_storage1.heat_discharge')
+    heat_capacity = storage.initial_soc + np.cumsum(heat_charge - heat_discharge, axis=-1)
+
+    violations['heat_storage1.max_heat_charge'] = _excess(heat_charge, storage.max_heat)
+    violations['heat_storage1.max_heat_discharge'] = _excess(heat_discharge, storage.max_heat)
+    violations['heat_storage1.charge_discharge'] = np.minimum(heat_charge, heat_discharge)
+    violations['heat_storage1.min_heat_capacity'] = _excess(storage.min_content, heat_capacity)
+    violations['heat_storage1.max_heat_capacity'] = _excess(heat_capacity, storage.max_content)
+
+    soc_cycle = np.zeros_like(heat_capacity)
+    soc_cycle[:, -1] = np.abs(heat_capacity[:, -1] - storage.initial_soc)
+    violations['heat_storage1.soc_cycle'] = soc_cycle
+
+    given_capacity = _get(schedule, 'heat_storage1.heat_capacity')
+    if given_capacity is not None:
+        violations['heat_storage1.capacity_balance'] = np.abs(given_capacity - heat_capacity)
+
+    # Heat balance of the heat grid
+    heat_feedin = sum(heat for _, heat, _, _ in units.values()) + heat_discharge
+    violations['heat_grid.heat_balance'] = np.abs(heat_feedin - heat_charge - heat_demand)
+
+    for name in violations:
+        violations[name] = np.where(violations[name] > tolerance, violations[name], 0.0)
+
+    # Cost terms per hour
+    # Stündliche Preise der Form (T,) gelten für alle Fahrpläne (Broadcasting über n_schedules)
+    chp_units = [units[unit.name] for unit in plant.units if unit.kind == 'chp']
+    boiler1 = units['boiler1']
+    chp_power = sum(power for _, _, _, power in chp_units)
+    chp_gas = sum(gas for _, _, gas, _ in chp_units)
+    share_feed_in_grid = 1 - p['share_self_consumption']
+
+    costs = {
+        'gas_costs': sum(gas for _, _, gas, _ in units.values()) * p['gas_price'],
+        'power_costs': boiler1[1] * p['power_cost_to_heat_sales_ratio'] * p['power_price'],
+        'storage_costs': plant.storage_cost(heat_charge, heat_discharge),
+        'maintenance_costs': sum(on for on, _, _, _ in chp_units) * p['maintenance_cost'],
+        'power_revenue': chp_power * p['power_price'],
+        'heat_revenue': sum(heat for _, heat, _, _ in units.values()) * p['heat_price'],
+        'chp_revenue': (
+            chp_power * p['chp_bonus_self_consumption'] * p['share_self_consumption'] +
+            chp_power * p['chp_bonus'] * p['share_feed_in'] +
+            chp_power * share_feed_in_grid * p['chp_index_eex'] +
+            chp_power * share_feed_in_grid * p['avoided_grid_fees'] +
+            chp_gas * p['energy_tax_refund_gas']
+        ),
+    }
+
+    return Simulation(heat_capacity, costs, violations)
+
+
+def load_timeseries(filepath):
+    """Load a timeseries CSV of the models as schedule dict.
+
+    The scenario prefix of the stochastic timeseries ('Scenario1.chp1.heat')
+    is removed.
+    """
+    df_data = pd.read_csv(filepath, index_col=0)
+    df_data.columns = [re.sub(r'^Scenario\d+\.', '', column) for column in df_data.columns]
+    return {column: df_data[column].to_numpy(dtype=float) for column in df_data.columns}
+
+
+def stack_schedules(schedules):
+    """Stack schedules of equal length into arrays of shape (n_schedules, T)."""
+    keys = set.intersection(*(set(schedule) for schedule in schedules))
+    return {key: np.vstack([np.asarray(schedule[key], dtype=float) for schedule in schedules]) for key in keys}
+
+
+def validate_timeseries(plant=None):
+    """Validate the stored deterministic timeseries against their objective values."""
+    if plant is None:
+        plant = Plant()
+
+    path_timeseries = resolve_path(plant.config, 'deterministic', 'timeseries_path')
+    path_objectives = resolve_path(plant.config, 'deterministic', 'objectives_path')
+
+    files = sorted(glob.glob(f'{path_timeseries}d_*_ts.csv'))
+    simulation = simulate(stack_schedules([load_timeseries(f) for f in files]), plant)
+    violations = simulation.violations_per_hour().sum(axis=-1)
+
+    rows = []
+    for i, file in enumerate(files):
+        base_name = os.path.basename(file)
+        objective_file = path_objectives + base_name.replace('_ts.csv', '_obj.csv')
+        mip_objective, status = np.nan, None
+        if os.path.exists(objective_file):
+            df_objective = pd.read_csv(objective_file)
+            mip_objective = df_objective['ObjectiveValue'].iloc[0]
+            # heuristic: Ergebnis des Fallbacks ohne Solver (main_d.Model.use_dispatch)
+            status = df_objective['Status'].iloc[0] if 'Status' in df_objective.columns else None
+        start_date, _, period = extract_scenario_info(re.sub(r'^d_(weighted_)?', 'heat_demand_', base_name.replace('_ts.csv', '.json')))
+        rows.append({
+            'File': base_name,
+            'StartDate': start_date,
+            'Period': period,
+            'MIPObjective': mip_objective,
+            'Status': status,
+            'SimulatedObjective': simulation.objective_value[i],
+            'Violations': violations[i],
+        })
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print(validate_timeseries().to_string(index=False))
@@ -0,0 +1,190 @@
+"""Incremental ingest of measured and forecast heat demand with online error statistics.
+
+The measurement history is a directory of columnar chunks (one .npz per
+ingest with time, actual and forecast demand). The hourly error model (mean
+and standard deviation of actual - forecast per hour of the day, UTC, as in
+common.demands.load_forecast_errors) is kept as Welford state (count, mean,
+M2 per hour) in error_model.npz and updated with every ingest by merging the
+statistics of the new rows. With a sliding window (in days) the rows leaving
+the window are removed from the state again, so the state never requires a
+rescan of the history.
+
+Usage (from the models directory):
+    python -m common.measurements HISTORY_PATH ingest FILE.csv [--window DAYS]
+    python -m common.measurements HISTORY_PATH errors
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.demands import load_validation_data
+
+
+def _nanoseconds(time):
+    """UTC timestamps as int64 nanoseconds (independent of the resolution pandas chose)."""
+    return pd.to_datetime(time, utc=True).dt.tz_convert(None).to_numpy().astype('datetime64[ns]').astype(np.int64)
+
+
+class HourlyErrorStats:
+    """Count, mean and M2 (sum of squared deviations) of the error per hour of the day."""
+
+    def __init__(self, count=None, mean=None, m2=None):
+        self.count = np.zeros(24) if count is None else np.asarray(count, dtype=float)
+        self.mean = np.zeros(24) if mean is None else np.asarray(mean, dtype=float)
+        self.m2 = np.zeros(24) if m2 is None else np.asarray(m2, dtype=float)
+
+    @staticmethod
+    def _batch(hours, errors):
+        """Count, mean and M2 of a batch per hour."""
+        count = np.bincount(hours, minlength=24).astype(float)
+        mean = np.divide(np.bincount(hours, weights=errors, minlength=24), count,
+                         out=np.zeros(24), where=count > 0)
+        m2 = np.bincount(hours, weights=(errors - mean[hours]) ** 2, minlength=24)
+        return count, mean, m2
+
+    def add(self, hours, errors):
+        """Merge a batch of errors into the statistics (parallel Welford update)."""
+        count_b, mean_b, m2_b = self._batch(np.asarray(hours, dtype=int), np.asarray(errors, dtype=float))
+        count = self.count + count_b
+        delta = mean_b - self.mean
+        safe = np.where(count > 0, count, 1)
+        self.mean = np.where(count > 0, self.mean + delta * count_b / safe, 0.0)
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.count * count_b / safe
+        self.count = count
+
+    def remove(self, hours, errors):
+        """Remove a batch of errors that were added before (inverse of add)."""
+        count_b, mean_b, m2_b = self._batch(np.asarray(hours, dtype=int), np.asarray(errors, dtype=float))
+        count = self.count - count_b
+        safe = np.where(count > 0, count, 1)
+        mean = np.where(count > 0, (self.count * self.mean - count_b * mean_b) / safe, 0.0)
+        delta = mean_b - mean
+        m2 = self.m2 - m2_b - delta ** 2 * count * count_b / np.where(self.count > 0, self.count, 1)
+        self.m2 = np.where(count > 0, np.maximum(m2, 0.0), 0.0)
+        self.mean = mean
+        self.count = count
+
+    @property
+    def mu(self):
+        return self.mean.copy()
+
+    @property
+    def sigma(self):
+        """Sample standard deviation (ddof=1, as pandas std)."""
+        return np.sqrt(np.divide(self.m2, self.count - 1, out=np.full(24, np.nan), where=self.count > 1))
+
+
+class MeasurementHistory:
+    """Columnar history of measurements with an incrementally updated error model."""
+
+    def __init__(self, path, window=None):
+        self.path = path
+        self.state_file = os.path.join(path, 'error_model.npz')
+        os.makedirs(path, exist_ok=True)
+
+        if os.path.exists(self.state_file):
+            state = np.load(self.state_file)
+            self.stats = HourlyErrorStats(state['count'], state['mean'], state['m2'])
+            self.last_time = int(state['last_time'])
+            stored_window = int(state['window'])
+            self.window = stored_window if stored_window > 0 else None
+            self.window_time, self.window_hour, self.window_error = state['window_time'], state['window_hour'], state['window_error']
+            if window is not None and window != self.window:
+                raise ValueError(f"History {path} uses a window of {self.window} days, not {window}")
+        else:
+            self.stats = HourlyErrorStats()
+            self.last_time = np.iinfo(np.int64).min
+            self.window = window
+            self.window_time = np.zeros(0, dtype=np.int64)
+            self.window_hour = np.zeros(0, dtype=int)
+            self.window_error = np.zeros(0)
+
+    def _save_state(self):
+        np.savez(
+            self.state_file, count=self.stats.count, mean=self.stats.mean, m2=self.stats.m2,
+            last_time=self.last_time, window=self.window or 0,
+            window_time=self.window_time, window_hour=self.window_hour, window_error=self.window_error
+        )
+
+    def ingest(self, df_data):
+        """Append new rows (time, actual_demand, forecast_demand) and update the error model.
+
+        Rows not newer than the last ingested time are skipped. Returns the
+        number of appended rows.
+        """
+        time = pd.to_datetime(df_data['time'], utc=True)
+        new = _nanoseconds(time) > self.last_time
+        df_new = df_data[new].assign(time=time[new]).sort_values('time')
+        if df_new.empty:
+            return 0
+
+        time_ns = _nanoseconds(df_new['time'])
+        actual = df_new['actual_demand'].to_numpy(dtype=float)
+        forecast = df_new['forecast_demand'].to_numpy(dtype=float)
+        hours = df_new['time'].dt.hour.to_numpy()
+        error = actual - forecast
+
+        chunk = os.path.join(self.path, f'chunk_{time_ns[0]}.npz')
+        np.savez(chunk, time=time_ns, actual_demand=actual, forecast_demand=forecast)
+
+        self.stats.add(hours, error)
+        self.last_time = int(time_ns[-1])
+
+        if self.window is not None:
+            # Zeilen außerhalb des Fensters wieder aus der Statistik entfernen
+            self.window_time = np.concatenate([self.window_time, time_ns])
+            self.window_hour = np.concatenate([self.window_hour, hours])
+            self.window_error = np.concatenate([self.window_error, error])
+            expired = self.window_time <= self.last_time - pd.Timedelta(days=self.window).value
+            self.stats.remove(self.window_hour[expired], self.window_error[expired])
+            self.window_time = self.window_time[~expired]
+            self.window_hour = self.window_hour[~expired]
+            self.window_error = self.window_error[~expired]
+
+        self._save_state()
+        return len(df_new)
+
+    def ingest_csv(self, file):
+        """Ingest a file in the format of the validation data (time, delivered heat, predicted heat)."""
+        return self.ingest(load_validation_data(file))
+
+    def errors(self):
+        """Mean and standard deviation of the error per hour of the day, from the stored state."""
+        return self.stats.mu, self.stats.sigma
+
+    def data(self):
+        """Full history in the format of common.demands.load_validation_data."""
+        chunks = [np.load(chunk) for chunk in sorted(glob.glob(os.path.join(self.path, 'chunk_*.npz')))]
+        if not chunks:
+            return pd.DataFrame(columns=['time', 'hour', 'actual_demand', 'forecast_demand', 'error'])
+        time = pd.to_datetime(np.concatenate([chunk['time'] for chunk in chunks]).astype('datetime64[ns]'), utc=True)
+        df_data = pd.DataFrame({
+            'time': time,
+            'hour': time.hour,
+            'actual_demand': np.concatenate([chunk['actual_demand'] for chunk in chunks]),
+            'forecast_demand': np.concatenate([chunk['forecast_demand'] for chunk in chunks]),
+        })
+        df_data['error'] = df_data['actual_demand'] - df_data['forecast_demand']
+        return df_data.sort_values('time').reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest measurements and show the hourly error model.')
+    parser.add_argument('path', help='directory of the measurement history')
+    parser.add_argument('command', choices=['ingest', 'errors'])
+    parser.add_argument('file', nargs='?', help='CSV file in the format of the validation data')
+    parser.add_argument('--window', type=int, default=None, help='sliding window in days (new history only)')
+    args = parser.parse_args()
+
+    history = MeasurementHistory(args.path, args.window)
+    if args.command == 'ingest':
+        print(f"{history.ingest_csv(args.file)} rows ingested into {args.path}")
+    mu, sigma = history.errors()
+    print(pd.DataFrame({'mean': mu, 'std': sigma, 'count': history.stats.count.astype(int)}).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Study metrics per day from the written objective values (compute_metrics.ipynb).
+
+For every day with a reduced scenario file:
+
+    WS      probability-weighted objective of the wait-and-see runs (main_d, scenarios)
+    RP      probability-weighted scenario objectives of the stochastic model (main_s)
+    RP_SC   as RP for the special case (SPECIAL_CASE '_USE_EXT_COST_10')
+    DM      objective of the deterministic run on the weighted demand
+    EEV     weighted objective of the deterministic plan in the scenarios, first
+            stage plus closed-form recourse (common.recourse_evaluator)
+    Actual  objective on the actual demand (perfect information)
+    EVPI = RP - WS, VSS = EEV - RP
+
+Missing result files give NaN for the metrics that need them.
+
+Usage (from the models directory):
+    python -m common.metrics [START_DATE ...]
+"""
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.demands import extract_scenario_info
+from common.dispatch_simulator import load_timeseries
+from common.plant import BASE_PATH, Plant, resolve_path
+from common.recourse_evaluator import evaluate
+from common.sampling_benchmark import weighted_objective_value
+
+
+SPECIAL_CASE = '_USE_EXT_COST_10'
+OUTPUT_FILE = 'study_metrics.csv'
+
+
+def _objective_values(file, scenario_column):
+    """Objective values of a *_obj.csv file ({scenario: value}); None if the file is missing."""
+    if not os.path.exists(file):
+        print(f"Zielfunktionswerte-Datei nicht gefunden: {file}")
+        return None
+    df_obj = pd.read_csv(file)
+    df_obj.columns = df_obj.columns.str.strip()
+    if 'Status' in df_obj.columns:
+        # Ergebnisse des heuristischen Fallbacks sind keine Lösungen des Modells
+        heuristic = df_obj['Status'] == 'heuristic'
+        if heuristic.any():
+            print(f"Heuristische Ergebnisse (ohne Solver) in {file} werden nicht verwendet.")
+            df_obj.loc[heuristic, 'ObjectiveValue'] = np.nan
+    if scenario_column not in df_obj.columns:
+        return {None: float(df_obj['ObjectiveValue'].iloc[0])}
+    return dict(zip(df_obj[scenario_column], df_obj['ObjectiveValue'].astype(float)))
+
+
+def _weighted(objective_values, probabilities):
+    if objective_values is None:
+        return np.nan
+    names = [name for name in probabilities if name in objective_values]
+    return weighted_objective_value([objective_values[name] for name in names], [probabilities[name] for name in names])
+
+
+def day_metrics(start_date, end_date=None, period='day', plant=None):
+    """Metrics of one period as dict."""
+    if plant is None:
+        plant = Plant()
+    config = plant.config
+    end_date = end_date or start_date
+    day = f'{start_date}_to_{end_date}_{period}'
+
+    path_demands = resolve_path(config, 'deterministic', 'input_path') + 'demands' + os.sep
+    with open(f'{path_demands}reduced_heat_demand_scenarios_{day}.json') as f:
+        scenarios = json.load(f)
+    probabilities = {name: values['Probability'] for name, values in scenarios.items()}
+
+    path_d_obj = resolve_path(config, 'deterministic', 'objectives_path')
+    path_d_ts = resolve_path(config, 'deterministic', 'timeseries_path')
+    path_ws = resolve_path(config, 'deterministic', 'scenarios_path')
+    path_actual = resolve_path(config, 'deterministic', 'actual_path')
+    path_s_obj = resolve_path(config, 'stochastic', 'objectives_path')
+
+    ws = _weighted(_objective_values(f'{path_ws}d_scenarios_{day}_obj.csv', 'Scenario'), probabilities)
+    rp = _weighted(_objective_values(f'{path_s_obj}s_{day}_obj.csv', 'Scenario:'), probabilities)
+    rp_special = _weighted(_objective_values(f'{path_s_obj}s_{day}{SPECIAL_CASE}_obj.csv', 'Scenario:'), probabilities)
+
+    dm = _objective_values(f'{path_d_obj}d_weighted_{day}_obj.csv', 'Scenario')
+    actual = _objective_values(f'{path_actual}d_actual_{day}_obj.csv', 'Scenario')
+
+    # EEV: deterministischer Plan mit Recourse in den reduzierten Szenarien
+    eev = np.nan
+    plan_file = f'{path_d_ts}d_weighted_{day}_ts.csv'
+    if os.path.exists(plan_file):
+        names = list(scenarios)
+        hours = sorted(int(key) for key in scenarios[names[0]] if key.isdigit())
+        values = np.array([[scenarios[name][str(t)] for t in hours] for name in names])
+        costs = evaluate(load_timeseries(plan_file), values, plant).costs
+        eev = weighted_objective_value(costs, [probabilities[name] for name in names])
+
+    return {
+        'Date': start_date,
+        'WS': ws,
+        'RP': rp,
+        'RP_SC': rp_special,
+        'DM': next(iter(dm.values())) if dm else np.nan,
+        'EEV': eev,
+        'Actual': next(iter(actual.values())) if actual else np.nan,
+        'EVPI': rp - ws,
+        'VSS': eev - rp,
+    }
+
+
+def study_metrics(dates=None, period='day', output_file=None):
+    """day_metrics for all days with a scenario file (or the given start dates), written as CSV."""
+    plant = Plant()
+    path_demands = resolve_path(plant.config, 'deterministic', 'input_path') + 'demands' + os.sep
+
+    rows = []
+    for scenario_file in sorted(glob.glob(f'{path_demands}reduced_heat_demand_scenarios_*_{period}.json')):
+        start_date, end_date, _ = extract_scenario_info(scenario_file)
+        if dates is None or start_date in dates:
+            rows.append(day_metrics(start_date, end_date, period, plant))
+    df_metrics = pd.DataFrame(rows)
+
+    if output_file is None:
+        # Ausgabepfad der Postprocessing-Notebooks (relativ zu postprocessing/)
+        output_path = os.path.join(BASE_PATH, '..', '..', 'postprocessing', plant.config['postprocessing']['output_path'])
+        output_file = os.path.normpath(os.path.join(output_path, OUTPUT_FILE))
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    df_metrics.to_csv(output_file, index=False)
+    return df_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute WS, RP, EEV, EVPI and VSS per day.')
+    parser.add_argument('dates', nargs='*', help='start dates, e.g. 20230316 (default: all)')
+    parser.add_argument('--period', default='day')
+    parser.add_argument('--output', default=None, help='CSV file (default: postprocessing output path)')
+    args = parser.parse_args()
+    print(study_metrics(args.dates or None, args.period, args.output).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Snapshots of built Pyomo instances on disk, to skip the model construction on repeat runs.
+
+An instance is built (create_instance, arcs, network.expand_arcs) once and
+pickled; the next run with the same structure and data loads it instead.
+The key is a SHA-256 hash of the model source files (model module and its
+assets), the asset CSVs, the 'global' section of config.json, the Python and
+Pyomo versions and the instance data, so any change rebuilds the instance.
+
+The rules of the components (local functions of the asset modules and
+lambdas over the RunConfig in the model modules) are only needed while an
+instance is constructed and cannot be pickled; they are stored as None. A
+loaded instance can be extended (new components, e.g. chance constraints)
+and solved, but its components cannot be reconstructed.
+
+Every build and load is appended to timings.csv in the snapshot directory:
+
+    python -m common.model_snapshot report   build vs. load time per model
+    python -m common.model_snapshot clear
+
+Snapshots only pay off for large instances. Median times per instance,
+construction (create_instance and arcs) against key plus load, measured
+with the garbage collector off during the load (as in load; with it on, a
+load took 2-5 times longer and never paid off):
+
+    deterministic day model          0.026 s vs. 0.027 s
+    stochastic scenario, 24 h        0.033 s vs. 0.030 s (noise +/- 0.01 s)
+    stochastic scenario, 168 h       0.23 s  vs. 0.21-0.25 s
+    stochastic scenario, 744 h       2.5 s   vs. 1.1-1.6 s
+
+So they help for the scenario instances of the extensive form with a month
+horizon; day and week models gain nothing. Snapshots stay off by default
+(use_snapshots). build() keeps using them for a model (name including the
+horizon, e.g. stochastic_scenario_744h) only while its logged loads are
+faster than its builds on average; otherwise the model is built without
+snapshots (clear resets the timings).
+"""
+import gc
+import hashlib
+import io
+import os
+import pickle
+import sys
+import time
+import types
+
+import pandas as pd
+import pyomo.version
+
+from common.config import data_path, load_config
+from common.result_cache import ResultCache, canonical_json, file_hash
+
+
+SNAPSHOT_VERSION = 1
+TIMINGS_COLUMNS = ['model', 'key', 'action', 'seconds', 'size_mb']
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """Pickler that stores local functions, lambdas and bound methods (the construction rules) as None.
+
+    Module-level functions are pickled by reference as usual (pickle itself
+    needs some of them, e.g. copyreg._reconstructor).
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, types.MethodType):
+            return type(None), ()
+        if isinstance(obj, types.FunctionType) and ('<locals>' in obj.__qualname__ or obj.__name__ == '<lambda>'):
+            return type(None), ()
+        return NotImplemented
+
+
+class SnapshotCache:
+    """Pickled instances keyed by model structure and data."""
+
+    def __init__(self, path=None, config=None):
+        config = config or load_config()
+        self.config = config
+        self.path = path or os.path.join(data_path(config), 'output', 'snapshots')
+        self.timings_file = os.path.join(self.path, 'timings.csv')
+        # Asset-CSVs und globale Konfiguration wie beim Ergebnis-Cache
+        self._inputs_key = ResultCache(config=config).key()
+
+    def key(self, source_files, data):
+        """Key of an instance from the source files of the model and the instance data."""
+        inputs = {
+            'version': SNAPSHOT_VERSION,
+            'python': list(sys.version_info[:2]),
+            'pyomo': pyomo.version.version,
+            'sources': [file_hash(file) for file in source_files],
+            'inputs': self._inputs_key,
+            'data': canonical_json(data),
+        }
+        return hashlib.sha256(canonical_json(inputs).encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.pkl')
+
+    def _log(self, model, key, action, seconds, size):
+        os.makedirs(self.path, exist_ok=True)
+        write_header = not os.path.exists(self.timings_file)
+        with open(self.timings_file, 'a') as f:
+            if write_header:
+                f.write(','.join(TIMINGS_COLUMNS) + '\n')
+            f.write(f'{model},{key},{action},{seconds:.6f},{size / 1e6:.6f}\n')
+
+    def load(self, key, model='model'):
+        """The stored instance or None."""
+        file = self._file(key)
+        if not os.path.exists(file):
+            return None
+        start = time.perf_counter()
+        # Ohne Garbage Collector: die vielen kleinen Objekte der Instanz lösen sonst laufend Sammlungen aus
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(file, 'rb') as f:
+                instance = pickle.load(f)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self._log(model, key, 'load', time.perf_counter() - start, os.path.getsize(file))
+        return instance
+
+    def save(self, key, instance, build_seconds, model='model'):
+        """Store an instance; build_seconds is the construction time it replaces."""
+        os.makedirs(self.path, exist_ok=True)
+        buffer = io.BytesIO()
+        _SnapshotPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(instance)
+        # Erst vollständig schreiben, dann umbenennen, damit parallele Läufe nie eine halbe Datei laden
+        temporary_file = f'{self._file(key)}.tmp{os.getpid()}'
+        with open(temporary_file, 'wb') as f:
+            f.write(buffer.getbuffer())
+        os.replace(temporary_file, self._file(key))
+        self._log(model, key, 'build', build_seconds, buffer.getbuffer().nbytes)
+
+    def pays_off(self, model):
+        """False if the logged loads of the model were on average not faster than its builds (True without both)."""
+        if not os.path.exists(self.timings_file):
+            return True
+        timings = pd.read_csv(self.timings_file)
+        seconds = timings[timings['model'] == model].groupby('action')['seconds'].mean()
+        if 'build' not in seconds or 'load' not in seconds:
+            return True
+        return seconds['load'] < seconds['build']
+
+    def build(self, key, build_function, model='model'):
+        """Load the instance of the key or build it with build_function() and store it.
+
+        If snapshots do not pay off for the model (pays_off), the instance is
+        only built.
+        """
+        if not self.pays_off(model):
+            return build_function()
+        instance = self.load(key, model)
+        if instance is None:
+            start = time.perf_counter()
+            instance = build_function()
+            self.save(key, instance, time.perf_counter() - start, model)
+        return instance
+
+    def report(self):
+        """Mean build and load time per model and the time saved by the loads."""
+        if not os.path.exists(self.timings_file):
+            return pd.DataFrame()
+        timings = pd.read_csv(self.timings_file)
+        report = timings.pivot_table(index='model', columns='action', values='seconds', aggfunc=['mean', 'count'])
+        report.columns = [f'{action}_{stat}' for stat, action in report.columns]
+        report = report.reindex(columns=['build_mean', 'build_count', 'load_mean', 'load_count'])
+        report['speedup'] = report['build_mean'] / report['load_mean']
+        report['saved_seconds'] = (report['build_mean'] - report['load_mean']) * report['load_count']
+        size = timings[timings['action'] == 'build'].groupby('model')['size_mb'].mean()
+        report['size_mb'] = size
+        return report
+
+    def clear(self):
+        removed = 0
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                os.remove(os.path.join(self.path, name))
+                removed += name.endswith('.pkl')
+        return removed
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    cache = SnapshotCache()
+    if command == 'report':
+        print(cache.report().to_string())
+    elif command == 'clear':
+        print(f"{cache.clear()} snapshots removed")
+    else:
+        print("Usage: python -m common.model_snapshot report | clear")
@@ -0,0 +1,407 @@
+"""Orchestration of a full study as a dependency graph of (date, case) jobs.
+
+Instead of toggling run_multiple_scenarios, run_actual_heat_demand,
+USE_WEIGHTED_HEAT_DEMAND, automate_processing and USE_SPECIAL_CASE in
+main_d.py / main_s.py, every job of a day is a node:
+
+    scenarios:D ──> weighted:D ──> deterministic:D ─┐
+        ├─────────> wait_and_see:D ─────────────────┤
+        ├─────────> stochastic:D ───────────────────┼──> metrics:<dates>
+        └─────────> special_case:D ─────────────────┤
+    actual:D ───────────────────────────────────────┘
+
+The model nodes load the demands and scenarios from the columnar demand
+store (common.demand_store), which the node demand_store brings up to date
+once after all scenario and weighted demand nodes. A new scenario file hence
+runs all model nodes again; unchanged days are restored from the result
+cache.
+
+The metrics node is named by its date set (metrics:20230316 for one day,
+metrics:20230316..20230710_<hash> for several), so studies over different
+dates keep separate states.
+
+Every node is a subprocess in its model directory (main_d and model_s both
+import a package named 'assets' and read '../config.json'), so nodes are
+isolated, independent nodes run in parallel and a node that exceeds its
+timeout is killed. Failed nodes are retried; nodes depending on a node that
+finally failed are skipped. The status of every node is written to a JSON
+state file after each node, so a study resumes after a crash or an
+interruption without redoing finished nodes. Nodes with output files (the
+scenario and weighted demand files) also count as finished if all outputs
+exist. A finished node runs again if one of its dependencies runs again or
+finished after it (e.g. the metrics after a day was solved again).
+
+The stochastic nodes solve the EF on the scenarios of the scenario file
+(use_saa=False), the scenarios the metrics are weighted with.
+
+With --cores the solves are planned by common.solve_scheduler: the number of
+parallel nodes and the Threads option of every solve follow from the runtime
+predicted from earlier solver logs, and ready nodes start longest-first.
+
+Usage (from the models directory):
+    python -m common.pipeline [START_DATE ...] [--cases deterministic actual ...] [--workers 4]
+                              [--retries 1] [--timeout 3600] [--force] [--dry-run] [--no-cache]
+                              [--cores 32]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from common.demands import extract_scenario_info
+from common.config import BASE_PATH, load_config, resolve_path
+from common.solve_scheduler import PERIOD_HOURS, SolveJob, plan, scenario_count
+
+
+MODELS_PATH = os.path.normpath(os.path.join(BASE_PATH, '..'))
+CASES = ['scenarios', 'weighted', 'deterministic', 'wait_and_see', 'actual', 'stochastic', 'special_case', 'metrics']
+SOLVE_CASES = ['deterministic', 'wait_and_see', 'actual', 'stochastic', 'special_case']
+
+
+class Node:
+    """A job of the study: a command with its working directory and dependencies.
+
+    outputs: files whose existence marks the node as finished. If
+    require_success is False the node also runs after failed dependencies
+    (e.g. the metrics, which are NaN for missing results). Of the ready
+    nodes the one with the highest priority (predicted seconds) starts first;
+    env are additional environment variables of the subprocess.
+    """
+
+    def __init__(self, name, command, cwd=MODELS_PATH, dependencies=(), outputs=(), retries=1, timeout=None,
+                 require_success=True, priority=0.0, env=None):
+        self.name = name
+        self.command = list(command)
+        self.cwd = cwd
+        self.dependencies = list(dependencies)
+        self.outputs = list(outputs)
+        self.retries = retries
+        self.timeout = timeout
+        self.require_success = require_success
+        self.priority = priority
+        self.env = env
+
+
+def _python_call(module, call):
+    """Command calling a function of a model module (e.g. main_d.run_actual(['20230316']))."""
+    return [sys.executable, '-c', f'import {module}; {module}.{call}']
+
+
+class Pipeline:
+    """Dependency graph of nodes with a persistent state for resuming."""
+
+    def __init__(self, state_file, log_path=None):
+        self.nodes = {}
+        self.state_file = state_file
+        self.log_path = log_path or os.path.join(os.path.dirname(os.path.abspath(state_file)), 'logs')
+        self.state = {}
+        self.schedule = None
+        if os.path.exists(state_file):
+            with open(state_file) as f:
+                self.state = json.load(f)
+
+    def add(self, node):
+        if node.name in self.nodes:
+            raise ValueError(f"Node {node.name} already exists")
+        self.nodes[node.name] = node
+        return node
+
+    def order(self):
+        """Node names in topological order; raises ValueError for unknown dependencies or cycles."""
+        for node in self.nodes.values():
+            for dependency in node.dependencies:
+                if dependency not in self.nodes:
+                    raise ValueError(f"Node {node.name} depends on unknown node {dependency}")
+
+        order, visiting, visited = [], set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in the pipeline at node {name}")
+            visiting.add(name)
+            for dependency in self.nodes[name].dependencies:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name)
+        return order
+
+    def finished(self, name):
+        """True if the node finished in an earlier run or all of its outputs exist."""
+        node = self.nodes[name]
+        if self.state.get(name, {}).get('status') == 'done':
+            return True
+        return bool(node.outputs) and all(os.path.exists(output) for output in node.outputs)
+
+    def pending(self):
+        """Nodes to run, in topological order.
+
+        A node is pending if it is not finished, or if one of its dependencies
+        is pending or finished after it (state entries of the last runs).
+        """
+        pending = []
+        for name in self.order():
+            finished_at = self.state.get(name, {}).get('finished')
+            rerun = any(
+                dependency in pending or (
+                    finished_at is not None and self.state.get(dependency, {}).get('status') == 'done' and
+                    self.state[dependency]['finished'] > finished_at
+                )
+                for dependency in self.nodes[name].dependencies
+            )
+            if rerun or not self.finished(name):
+                pending.append(name)
+        return pending
+
+    def _save_state(self):
+        # Erst in eine temporäre Datei schreiben, damit ein Absturz keinen halben Zustand hinterlässt
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        temporary_file = self.state_file + '.tmp'
+        with open(temporary_file, 'w') as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(temporary_file, self.state_file)
+
+    def _execute(self, node):
+        """Run a node with retries; returns its state entry."""
+        os.makedirs(self.log_path, exist_ok=True)
+        log_file = os.path.join(self.log_path, node.name.replace(':', '_') + '.log')
+        start = time.perf_counter()
+
+        for attempt in range(1, node.retries + 2):
+            with open(log_file, 'a') as log:
+                log.write(f"\n### {datetime.now().isoformat(timespec='seconds')} attempt {attempt}: "
+                          f"{' '.join(node.command)} ###\n")
+                log.flush()
+                try:
+                    env = None if node.env is None else {**os.environ, **node.env}
+                    completed = subprocess.run(node.command, cwd=node.cwd, stdout=log, stderr=subprocess.STDOUT,
+                                               timeout=node.timeout, env=env)
+                    error = None if completed.returncode == 0 else f'exit code {completed.returncode}'
+                except subprocess.TimeoutExpired:
+                    error = f'timeout after {node.timeout} s'
+            if error is None:
+                break
+
+        return {
+            'status': 'done' if error is None else 'failed',
+            'attempts': attempt,
+            'runtime': time.perf_counter() - start,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'error': error,
+            'log': log_file,
+        }
+
+    def run(self, workers=None, force=False):
+        """Run all unfinished nodes, independent nodes in parallel; returns the state of all nodes."""
+        order = self.order()
+        if force:
+            self.state = {}
+
+        pending = self.pending()
+        done = {name for name in order if name not in pending}
+        failed = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            while pending or running:
+                # Längste Knoten zuerst (LPT), damit kein langer Lauf am Ende allein übrig bleibt
+                for name in sorted(pending, key=lambda name: -self.nodes[name].priority):
+                    node = self.nodes[name]
+                    if any(dependency in failed for dependency in node.dependencies) and node.require_success:
+                        # Abhängigkeit endgültig fehlgeschlagen: Knoten überspringen (wird beim nächsten Lauf erneut versucht)
+                        pending.remove(name)
+                        failed.add(name)
+                        self.state[name] = {'status': 'skipped', 'error': 'failed dependency'}
+                        print(f"[pipeline] {name} skipped (failed dependency)")
+                    elif all(dependency in done or dependency in failed for dependency in node.dependencies):
+                        pending.remove(name)
+                        running[executor.submit(self._execute, node)] = name
+                        print(f"[pipeline] {name} started")
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    self.state[name] = future.result()
+                    (done if self.state[name]['status'] == 'done' else failed).add(name)
+                    print(f"[pipeline] {name} {self.state[name]['status']} "
+                          f"({self.state[name]['runtime']:.1f} s, attempt {self.state[name]['attempts']})")
+                self._save_state()
+
+        self._save_state()
+        return {name: self.state.get(name, {'status': 'done'}) for name in order}
+
+
+def default_state_file(config=None):
+    """State file of the study pipeline (data/output/pipeline/state.json)."""
+    config = config or load_config()
+    output_path = os.path.join(resolve_path(config, 'deterministic', 'output_path'), '..', 'pipeline')
+    return os.path.normpath(os.path.join(output_path, 'state.json'))
+
+
+def study_dates(config=None):
+    """Start dates (YYYYMMDD) of all daily forecast files."""
+    config = config or load_config()
+    path_demands = resolve_path(config, 'deterministic', 'input_path') + 'demands'
+    dates = [extract_scenario_info(file)[0] for file in glob.glob(os.path.join(path_demands, 'heat_demand_*_day.json'))]
+    return sorted(date for date in dates if date is not None)
+
+
+def solve_jobs(dates, cases=SOLVE_CASES, config=None, period='day'):
+    """SolveJob of every solve node (size of the solves for the runtime prediction)."""
+    config = config or load_config()
+    path_demands = resolve_path(config, 'deterministic', 'input_path') + 'demands' + os.sep
+    horizon = PERIOD_HOURS[period]
+    jobs = []
+    for date in dates:
+        scenarios = scenario_count(f'{path_demands}reduced_heat_demand_scenarios_{date}_to_{date}_{period}.json')
+        sizes = {
+            'deterministic': dict(scenarios=1),
+            'actual': dict(scenarios=1),
+            # Wait-and-see: ein deterministisches Modell je Szenario, nacheinander
+            'wait_and_see': dict(scenarios=1, repeats=scenarios),
+            # run_day löst das EF mit scen_count Szenarien (Standard 10)
+            'stochastic': dict(scenarios=10, model='stochastic'),
+            'special_case': dict(scenarios=10, model='stochastic'),
+        }
+        jobs += [SolveJob(f'{case}:{date}', horizon=horizon, **sizes[case]) for case in cases if case in sizes]
+    return jobs
+
+
+def metrics_node_name(dates):
+    """Name of the metrics node of a date set: metrics:D for one day, else first..last with a hash of all dates."""
+    dates = sorted(dates)
+    if len(dates) == 1:
+        return f'metrics:{dates[0]}'
+    digest = hashlib.sha1(','.join(dates).encode()).hexdigest()[:8]
+    return f'metrics:{dates[0]}..{dates[-1]}_{digest}'
+
+
+def study_pipeline(dates=None, cases=CASES, state_file=None, retries=1, timeout=None, seed=42, use_cache=True,
+                   cores=None):
+    """Pipeline of a full study for the given start dates (default: all days with a forecast).
+
+    With use_cache the model nodes restore unchanged runs from common.result_cache.
+    With cores the solve nodes are planned for that many cores (common.solve_scheduler);
+    the plan is pipeline.schedule.
+    """
+    config = load_config()
+    dates = study_dates(config) if dates is None else list(dates)
+    pipeline = Pipeline(state_file or default_state_file(config))
+    path_demands = resolve_path(config, 'deterministic', 'input_path') + 'demands' + os.sep
+    deterministic_path = os.path.join(MODELS_PATH, 'deterministic')
+    stochastic_path = os.path.join(MODELS_PATH, 'stochastic')
+
+    solver_arg = {'main_d': '', 'main_s': ''}
+    env = None
+    if cores:
+        pipeline.schedule = plan(solve_jobs(dates, cases, config), cores)
+        threads = pipeline.schedule.threads
+        # Threads ist der Gurobi-Parameter (SOLVER_NAME beider Modelle)
+        solver_arg = {module: f', solver_options=dict({module}.SOLVER_OPTIONS, Threads={threads})'
+                      for module in solver_arg}
+        # NumPy/BLAS der Prozesse ebenfalls auf das Budget begrenzen
+        env = {name: str(threads) for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')}
+
+    # Die Modellknoten lesen Bedarfe und Szenarien aus dem Demand Store, der einmal nach allen
+    # Szenario- und Bedarfsdateien erzeugt wird (parallele Knoten bauen ihn so nicht gleichzeitig neu)
+    store_node = 'demand_store' if any(case in SOLVE_CASES for case in cases) else None
+
+    def add(case, date, command, cwd=MODELS_PATH, dependencies=(), outputs=()):
+        if case not in cases:
+            return
+        name = f'{case}:{date}'
+        dependencies = [f'{dependency}:{date}' for dependency in dependencies if dependency in cases]
+        if store_node is not None and case in SOLVE_CASES:
+            dependencies.append(store_node)
+        priority = pipeline.schedule.seconds.get(name, 0.0) if pipeline.schedule else 0.0
+        pipeline.add(Node(name, command, cwd, dependencies, outputs, retries, timeout, priority=priority,
+                          env=env if case in SOLVE_CASES else None))
+
+    for date in dates:
+        iso_date = f'{date[:4]}-{date[4:6]}-{date[6:]}'
+        dates_arg = repr([date])
+        options_d, options_s = solver_arg['main_d'], solver_arg['main_s']
+
+        add('scenarios', date, [sys.executable, '-m', 'common.scenario_generation', iso_date, '--seed', str(seed)],
+            outputs=[f'{path_demands}reduced_heat_demand_scenarios_{date}_to_{date}_day.json'])
+        add('weighted', date, [sys.executable, '-m', 'common.weighted_demand', date, date], dependencies=['scenarios'],
+            outputs=[f'{path_demands}weighted_heat_demand{os.sep}weighted_heat_demand_{date}.json'])
+        add('deterministic', date, _python_call('main_d', f'run_forecast({dates_arg}, weighted=True, use_demand_store=True, use_cache={use_cache}{options_d})'),
+            deterministic_path, ['weighted'])
+        add('wait_and_see', date, _python_call('main_d', f'run_scenarios({dates_arg}, use_demand_store=True, use_cache={use_cache}{options_d})'),
+            deterministic_path, ['scenarios'])
+        add('actual', date, _python_call('main_d', f'run_actual({dates_arg}, use_demand_store=True, use_cache={use_cache}{options_d})'), deterministic_path)
+        add('stochastic', date, _python_call('main_s', f'run({dates_arg}, use_saa=False, use_demand_store=True, use_cache={use_cache}{options_s})'),
+            stochastic_path, ['scenarios'])
+        add('special_case', date, _python_call('main_s', f'run({dates_arg}, use_special_case=True, use_saa=False, use_demand_store=True, use_cache={use_cache}{options_s})'),
+            stochastic_path, ['scenarios'])
+
+    if store_node is not None:
+        inputs = [name for name in pipeline.nodes if name.split(':')[0] in ('scenarios', 'weighted')]
+        pipeline.add(Node(store_node, _python_call('common.demand_store', 'DemandStore.open()'), dependencies=inputs,
+                          retries=retries, timeout=timeout))
+
+    if 'metrics' in cases:
+        pipeline.add(Node(
+            metrics_node_name(dates), [sys.executable, '-m', 'common.metrics', *dates], dependencies=list(pipeline.nodes),
+            retries=retries, timeout=timeout, require_success=False
+        ))
+
+    return pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a full study as a dependency graph of jobs.')
+    parser.add_argument('dates', nargs='*', help='start dates, e.g. 20230316 (default: all days)')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=CASES)
+    parser.add_argument('--workers', type=int, default=None, help='parallel nodes (default: number of cores)')
+    parser.add_argument('--retries', type=int, default=1, help='retries of a failed node')
+    parser.add_argument('--timeout', type=float, default=None, help='timeout of a node in seconds')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the scenario generation')
+    parser.add_argument('--state', default=None, help='state file (default: data/output/pipeline/state.json)')
+    parser.add_argument('--force', action='store_true', help='ignore the state of earlier runs (nodes with existing outputs stay finished)')
+    parser.add_argument('--dry-run', action='store_true', help='only print the nodes that would run')
+    parser.add_argument('--no-cache', action='store_true', help='solve every model node, ignoring the result cache')
+    parser.add_argument('--cores', type=int, default=None,
+                        help='plan processes and solver threads for this many cores (common.solve_scheduler)')
+    args = parser.parse_args()
+
+    pipeline = study_pipeline(args.dates or None, args.cases, args.state, args.retries, args.timeout, args.seed,
+                              not args.no_cache, args.cores)
+    workers = args.workers
+    if pipeline.schedule is not None:
+        workers = workers or pipeline.schedule.processes
+        print(f"Plan for {args.cores} cores: {pipeline.schedule.processes} processes with {pipeline.schedule.threads} "
+              f"threads, predicted makespan of the solves {pipeline.schedule.makespan:.0f} s")
+    if args.dry_run:
+        if args.force:
+            pipeline.state = {}
+        pending = pipeline.pending()
+        for name in pipeline.order():
+            status = 'pending' if name in pending else 'finished'
+            predicted = f"~{pipeline.nodes[name].priority:.0f} s " if pipeline.nodes[name].priority else ''
+            print(f"{name:<28} {status:<9} {predicted}after {', '.join(pipeline.nodes[name].dependencies) or '-'}")
+        return
+
+    state = pipeline.run(workers, args.force)
+    failed = [name for name, entry in state.items() if entry['status'] != 'done']
+    print(f"{len(state) - len(failed)} of {len(state)} nodes done" + (f", not done: {', '.join(failed)}" if failed else ''))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import copy
+
+import numpy as np
+
+from common.asset_specs import storage_spec, unit_spec
+# Konfiguration und Pfade (bleiben über common.plant importierbar)
+from common.config import BASE_PATH, CONFIG_FILE, load_config, resolve_path
+from common.price_series import PRICE_FILES
+from common.run_config import PRICE_KEYS
+
+
+class Unit:
+    """Operating curve of a CHP or boiler, from the UnitSpec of its operation CSV."""
+
+    def __init__(self, name, kind, filepath):
+        self.name = name
+        self.kind = kind
+        self.get_data(filepath)
+
+    def get_data(self, filepath):
+        spec = unit_spec(filepath)
+
+        # Breakpoints 1 (min), 2 and 3 (max) of the piecewise linear curve
+        self.heat = np.array(spec.heat)
+        self.eta_th = np.array(spec.eta_th)
+        self.gas = np.array(spec.gas)
+        self.eta_el = np.array(spec.eta_el)
+        self.power = np.array(spec.power)
+
+    @property
+    def heat_min(self):
+        return self.heat[0]
+
+    @property
+    def heat_max(self):
+        # heat_upper_bound_y1_constr (heat <= heat_2 * y1) and y_activation_constr
+        # limit the operation of the models to region 1 (y1 = bin, y2 = 0)
+        return self.heat[1]
+
+    def interp(self, heat, values):
+        """Interpolate a curve (gas, power, eta_th, eta_el) at the given heat output."""
+        return np.interp(heat, self.heat, values)
+
+
+class Storage:
+    """Limits of the heat storage, from the StorageSpec of heat_storage.csv."""
+
+    def __init__(self, name, filepath):
+        self.name = name
+        self.get_data(filepath)
+
+    def get_data(self, filepath):
+        spec = storage_spec(filepath)
+        self.max_heat = spec.max_heat
+        self.min_content = spec.min_content
+        self.max_content = spec.max_content
+        self.initial_soc = spec.initial_soc
+
+
+class Plant:
+    """Assets and prices of the plant as plain NumPy data (no Pyomo).
+
+    The prices are the constant prices of config.json. A plant of
+    from_run_config has the prices of a RunConfig instead, with gas_price,
+    power_price and heat_price as arrays over the hours of the horizon (the
+    GAS_PRICE[t], POWER_PRICE[t], HEAT_PRICE[t] of the models).
+    """
+
+    def __init__(self, config=None):
+        if config is None:
+            config = load_config()
+
+        self.config = config
+        self.prices = dict(config['global'])
+        path_in = resolve_path(config, 'deterministic', 'input_path')
+
+        self.chp1 = Unit('chp1', 'chp', path_in + 'assets/chp_operation_1.csv')
+        self.chp2 = Unit('chp2', 'chp', path_in + 'assets/chp_operation_2.csv')
+        self.boiler1 = Unit('boiler1', 'boiler', path_in + 'assets/boiler_operation.csv')
+        self.heat_storage1 = Storage('heat_storage1', path_in + 'assets/heat_storage.csv')
+
+    @classmethod
+    def from_run_config(cls, run_config, t_values, config=None):
+        """Plant with the prices of a RunConfig, the hourly ones (RunConfig.hourly_prices) for the hours t_values."""
+        t_values = list(t_values)
+        plant = cls(config)
+        plant.prices.update({key: getattr(run_config, key) for key in PRICE_KEYS})
+        for key, values in run_config.hourly_prices(t_values).items():
+            plant.prices[key] = np.array([values[t] for t in t_values], dtype=float)
+        return plant
+
+    @property
+    def hourly(self):
+        """True if the plant has prices per hour."""
+        return any(np.ndim(self.prices[key]) > 0 for key in PRICE_FILES)
+
+    def hour(self, t):
+        """Plant with the scalar prices of hour index t (0-based); the plant itself if its prices are constant."""
+        if not self.hourly:
+            return self
+        plant = copy.copy(self)
+        plant.prices = {key: value[t] if np.ndim(value) > 0 else value for key, value in self.prices.items()}
+        return plant
+
+    @property
+    def units(self):
+        return [self.chp1, self.chp2, self.boiler1]
+
+    def unit_cost(self, unit, heat):
+        """Hourly objective contribution of a running unit at the given heat output.
+
+        Same terms as _gas_costs, _power_costs, _maintenance_costs,
+        _power_revenue, _heat_revenue and _chp_revenue of the models. With
+        hourly prices the cost of a single hour comes from hour(t).
+        """
+        p = self.prices
+        gas = unit.interp(heat, unit.gas)
+        power = unit.interp(heat, unit.power)
+
+        if unit.kind == 'boiler':
+            return (
+                gas * p['gas_price'] +
+                heat * p['power_cost_to_heat_sales_ratio'] * p['power_price'] -
+                heat * p['heat_price']
+            )
+
+        power_value = (
+            p['power_price'] +
+            p['chp_bonus_self_consumption'] * p['share_self_consumption'] +
+            p['chp_bonus'] * p['share_feed_in'] +
+            (1 - p['share_self_consumption']) * (p['chp_index_eex'] + p['avoided_grid_fees'])
+        )
+        return (
+            gas * (p['gas_price'] - p['energy_tax_refund_gas']) +
+            p['maintenance_cost'] -
+            power * power_value -
+            heat * p['heat_price']
+        )
+
+    def storage_cost(self, heat_charge, heat_discharge):
+        """Hourly storage costs (_storage_costs)."""
+        return heat_charge * self.prices['cost_charge'] + heat_discharge * self.prices['cost_discharge']
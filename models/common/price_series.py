@@ -0,0 +1,58 @@
+"""Hourly price profiles of data/input/prices (gas_price.csv, power_price.csv, heat_price.csv).
+
+The files hold one day (t = 1..24, column value); the models calculate in €/kWh
+like the constant prices of config.json. The unit of the files is not
+documented with the data: the default FILE_UNIT reads them as ct/kWh, which
+fits gas (16-18) and power (-12..61) against 15.43 and 25.1 ct in config.json,
+but the heat profile (1.5-8.5) stays below the 10.5 ct of heat_price. The
+factor to €/kWh is therefore a parameter (price_file_unit in the 'global'
+section of config.json, RunConfig.price_file_unit) and has to be set for every
+data source. Longer horizons repeat the daily profile.
+
+The models get the prices as hourly, mutable parameters GAS_PRICE[t],
+POWER_PRICE[t] and HEAT_PRICE[t]: constant with the prices of config.json, or
+these profiles with RunConfig(use_price_series=True).
+
+Only the standard library is used; profiles are read once per file (again
+only if the file changes).
+"""
+import csv
+import math
+import os
+from functools import lru_cache
+
+
+# Preisdatei und Parameter der Modelle je Preis der config.json
+PRICE_FILES = {'gas_price': 'gas_price.csv', 'power_price': 'power_price.csv', 'heat_price': 'heat_price.csv'}
+PRICE_PARAMS = {'gas_price': 'GAS_PRICE', 'power_price': 'POWER_PRICE', 'heat_price': 'HEAT_PRICE'}
+# Faktor der Preisdateien nach €/kWh (Annahme ct/kWh, siehe Modulbeschreibung)
+FILE_UNIT = 0.01
+
+
+@lru_cache(maxsize=None)
+def _profile(file, mtime):
+    with open(file, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.DictReader(f) if any(row.values())]
+    try:
+        values = {int(row['t']): float(row['value']) for row in rows}
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{file}: expected the numeric columns t and value") from None
+    if sorted(values) != list(range(1, len(values) + 1)) or not all(math.isfinite(v) for v in values.values()):
+        raise ValueError(f"{file}: the hours must be 1..n with finite values")
+    return tuple(values[t] for t in sorted(values))
+
+
+def load_profile(file, unit=FILE_UNIT):
+    """Prices of a price file in €/kWh (file values times unit), hour 1 first."""
+    file = os.path.abspath(file)
+    return tuple(value * unit for value in _profile(file, os.stat(file).st_mtime_ns))
+
+
+def price_profiles(prices_path, unit=FILE_UNIT):
+    """{gas_price, power_price, heat_price: profile} of the price files in prices_path."""
+    return {key: load_profile(os.path.join(prices_path, file), unit) for key, file in PRICE_FILES.items()}
+
+
+def hourly(profile, t_values):
+    """{t: price} for the hours t = 1, 2, ...; the profile repeats after its last hour."""
+    return {t: profile[(t - 1) % len(profile)] for t in t_values}
@@ -0,0 +1,284 @@
+"""Sweeps over prices and penalty coefficients on one built instance per worker.
+
+Sensitivity studies (higher gas prices, the extension penalty of the special
+case _USE_EXT_COST_10, ...) used to mean editing the code and running the
+models again. The prices GAS_PRICE[t], POWER_PRICE[t], HEAT_PRICE[t] and the
+penalties EXTENSION_COST and SHORTFALL_COST (decision rule) are mutable
+parameters of the instances (common.run_config), so a sweep
+
+    1. builds the model of one day once per worker process,
+    2. scales the parameters of every point of the grid relative to their
+       built values (factor 1.0 = the run configuration, time-varying prices
+       keep their profile),
+    3. solves again with the solution of the previous point as MIP start
+
+and tabulates objective and dispatch of every point against the base point
+(all factors 1.0): change of the objective, heat of the units, storage
+throughput and the hours in which the commitment of a unit differs.
+
+    table = sweep('20230622', {'GAS_PRICE': [0.8, 1.0, 1.2], 'POWER_PRICE': [0.5, 1.0, 2.0]}, workers=3)
+
+The workers get neighbouring points of the grid, so consecutive solves differ
+in one factor only. They read the demands and scenarios of the day from the
+demand store, in shared memory with several workers (common.shared_data). The
+table is written to output/sweeps/.
+
+Usage (from the models directory):
+    python -m common.price_sweep 20230622 --axis GAS_PRICE=0.8,1,1.2 --axis EXTENSION_COST=1,5 [--model stochastic]
+        [--decision-rule] [--price-series] [--workers 3]
+"""
+import argparse
+import itertools
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+from pyomo.environ import Param, value
+
+from common.cli import days_of_case, model_module, parse_dates
+from common.config import data_path
+from common.demand_store import DemandStore
+from common.run_config import RunConfig
+from common.run_keys import SOLVER_NAME, SOLVER_OPTIONS
+from common.shared_data import map_with_store, share_demand_store
+
+
+# Parameter, die ein Sweep skalieren kann
+PARAMETERS = ['GAS_PRICE', 'POWER_PRICE', 'HEAT_PRICE', 'EXTENSION_COST', 'SHORTFALL_COST']
+# Einsatz der Anlagen je Stunde, mit dem die Punkte verglichen werden
+DISPATCH = ['chp1.heat', 'chp2.heat', 'boiler1.heat', 'heat_storage1.heat_charge', 'heat_storage1.heat_discharge']
+COMMITMENT = ['chp1.bin', 'chp2.bin', 'boiler1.bin']
+
+
+def grid(axes):
+    """Points {parameter: factor} of all combinations of the axes; the base point (all 1.0) comes first."""
+    names = list(axes)
+    points = [dict(zip(names, factors)) for factors in itertools.product(*(axes[name] for name in names))]
+    base = {name: 1.0 for name in names}
+    return [base] + [point for point in points if point != base]
+
+
+def parameters(instance, names):
+    """Parameter components of the given names, also in the blocks of an extensive form or the decision rule."""
+    found = {name: [] for name in names}
+    for param in instance.component_objects(Param, descend_into=True):
+        if param.local_name in found:
+            if not param.mutable:
+                raise ValueError(f"Parameter {param.name} is not mutable")
+            found[param.local_name].append(param)
+    missing = [name for name, params in found.items() if not params]
+    if missing:
+        raise ValueError(f"Parameters {', '.join(missing)} are not part of the model")
+    return found
+
+
+class _Day:
+    """Built model of one day in a worker: parameters with their built values, solve, objective and dispatch."""
+
+    def __init__(self, model_type, start_date, period, files, run_config, solver_name, solver_options, names,
+                 scen_count, store):
+        self.model_type = model_type
+        self.module = model_module(model_type)
+        self.solves = 0
+        if model_type == 'deterministic':
+            log_filename = f'{run_config.path_out_logs}sweep_{start_date}_{os.getpid()}.log'
+            self.model = self.module.build_model(store.heat_demand(start_date, period), log_filename,
+                                                 solver_name, solver_options, run_config=run_config)
+            self.instance = self.dispatch_block = self.model.instance
+        else:
+            self.job = self.module.prepare_day(files['forecast'], files['scenarios'], solver_name, solver_options,
+                                               scen_count, use_saa=False, run_config=run_config, demand_store=store)
+            self.model = self.job['model']
+            if run_config.use_decision_rule:
+                self.instance = self.dispatch_block = self.model.instance
+            else:
+                import mpisppy.utils.sputils as sputils
+
+                self.instance = self.model.ef_instance.ef
+                # Erste Stufe ist in allen Szenarien gleich (Nichtantizipativität)
+                self.dispatch_block = next(iter(sputils.ef_scenarios(self.instance)))[1]
+
+        self.params = parameters(self.instance, names)
+        self.base = {name: [{index: value(param[index]) for index in param} for param in params]
+                     for name, params in self.params.items()}
+
+    def apply(self, point):
+        """Set the parameters to their built values times the factors of the point."""
+        for name, factor in point.items():
+            for param, base in zip(self.params[name], self.base[name]):
+                for index, built in base.items():
+                    param[index] = built * factor
+
+    def solve(self):
+        """Solve; from the second point on with the current solution as MIP start. Returns True if solved."""
+        first = self.solves == 0
+        self.solves += 1
+        if self.model_type == 'deterministic':
+            # Ohne Solver (Fallback) gibt es keine Lösung, die als Start dienen kann
+            if first or self.model.status == 'heuristic':
+                self.module.solve_model(self.model)
+            else:
+                try:
+                    self.model.solve(warmstart=True)
+                except self.module.NoIncumbentError as e:
+                    print(f'Warm solve failed ({e}), solving with the heuristic start.')
+                    self.module.solve_model(self.model)
+            return self.model.status != 'heuristic'
+
+        options = self.job['options']
+        if self.model.config.use_decision_rule:
+            self.model.solve_decision_rule(options['solver'], options['solver_options'], warmstart=not first)
+        else:
+            self.model.solve(warmstart=not first)
+        return True
+
+    def objective(self):
+        if self.model_type == 'deterministic':
+            return self.model.objective_value
+        if self.model.config.use_decision_rule:
+            return value(self.instance.decision_rule.objective)
+        return value(self.instance.EF_Obj)
+
+    def dispatch(self):
+        """{variable: [value per hour]} of DISPATCH and COMMITMENT."""
+        block = self.dispatch_block
+        return {name: [value(block.find_component(name)[t]) for t in block.t] for name in DISPATCH + COMMITMENT}
+
+    def close(self):
+        if self.model_type == 'stochastic':
+            self.model.close_logging()
+
+
+def _run_points(store, task):
+    """Build the day and solve all points of a task (one worker), returns one row per point."""
+    points = task.pop('points')
+    day = _Day(**task, store=store)
+    rows = []
+    try:
+        for point in points:
+            start = time.perf_counter()
+            day.apply(point)
+            solved = day.solve()
+            rows.append({'point': point, 'objective': day.objective(), 'solved': solved,
+                         'seconds': time.perf_counter() - start, 'worker': os.getpid(), 'dispatch': day.dispatch()})
+    finally:
+        day.close()
+    return rows
+
+
+def _chunks(points, workers):
+    """Neighbouring points in workers contiguous chunks."""
+    size, rest = divmod(len(points), workers)
+    chunks, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < rest else 0)
+        if end > start:
+            chunks.append(points[start:end])
+        start = end
+    return chunks
+
+
+def tabulate(rows):
+    """One row per point: factors, objective and dispatch with their changes against the base point."""
+    base = next(row for row in rows if all(factor == 1.0 for factor in row['point'].values()))
+    table = []
+    for row in rows:
+        entry = {**row['point'], 'objective': row['objective'], 'objective_change': row['objective'] - base['objective']}
+        entry['objective_change_pct'] = 100 * entry['objective_change'] / abs(base['objective']) if base['objective'] else None
+        for name in DISPATCH:
+            total = sum(row['dispatch'][name])
+            entry[name] = total
+            entry[f'{name}_change'] = total - sum(base['dispatch'][name])
+        # Stunden, in denen mindestens eine Anlage anders ein- oder ausgeschaltet ist
+        entry['commitment_changes'] = sum(
+            any(round(row['dispatch'][name][k]) != round(base['dispatch'][name][k]) for name in COMMITMENT)
+            for k in range(len(base['dispatch'][COMMITMENT[0]]))
+        )
+        entry.update(solved=row['solved'], seconds=row['seconds'], worker=row['worker'])
+        table.append(entry)
+    return pd.DataFrame(table)
+
+
+def sweep(start_date, axes, model_type='deterministic', run_config=None, workers=1, solver_name=SOLVER_NAME,
+          solver_options=None, scen_count=10, save=True):
+    """Solve the day (YYYYMMDD) for all points of the grid of axes {parameter: [factors]}, returns the table.
+
+    deterministic: forecast of the day; stochastic: extensive form of the
+    scenario file without SAA, or the decision rule model with
+    run_config.use_decision_rule. With several workers every worker process
+    builds the model once and gets Threads = cores // workers. The demands
+    come from the demand store (DemandStore.open), shared with the workers.
+    """
+    unknown = [name for name in axes if name not in PARAMETERS]
+    if unknown:
+        raise ValueError(f"Unknown parameters {', '.join(unknown)} (one of {', '.join(PARAMETERS)})")
+    run_config = run_config or RunConfig.from_config(model_type)
+    days = days_of_case('forecast' if model_type == 'deterministic' else 'base', [start_date])
+    if not days:
+        raise ValueError(f"No inputs of the {model_type} model for {start_date}")
+    (_, _, period), files = days[0]
+
+    points = grid(axes)
+    workers = max(1, min(workers, len(points)))
+    solver_options = dict(SOLVER_OPTIONS if solver_options is None else solver_options)
+    if workers > 1:
+        # Mehrere Solver teilen sich die Kerne
+        solver_options.setdefault('Threads', max(1, (os.cpu_count() or 1) // workers))
+
+    tasks = [{'model_type': model_type, 'start_date': start_date, 'period': period, 'files': files,
+              'run_config': run_config, 'solver_name': solver_name, 'solver_options': solver_options,
+              'names': list(axes), 'scen_count': scen_count, 'points': chunk}
+             for chunk in _chunks(points, workers)]
+    start = time.perf_counter()
+    store = DemandStore.open()
+    if workers == 1:
+        rows = _run_points(store, tasks[0])
+    else:
+        # Jeder Worker baut sein Modell aus den Bedarfen im Shared Memory, ohne die JSON-Dateien zu lesen
+        with share_demand_store(store) as shared:
+            rows = [row for chunk_rows in map_with_store(_run_points, tasks, shared, workers) for row in chunk_rows]
+    print(f'\n### Sweep of {len(points)} points with {workers} workers in {time.perf_counter() - start:.1f} s ###')
+
+    table = tabulate(rows)
+    if save:
+        path = os.path.join(data_path(), 'output', 'sweeps')
+        os.makedirs(path, exist_ok=True)
+        variant = 'decision_rule' if model_type == 'stochastic' and run_config.use_decision_rule else model_type
+        file = os.path.join(path, f"sweep_{variant}_{start_date}_{period}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        table.to_csv(file, index=False)
+        print(f'Sweep written to {file}')
+    return table
+
+
+def _axis(value):
+    name, _, factors = value.partition('=')
+    try:
+        return name.strip(), [float(factor) for factor in factors.split(',') if factor.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid axis {value} (e.g. GAS_PRICE=0.8,1,1.2)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep prices and penalty coefficients of one day.')
+    parser.add_argument('date', help='start date, e.g. 2023-06-22 or 20230622')
+    parser.add_argument('--axis', type=_axis, action='append', required=True,
+                        help=f"PARAMETER=factor,factor,... with PARAMETER one of {', '.join(PARAMETERS)}")
+    parser.add_argument('--model', choices=['deterministic', 'stochastic'], default='deterministic')
+    parser.add_argument('--decision-rule', action='store_true', help='stochastic: decision rule model instead of the EF')
+    parser.add_argument('--price-series', action='store_true', help='hourly prices of data/input/prices')
+    parser.add_argument('--scenarios', type=int, default=10, help='stochastic: scenarios of the EF')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--solver', default=SOLVER_NAME)
+    args = parser.parse_args()
+
+    start_date = parse_dates([args.date])[0]
+    run_config = RunConfig.from_config(args.model, use_decision_rule=args.decision_rule,
+                                       use_price_series=args.price_series)
+    table = sweep(start_date, dict(args.axis), args.model, run_config, args.workers, args.solver,
+                  scen_count=args.scenarios)
+    print(table.drop(columns=['worker']).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Vectorized out-of-sample evaluation of first-stage decisions.
+
+With a fixed first stage (a root solution *_rs.csv of the stochastic model
+or the timeseries of a deterministic run) the second stage of model_s reduces
+to a closed form per hour: the deviation between planned heat supply and
+realized demand is charged into or discharged from the heat storage
+
+    dispatch_heat_charge - dispatch_heat_discharge = supply - demand
+
+and use_extension is set whenever heat_capacity + dispatch_heat_charge -
+dispatch_heat_discharge exceeds the storage content. Samples whose deviation
+exceeds the remaining charge/discharge power or empties the storage would be
+infeasible in the EF of the scenario file; they are counted and their excess
+is priced with `penalty` (SHORTFALL_COST). The sampled EFs of the SAA
+(stochastic/saa.py) have the same priced shortfall, so there both bounds
+belong to one problem.
+
+Usage (from the models directory):
+    python -m common.recourse_evaluator 20230316 [n_samples] [seed]
+scores the stochastic and deterministic plans of that day on the same samples;
+with 'all' instead of a date every day of the demand store is scored in
+worker processes that share the demand data (common.shared_data). The store
+is built first if it is missing or older than the demand files.
+"""
+import glob
+import os
+import sys
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from common.demands import load_heat_demand, sample_heat_demand
+from common.dispatch_simulator import load_timeseries, simulate
+from common.demand_store import DemandStore
+from common.plant import Plant, resolve_path
+from common.shared_data import map_with_store, share_demand_store
+
+
+# Kosten je Stunde mit use_extension, wie in _second_stage_cost_rule (RunConfig.extension_cost)
+EXTENSION_COST = 10
+# €/kWh nicht abbildbarer Abweichung (wie die Decision Rule und die EFs der SAA)
+SHORTFALL_COST = 10
+TOLERANCE = 1e-6
+
+
+class Evaluation:
+    """Total costs of a plan over a sample of demand paths."""
+
+    def __init__(self, first_stage_cost, recourse_cost, shortfall, tolerance=TOLERANCE):
+        self.first_stage_cost = first_stage_cost
+        self.recourse_cost = recourse_cost
+        self.shortfall = shortfall
+        self.infeasible = shortfall > tolerance
+
+    @property
+    def costs(self):
+        return self.first_stage_cost + self.recourse_cost
+
+    @property
+    def mean(self):
+        return self.costs.mean()
+
+    def confidence_interval(self, level=0.95):
+        """Normal approximation of the confidence interval of the expected cost."""
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        half_width = z * self.costs.std(ddof=1) / np.sqrt(len(self.costs))
+        return self.mean - half_width, self.mean + half_width
+
+    def summary(self, level=0.95):
+        lower, upper = self.confidence_interval(level)
+        return {
+            'FirstStageCost': self.first_stage_cost,
+            'ExpectedRecourse': self.recourse_cost.mean(),
+            'ExpectedCost': self.mean,
+            'CILower': lower,
+            'CIUpper': upper,
+            'StdDev': self.costs.std(ddof=1),
+            'InfeasibleShare': self.infeasible.mean(),
+            'Samples': len(self.costs),
+        }
+
+
+def planned_supply(plan):
+    """Heat supplied to the grid by the first stage (heat_demand of the plan)."""
+    return (
+        plan['chp1.heat'] + plan['chp2.heat'] + plan['boiler1.heat'] +
+        plan['heat_storage1.heat_discharge'] - plan['heat_storage1.heat_charge']
+    )
+
+
+def recourse(plan, heat_demand, plant=None, penalty=SHORTFALL_COST, extension_cost=EXTENSION_COST):
+    """Second-stage cost and shortfall of a plan for demand paths of shape (n_samples, T)."""
+    if plant is None:
+        plant = Plant()
+    storage = plant.heat_storage1
+
+    delta = planned_supply(plan) - np.asarray(heat_demand, dtype=float)
+    dispatch_heat_charge = np.maximum(delta, 0.0)
+    dispatch_heat_discharge = np.maximum(-delta, 0.0)
+    dispatch_heat_capacity = plan['heat_storage1.heat_capacity'] + delta
+
+    # Nicht abbildbare Abweichungen (max_heat_*_secondstagerule, heat_capacity >= 0)
+    shortfall = (
+        np.maximum(dispatch_heat_charge - (storage.max_heat - plan['heat_storage1.heat_charge']), 0.0) +
+        np.maximum(dispatch_heat_discharge - (storage.max_heat - plan['heat_storage1.heat_discharge']), 0.0) +
+        np.maximum(-dispatch_heat_capacity, 0.0)
+    )
+    use_extension = dispatch_heat_capacity > storage.max_content + TOLERANCE
+
+    recourse_cost = (
+        plant.storage_cost(dispatch_heat_charge, dispatch_heat_discharge) +
+        use_extension * extension_cost +
+        shortfall * penalty
+    )
+    return recourse_cost.sum(axis=-1), shortfall.sum(axis=-1)
+
+
+def evaluate(plan, heat_demand, plant=None, penalty=SHORTFALL_COST, extension_cost=EXTENSION_COST):
+    """Evaluate a plan (schedule dict of first-stage arrays) on demand paths.
+
+    The first-stage cost is priced with the prices of the plant, hourly with
+    Plant.from_run_config.
+    """
+    if plant is None:
+        plant = Plant()
+
+    plan = dict(plan)
+    plan.setdefault('heat_demand', planned_supply(plan))
+    first_stage_cost = simulate(plan, plant).objective_value[0]
+
+    recourse_cost, shortfall = recourse(plan, heat_demand, plant, penalty, extension_cost)
+    return Evaluation(first_stage_cost, recourse_cost, shortfall)
+
+
+def compare_plans(start_date, n_samples=10000, seed=None, plant=None, level=0.95, store=None, run_config=None):
+    """Score all stored plans of a day on the same demand samples.
+
+    Samples are drawn around the forecast of the day. The stochastic plans
+    (root solutions of the EF and the decision rule model) and the
+    deterministic plans (forecast and weighted demand, with and without chance
+    constraints) are evaluated with identical recourse. The forecast is
+    read from store (a DemandStore) if given. With run_config (a RunConfig)
+    the plans are priced with its hourly prices and extension cost, as the
+    models of that configuration price them.
+    """
+    if plant is None:
+        plant = Plant()
+
+    path_demands = resolve_path(plant.config, 'deterministic', 'input_path') + 'demands' + os.sep
+    path_root = resolve_path(plant.config, 'stochastic', 'root_path')
+    path_timeseries = resolve_path(plant.config, 'deterministic', 'timeseries_path')
+    day = f'{start_date}_to_{start_date}_day'
+
+    if store is not None:
+        forecast = store.heat_demand(start_date)
+    else:
+        forecast = load_heat_demand(f'{path_demands}heat_demand_{day}.json')
+    heat_demand = sample_heat_demand([forecast[t] for t in sorted(forecast)], n_samples, seed=seed)
+    extension_cost = EXTENSION_COST
+    if run_config is not None:
+        plant = Plant.from_run_config(run_config, range(1, len(forecast) + 1), plant.config)
+        extension_cost = run_config.extension_cost
+
+    # Alle Root-Lösungen des Tages (EF, Sonderfälle, Decision Rule) und die deterministischen Pläne
+    plans = (
+        sorted(glob.glob(f'{path_root}s_*{day}*_rs.csv')) +
+        sorted(glob.glob(f'{path_timeseries}d_{day}*_ts.csv')) +
+        sorted(glob.glob(f'{path_timeseries}d_weighted_{day}*_ts.csv'))
+    )
+
+    rows = []
+    for file in plans:
+        if not os.path.exists(file):
+            continue
+        evaluation = evaluate(load_timeseries(file), heat_demand, plant, extension_cost=extension_cost)
+        plan_name = os.path.basename(file).replace('_rs.csv', '').replace('_ts.csv', '')
+        rows.append({'Plan': plan_name, **evaluation.summary(level)})
+
+    return pd.DataFrame(rows)
+
+
+def _compare_day(store, args):
+    start_date, n_samples, seed, run_config = args
+    df_day = compare_plans(start_date, n_samples, seed, store=store, run_config=run_config)
+    df_day.insert(0, 'Date', start_date)
+    return df_day
+
+
+def compare_all_days(n_samples=10000, seed=None, workers=None, run_config=None):
+    """compare_plans for every day of the demand store, in parallel on shared demand data.
+
+    The store (data/input/demands/store) is built if it is missing or stale.
+    """
+    with share_demand_store(DemandStore.open()) as shared:
+        days = sorted(shared.store_handle['index'].query("kind == 'forecast' and period == 'day'")['start_date'])
+        results = map_with_store(_compare_day, [(day, n_samples, seed, run_config) for day in days], shared, workers)
+    return pd.concat(results, ignore_index=True)
+
+
+if __name__ == "__main__":
+    start_date = sys.argv[1] if len(sys.argv) > 1 else '20230316'
+    n_samples = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    if start_date == 'all':
+        print(compare_all_days(n_samples, seed).to_string(index=False))
+    else:
+        print(compare_plans(start_date, n_samples, seed).to_string(index=False))
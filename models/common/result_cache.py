@@ -0,0 +1,242 @@
+"""Content-addressed cache of model results.
+
+A run is keyed by a SHA-256 hash of everything its result depends on: the
+contents of the demand/scenario files (or the demand data itself), the asset
+CSVs, the 'global' section of config.json, the model variant flags (e.g.
+SPECIAL_CASE, weighted demand, service level) and the solver and its options
+(without LogFile and Threads). The entry stores the output files of the run
+(timeseries, root solution, objective values); on a hit they are copied back
+to their places, so the model is neither built nor solved. Only solver
+results are stored (status 'optimal', or 'feasible' when a limit ended the
+solve with an incumbent); a heuristic fallback or an unsolved run is solved
+again next time.
+
+    data/output/cache/<key>/files/      output files (numbered, flat)
+    data/output/cache/<key>/entry.json  their target paths relative to the data
+                                        directory, description, status and
+                                        creation time
+    data/output/cache/stats.log         one line per lookup (hit/miss)
+
+Changing any input gives a new key, old entries stay until they are removed
+with invalidate (by key or by input file), prune or clear. CACHE_VERSION is
+part of every key and is increased when the models change their results.
+
+Usage (from the models directory):
+    python -m common.result_cache stats | clear | prune DAYS | invalidate FILE_OR_KEY
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+from common.config import data_path, load_config, resolve_path
+
+
+CACHE_VERSION = 3
+# Nur Lösungen des Solvers speichern, keine heuristischen Ergebnisse
+CACHED_STATUSES = ('optimal', 'feasible')
+
+# Hashes der Dateien je (Pfad, mtime, Größe), damit unveränderte Dateien nur einmal gelesen werden
+_file_hashes = {}
+
+
+def file_hash(file):
+    """SHA-256 of the contents of a file."""
+    stat = os.stat(file)
+    memo_key = (os.path.abspath(file), stat.st_mtime_ns, stat.st_size)
+    if memo_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def _plain(value):
+    """JSON-serializable form of mappings (e.g. HourlyValues), arrays and NumPy scalars."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def canonical_json(value):
+    """JSON of a value with sorted keys, identical for equal inputs."""
+    return json.dumps(value, sort_keys=True, default=_plain)
+
+
+class ResultCache:
+    """Output files of model runs keyed by the hash of their inputs."""
+
+    def __init__(self, path=None, config=None):
+        config = config or load_config()
+        self.config = config
+        self.data_path = data_path(config)
+        self.path = path or os.path.join(self.data_path, 'output', 'cache')
+        self.asset_path = resolve_path(config, 'deterministic', 'input_path') + 'assets'
+        self.stats_file = os.path.join(self.path, 'stats.log')
+
+    def key(self, files=(), data=None, flags=None, solver_name=None, solver_options=None):
+        """Key of a run from its input files, input data, variant flags and solver settings.
+
+        The asset CSVs and the 'global' section of config.json are always part of the key.
+        """
+        # LogFile und Threads ändern das Ergebnis nicht (Threads nur den Weg innerhalb des MIPGap)
+        solver_options = {k: v for k, v in (solver_options or {}).items() if k not in ('LogFile', 'Threads')}
+        inputs = {
+            'version': CACHE_VERSION,
+            'files': sorted(file_hash(file) for file in files if file is not None),
+            'data': canonical_json(data),
+            'assets': {os.path.basename(file): file_hash(file)
+                       for file in sorted(glob.glob(os.path.join(self.asset_path, '*.csv')))},
+            'global': self.config['global'],
+            'flags': flags or {},
+            'solver': [solver_name, solver_options],
+        }
+        return hashlib.sha256(canonical_json(inputs).encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key)
+
+    def _record(self, event, key):
+        os.makedirs(self.path, exist_ok=True)
+        # Eine Zeile je Zugriff, Anhängen ist auch bei parallelen Prozessen sicher
+        with open(self.stats_file, 'a') as f:
+            f.write(f'{event} {key}\n')
+
+    def contains(self, key):
+        """True if the key has an entry (nothing is restored or counted)."""
+        return os.path.exists(os.path.join(self._entry_path(key), 'entry.json'))
+
+    def get(self, key):
+        """Restore the output files of an entry; returns their paths or None on a miss."""
+        entry_file = os.path.join(self._entry_path(key), 'entry.json')
+        if not os.path.exists(entry_file):
+            self._record('miss', key)
+            return None
+
+        with open(entry_file) as f:
+            entry = json.load(f)
+        restored = []
+        for stored_name, relative_path in entry['files'].items():
+            target = os.path.normpath(os.path.join(self.data_path, relative_path))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(self._entry_path(key), 'files', stored_name), target)
+            restored.append(target)
+
+        self._record('hit', key)
+        return restored
+
+    def put(self, key, files, description=None, inputs=(), status=None):
+        """Store the output files of a run (files below the data directory).
+
+        status is the status of the run ('optimal', 'feasible', 'heuristic',
+        ...); runs with a status other than CACHED_STATUSES are not stored.
+        Returns True if the entry was stored.
+        """
+        if status not in CACHED_STATUSES:
+            print(f"Result {description} not cached (status {status})")
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        temporary_path = f'{self._entry_path(key)}.tmp{os.getpid()}'
+        os.makedirs(os.path.join(temporary_path, 'files'), exist_ok=True)
+        stored_files = {}
+        for i, file in enumerate(files):
+            stored_name = f'{i}_{os.path.basename(file)}'
+            shutil.copyfile(file, os.path.join(temporary_path, 'files', stored_name))
+            stored_files[stored_name] = os.path.relpath(os.path.abspath(file), self.data_path)
+
+        with open(os.path.join(temporary_path, 'entry.json'), 'w') as f:
+            json.dump({
+                'files': stored_files,
+                'inputs': [os.path.abspath(file) for file in inputs if file is not None],
+                'description': description,
+                'status': status,
+                'created': datetime.now().isoformat(timespec='seconds'),
+            }, f, indent=4)
+
+        # Erst vollständig schreiben, dann umbenennen; existiert der Eintrag schon, gewinnt der ältere
+        try:
+            os.rename(temporary_path, self._entry_path(key))
+        except OSError:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+        return True
+
+    def entries(self):
+        """Keys of all entries."""
+        if not os.path.isdir(self.path):
+            return []
+        return [name for name in os.listdir(self.path) if os.path.exists(os.path.join(self.path, name, 'entry.json'))]
+
+    def invalidate(self, key=None, file=None):
+        """Remove the entry with the key or all entries that used the input file; returns the number removed."""
+        removed = 0
+        for entry_key in self.entries():
+            if key is not None and entry_key != key:
+                continue
+            if file is not None:
+                with open(os.path.join(self.path, entry_key, 'entry.json')) as f:
+                    if os.path.abspath(file) not in json.load(f)['inputs']:
+                        continue
+            shutil.rmtree(self._entry_path(entry_key), ignore_errors=True)
+            removed += 1
+        return removed
+
+    def prune(self, max_age_days):
+        """Remove entries older than max_age_days."""
+        limit = time.time() - max_age_days * 86400
+        old = [key for key in self.entries() if os.path.getmtime(os.path.join(self.path, key, 'entry.json')) < limit]
+        for key in old:
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+        return len(old)
+
+    def clear(self):
+        """Remove all entries and the statistics."""
+        removed = len(self.entries())
+        shutil.rmtree(self.path, ignore_errors=True)
+        return removed
+
+    def stats(self):
+        """Number and size of the entries and hits/misses of all lookups so far."""
+        hits = misses = 0
+        if os.path.exists(self.stats_file):
+            with open(self.stats_file) as f:
+                for line in f:
+                    hits += line.startswith('hit ')
+                    misses += line.startswith('miss ')
+        size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for key in self.entries() for root, _, names in os.walk(self._entry_path(key)) for name in names
+        )
+        return {
+            'entries': len(self.entries()),
+            'size_mb': size / 1e6,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    cache = ResultCache()
+    if command == 'stats':
+        for name, value in cache.stats().items():
+            print(f"{name:<10} {value}")
+    elif command == 'clear':
+        print(f"{cache.clear()} entries removed")
+    elif command == 'prune':
+        print(f"{cache.prune(float(sys.argv[2]))} entries removed")
+    elif command == 'invalidate':
+        target = sys.argv[2]
+        removed = cache.invalidate(file=target) if os.path.exists(target) else cache.invalidate(key=target)
+        print(f"{removed} entries removed")
+    else:
+        print("Usage: python -m common.result_cache stats | clear | prune DAYS | invalidate FILE_OR_KEY")
@@ -0,0 +1,160 @@
+"""Immutable configuration of one model run and its log.
+
+The model classes (main_d.Model, model_s.Model) get everything that used to
+come from module globals and class attributes (paths of '../config.json',
+prices, USE_WEIGHTED_HEAT_DEMAND, USE_DECISION_RULE, SPECIAL_CASE) as one
+RunConfig, so differently configured models can run side by side in one
+process (threads, orchestrators):
+
+    config = RunConfig.from_config('stochastic', special_case='_USE_EXT_COST_10')
+    variant = config.replace(use_weighted_heat_demand=True)
+
+Prices and penalty coefficients reach the models as mutable Pyomo parameters
+(price_data): the prices per hour, constant or with use_price_series the
+profiles of data/input/prices (common.price_series), and the cost per hour of
+the storage extension (extension_cost). common.price_sweep changes them on a
+built instance.
+
+run_logger gives every run its own logger with a file handler instead of the
+process-wide logging.basicConfig.
+"""
+import dataclasses
+import logging
+import os
+from dataclasses import dataclass
+
+from common.config import load_config, resolve_path
+from common.price_series import FILE_UNIT, PRICE_FILES, PRICE_PARAMS, hourly, price_profiles
+
+
+# Preise und Kostensätze aus dem Abschnitt 'global' der config.json
+PRICE_KEYS = [
+    'gas_price', 'power_price', 'heat_price', 'calorific_value_ngas', 'chp_bonus_self_consumption', 'chp_bonus',
+    'chp_index_eex', 'energy_tax_refund_gas', 'avoided_grid_fees', 'share_self_consumption', 'share_feed_in',
+    'power_cost_to_heat_sales_ratio', 'cost_charge', 'cost_discharge', 'maintenance_cost',
+]
+
+# Pfade der config.json je Modell und ihre Felder
+PATH_FIELDS = {
+    'input_path': 'path_in',
+    'output_path': 'path_out',
+    'log_path': 'path_out_logs',
+    'timeseries_path': 'path_out_timeseries',
+    'objectives_path': 'path_out_objectives',
+    'root_path': 'path_out_root',
+    'actual_path': 'path_out_actual',
+    'scenarios_path': 'path_out_scenarios',
+}
+
+# Suffix der Ausgabedateien des Sonderfalls (main_s.run(use_special_case=True))
+SPECIAL_CASE = '_USE_EXT_COST_10'
+
+# € je Stunde mit use_extension des Speichers (stochastisches Modell)
+EXTENSION_COST = 10.0
+
+
+@dataclass(frozen=True)
+class RunConfig:
+    """Paths, prices and variant flags of one model run (absolute paths ending with a separator)."""
+
+    model_type: str
+    path_in: str
+    path_out: str
+    path_out_logs: str
+    path_out_timeseries: str
+    path_out_objectives: str
+    gas_price: float
+    power_price: float
+    heat_price: float
+    calorific_value_ngas: float
+    chp_bonus_self_consumption: float
+    chp_bonus: float
+    chp_index_eex: float
+    energy_tax_refund_gas: float
+    avoided_grid_fees: float
+    share_self_consumption: float
+    share_feed_in: float
+    power_cost_to_heat_sales_ratio: float
+    cost_charge: float
+    cost_discharge: float
+    maintenance_cost: float
+    heat_demand_file: str = None
+    heat_demand_scenario_file: str = None
+    weighted_heat_demand_file: str = None
+    path_out_root: str = None
+    path_out_actual: str = None
+    path_out_scenarios: str = None
+    use_weighted_heat_demand: bool = False
+    use_decision_rule: bool = False
+    special_case: str = ''
+    use_price_series: bool = False
+    price_file_unit: float = FILE_UNIT
+    extension_cost: float = EXTENSION_COST
+
+    @classmethod
+    def from_config(cls, model_type, config=None, **options):
+        """RunConfig of a model from config.json (or a loaded config); options set the flags or override values."""
+        config = config or load_config()
+        global_config = config['global']
+        paths = {field: resolve_path(config, model_type, key)
+                 for key, field in PATH_FIELDS.items() if key in config[model_type]}
+        values = {
+            'model_type': model_type,
+            **paths,
+            **{key: float(global_config[key]) for key in PRICE_KEYS},
+            'heat_demand_file': global_config['heat_demand_file'],
+            'heat_demand_scenario_file': global_config['heat_demand_scenario_file'],
+            'weighted_heat_demand_file': global_config['weighted_heat_demand'],
+            'price_file_unit': float(global_config.get('price_file_unit', FILE_UNIT)),
+        }
+        values.update(options)
+        return cls(**values)
+
+    def replace(self, **changes):
+        """Copy with changed values."""
+        return dataclasses.replace(self, **changes)
+
+    def for_day(self, start_date):
+        """Copy with the weighted heat demand file of the day (YYYYMMDD) instead of the one of config.json."""
+        return self.replace(weighted_heat_demand_file=f'weighted_heat_demand/weighted_heat_demand_{start_date}.json')
+
+    def prices(self):
+        """Prices and cost rates as dict (part of the cache keys)."""
+        prices = {key: getattr(self, key) for key in PRICE_KEYS}
+        prices['extension_cost'] = self.extension_cost
+        if self.use_price_series:
+            prices['price_series'] = price_profiles(self.path_in + 'prices', self.price_file_unit)
+        return prices
+
+    def hourly_prices(self, t_values):
+        """{gas_price, power_price, heat_price: {t: €/kWh}}, the price profiles with use_price_series, else constant."""
+        if self.use_price_series:
+            profiles = price_profiles(self.path_in + 'prices', self.price_file_unit)
+            return {key: hourly(profiles[key], t_values) for key in PRICE_FILES}
+        return {key: {t: getattr(self, key) for t in t_values} for key in PRICE_FILES}
+
+    def price_data(self, t_values):
+        """Pyomo data of the price parameters GAS_PRICE, POWER_PRICE and HEAT_PRICE."""
+        return {PRICE_PARAMS[key]: values for key, values in self.hourly_prices(t_values).items()}
+
+    @property
+    def prefix(self):
+        """Prefix of the output files ('weighted_' with the weighted heat demand)."""
+        return 'weighted_' if self.use_weighted_heat_demand else ''
+
+
+def run_logger(name, logfile, level=logging.INFO):
+    """Logger of one run writing to its own file (not registered globally, close with close_run_logger)."""
+    os.makedirs(os.path.dirname(os.path.abspath(logfile)), exist_ok=True)
+    logger = logging.Logger(name, level)
+    handler = logging.FileHandler(logfile)
+    handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+    logger.addHandler(handler)
+    return logger
+
+
+def close_run_logger(logger):
+    """Close the file handlers of a run logger."""
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
@@ -0,0 +1,75 @@
+"""Solver settings and result cache keys of the model runs.
+
+main_d, main_s and the command line (common.cli) compute the keys of a run
+here, so a run restored from the result cache needs neither Pyomo nor the
+model modules. Only the standard library and light common modules are
+imported.
+"""
+import os
+
+from common.demand_files import VALIDATION_FILE
+
+
+# Einheitliche Solver-Einstellungen beider Modelle
+SOLVER_NAME = 'gurobi'
+SOLVER_OPTIONS = {
+    'MIPGap': 0.01,
+    'TimeLimit': 1000,
+}
+
+# Options of the sample average approximation (saa.run_saa)
+SAA_OPTIONS = {
+    'n_start': 5,
+    'n_max': 80,
+    'replications': 3,
+    'gap_target': 0.01,
+    'seed': 42,
+}
+
+
+def deterministic_key(cache, run_config, heat_demand_data, flags, files=(), solver_name=SOLVER_NAME, solver_options=None,
+                      use_heuristic_start=True):
+    """Key of a deterministic run (inputs, prices, variant flags and solver settings)."""
+    flags = {'model': 'deterministic', 'use_heuristic_start': use_heuristic_start, 'prices': run_config.prices(), **flags}
+    return cache.key(files, heat_demand_data, flags, solver_name, SOLVER_OPTIONS if solver_options is None else solver_options)
+
+
+def forecast_key(cache, run_config, heat_demand_data, weighted, service_level=None, forecast=None, **solve_options):
+    """Key of main_d.run_forecast for one day (forecast: the forecast of a weighted run with chance constraints)."""
+    flags = {'case': 'forecast', 'weighted': weighted, 'service_level': service_level, 'forecast': forecast}
+    files = [VALIDATION_FILE] if service_level is not None else []
+    return deterministic_key(cache, run_config, heat_demand_data, flags, files, **solve_options)
+
+
+def scenarios_key(cache, run_config, heat_demand_scenarios, **solve_options):
+    """Key of main_d.run_scenarios for one scenario file (all scenarios without "Probability")."""
+    return deterministic_key(cache, run_config, heat_demand_scenarios, {'case': 'scenarios'}, **solve_options)
+
+
+def actual_key(cache, run_config, heat_demand_data, **solve_options):
+    """Key of main_d.run_actual for one day."""
+    return deterministic_key(cache, run_config, heat_demand_data, {'case': 'actual'}, **solve_options)
+
+
+def stochastic_key(cache, run_config, heat_demand_file, scenario_file, solver_name=SOLVER_NAME, solver_options=None,
+                   scen_count=10, use_generated_scenarios=False, scenario_seed=42, use_saa=False, saa_options=None):
+    """Key and input files of main_s.run_day."""
+    solver_options = SOLVER_OPTIONS if solver_options is None else solver_options
+    saa_options = SAA_OPTIONS if saa_options is None else saa_options
+
+    inputs = [heat_demand_file, scenario_file]
+    if run_config.use_weighted_heat_demand:
+        inputs.append(os.path.join(run_config.path_in, 'demands', run_config.weighted_heat_demand_file))
+    if use_saa or use_generated_scenarios or run_config.use_decision_rule:
+        inputs.append(VALIDATION_FILE)
+    flags = {
+        'model': 'stochastic',
+        'weighted': run_config.use_weighted_heat_demand,
+        'decision_rule': run_config.use_decision_rule,
+        'special_case': run_config.special_case,
+        'prices': run_config.prices(),
+        'scen_count': scen_count,
+        'generated_scenarios': [use_generated_scenarios, scenario_seed],
+        'saa': saa_options if use_saa else None,
+    }
+    return cache.key(inputs, None, flags, solver_name, solver_options), inputs
@@ -0,0 +1,107 @@
+"""Convergence of the weighted stochastic objective for MC and QMC sampling.
+
+compute_weighted_stochastic_objective_value (postprocessing/compute_metrics.ipynb)
+weights the scenario objectives of the EF with the scenario probabilities. For
+a fixed first stage the objective of every scenario is the first-stage cost
+plus the closed-form recourse of common.recourse_evaluator, so the weighted
+objective can be computed for many generated scenario sets without a solver.
+
+For every sampler and raw scenario count the scenarios of a day are generated
+and reduced as in common.scenario_generation (draw_scenarios and
+reduce_scenarios with the probabilities of the draws, 1/N each), several times
+with independent seeds. The spread of the weighted objective over
+the replications and its error against a reference (large unreduced Sobol
+sample) show how many raw scenarios each sampler needs.
+
+Usage (from the models directory):
+    python -m common.sampling_benchmark 20230316 [replications] [seed]
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from common.demands import load_validation_data
+from common.dispatch_simulator import load_timeseries
+from common.plant import Plant, resolve_path
+from common.recourse_evaluator import evaluate
+from common.scenario_generation import SAMPLERS, IntervalTable, draw_scenarios, period_data
+from common.scenario_reduction import reduce_scenarios
+
+
+SIZES = [16, 32, 64, 128, 256, 512, 1024]
+REFERENCE_SIZE = 2 ** 15
+
+
+def weighted_objective_value(objective_values, probabilities):
+    """Probability-weighted objective as in compute_weighted_stochastic_objective_value."""
+    probabilities = np.asarray(probabilities, dtype=float)
+    return float(np.asarray(objective_values, dtype=float) @ probabilities / probabilities.sum())
+
+
+def scenario_objective_values(plan, values, plant):
+    """Objective of every scenario (first stage + recourse) for a fixed plan."""
+    return evaluate(plan, values, plant).costs
+
+
+def convergence_benchmark(start_date, plan=None, sizes=SIZES, samplers=SAMPLERS, replications=10,
+                          desired_num_scenarios=10, reduction='backward', seed=None, plant=None):
+    """Weighted objective per sampler and raw scenario count over independent replications.
+
+    Returns one row per sampler and size with mean, standard deviation and
+    RMSE against the reference of the weighted objective, for the raw
+    scenarios (sampling error only) and for the reduced set.
+    """
+    if plant is None:
+        plant = Plant()
+    if plan is None:
+        path_root = resolve_path(plant.config, 'stochastic', 'root_path')
+        plan = load_timeseries(f'{path_root}s_{start_date}_to_{start_date}_day_rs.csv')
+
+    df_data = load_validation_data()
+    table = IntervalTable.from_data(df_data)
+    data = period_data(df_data, pd.to_datetime(start_date).strftime('%Y-%m-%d'))
+    forecast = data['forecast_demand'].to_numpy()
+    hours = data['hour'].to_numpy()
+
+    seeds = np.random.SeedSequence(seed).spawn(len(samplers) * len(sizes) * replications + 1)
+
+    values, probabilities = draw_scenarios(forecast, hours, REFERENCE_SIZE, table, seeds[-1], 'sobol')
+    reference = weighted_objective_value(scenario_objective_values(plan, values, plant), probabilities)
+
+    rows = []
+    for i, sampler in enumerate(samplers):
+        for j, size in enumerate(sizes):
+            weighted, weighted_raw = [], []
+            for r in range(replications):
+                values, probabilities = draw_scenarios(
+                    forecast, hours, size, table, seeds[(i * len(sizes) + j) * replications + r], sampler
+                )
+                objective_values = scenario_objective_values(plan, values, plant)
+                weighted_raw.append(weighted_objective_value(objective_values, probabilities))
+
+                kept, reduced_probabilities, _ = reduce_scenarios(
+                    values, probabilities, min(desired_num_scenarios, size), reduction
+                )
+                weighted.append(weighted_objective_value(objective_values[kept], reduced_probabilities))
+
+            weighted, weighted_raw = np.array(weighted), np.array(weighted_raw)
+            rows.append({
+                'Sampler': sampler,
+                'Scenarios': size,
+                'MeanRaw': weighted_raw.mean(),
+                'RMSERaw': np.sqrt(((weighted_raw - reference) ** 2).mean()),
+                'MeanReduced': weighted.mean(),
+                'StdDevReduced': weighted.std(ddof=1),
+                'RMSEReduced': np.sqrt(((weighted - reference) ** 2).mean()),
+                'Reference': reference,
+            })
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    start_date = sys.argv[1] if len(sys.argv) > 1 else '20230316'
+    replications = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    print(convergence_benchmark(start_date, replications=replications, seed=seed).to_string(index=False))
@@ -0,0 +1,259 @@
+"""Monte Carlo generation of heat demand scenarios (vectorized scenario_generation.ipynb).
+
+The forecast error of every hour is discretized into 7 intervals over
+mu +/- 3 sigma (mu, sigma per hour of the day from the validation data). Every
+scenario draws one interval per hour; its demand is the forecast plus the
+interval center. The uniform numbers of the draws come from plain Monte Carlo
+('mc'), a scrambled Sobol sequence ('sobol') or a Latin hypercube ('lhs') over
+the hours of the period. The interval tables are computed once and all
+scenarios of a period are drawn as one array with a seeded generator. The
+reduced scenarios are written in the schema of
+reduced_heat_demand_scenarios_*.json.
+
+Every draw has the probability 1/N. The notebook gave every scenario the
+product of its interval probabilities (normalized over all scenarios), but
+the draws already follow the interval probabilities, so that weighting counted
+the distribution twice and put almost all mass on the few scenarios near the
+center. common.sampling_benchmark measures this equally weighted pipeline.
+
+Usage (from the models directory):
+    python -m common.scenario_generation 2023-05-01..2023-05-15 --period day --scenarios 1000 --reduced 10 --reduction forward --seed 42
+    python -m common.scenario_generation 2023-05-01,2023-06-22 --scenarios 10000 --compare
+
+The dates are start dates of periods as in common.cli: single days
+(2023-05-01 or 20230501), lists (2023-05-01,2023-06-22) and ranges of start
+dates (2023-05-01..2023-05-15, one period per day).
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from common.cli import parse_dates
+from common.demands import load_validation_data
+from common.measurements import MeasurementHistory
+from common.config import load_config, resolve_path
+from common.scenario_reduction import METHODS as REDUCTION_METHODS, compare_reductions, reduce_scenarios
+
+
+NUM_INTERVALS = 7
+SIGMA_RANGE = 3
+PERIODS = ['day', 'week', 'month']
+SAMPLERS = ['mc', 'sobol', 'lhs']
+
+
+class IntervalTable:
+    """Interval centers and probabilities of the discretized error per hour of the day."""
+
+    def __init__(self, mu, sigma, num_intervals=NUM_INTERVALS):
+        mu = np.asarray(mu, dtype=float)[:, None]
+        sigma = np.asarray(sigma, dtype=float)[:, None]
+
+        # Intervallgrenzen mu +/- 3 sigma, shape (24, num_intervals + 1)
+        intervals = mu + sigma * np.linspace(-SIGMA_RANGE, SIGMA_RANGE, num_intervals + 1)
+        cdf = np.vectorize(NormalDist().cdf)((intervals - mu) / sigma)
+
+        self.centers = (intervals[:, :-1] + intervals[:, 1:]) / 2
+        self.probabilities = np.diff(cdf, axis=1)
+        self.cumulative = np.cumsum(self.probabilities, axis=1)
+
+    @classmethod
+    def from_data(cls, df_data, num_intervals=NUM_INTERVALS):
+        error = df_data.groupby('hour')['error'].agg(['mean', 'std']).reindex(range(24))
+        return cls(error['mean'].to_numpy(), error['std'].to_numpy(), num_intervals)
+
+    def draw(self, uniform, hours):
+        """Interval index for uniform numbers (n_scenarios, T) at the given hours (T,).
+
+        Same rule as select_interval: the first interval with rnd <= cumulative
+        probability, the last one if rnd exceeds the total probability.
+        """
+        index = (uniform[:, :, None] > self.cumulative[hours][None, :, :]).sum(axis=2)
+        return np.minimum(index, self.cumulative.shape[1] - 1)
+
+
+def period_range(date, period='day'):
+    """Start and end time (UTC) of the period starting at date."""
+    start_date = pd.to_datetime(date, utc=True).normalize()
+    if period == 'day':
+        end_date = start_date + pd.Timedelta(hours=23)
+    elif period == 'week':
+        end_date = start_date + pd.Timedelta(days=6, hours=23)
+    elif period == 'month':
+        end_date = (start_date + pd.DateOffset(months=1)) - pd.Timedelta(hours=1)
+    else:
+        raise ValueError(f"period must be one of {PERIODS}")
+    return start_date, end_date
+
+
+def period_data(df_data, date, period='day'):
+    """Validation data of the period, restricted to days with all 24 hours."""
+    start_date, end_date = period_range(date, period)
+    data = df_data[(df_data['time'] >= start_date) & (df_data['time'] <= end_date)]
+
+    hours_per_day = data.groupby(data['time'].dt.normalize())['time'].transform('size')
+    for day in data.loc[hours_per_day != 24, 'time'].dt.normalize().unique():
+        print(f"Warning: {day.date()} does not have 24 hours of data. Skipping this day.")
+
+    return data[hours_per_day == 24].reset_index(drop=True)
+
+
+def uniform_samples(num_scenarios, dimension, sampler='mc', seed=None):
+    """Uniform numbers of shape (num_scenarios, dimension) from the given sampler.
+
+    The Sobol sequence is balanced for powers of 2 (scipy warns otherwise).
+    """
+    rng = np.random.default_rng(seed)
+    if sampler == 'mc':
+        return rng.random((num_scenarios, dimension))
+    if sampler == 'sobol':
+        return qmc.Sobol(dimension, scramble=True, seed=rng).random(num_scenarios)
+    if sampler == 'lhs':
+        return qmc.LatinHypercube(dimension, seed=rng).random(num_scenarios)
+    raise ValueError(f"sampler must be one of {SAMPLERS}")
+
+
+def draw_scenarios(forecast, hours, num_scenarios, table, seed=None, sampler='mc'):
+    """Draw scenarios around the forecast.
+
+    Returns the demand paths (num_scenarios, T) and their probabilities, 1/N
+    for every draw (see the module docstring).
+    """
+    uniform = uniform_samples(num_scenarios, len(hours), sampler, seed)
+    index = table.draw(uniform, hours)
+
+    values = np.asarray(forecast, dtype=float) + table.centers[hours, index]
+    return values, np.full(num_scenarios, 1 / num_scenarios)
+
+
+def to_scenario_dict(values, probabilities):
+    """Scenarios in the schema of reduced_heat_demand_scenarios_*.json."""
+    heat_demand_scenarios = {}
+    for i, (scenario_values, probability) in enumerate(zip(values, probabilities)):
+        scenario_dict = {"Probability": float(probability)}
+        scenario_dict.update({str(t + 1): float(value) for t, value in enumerate(scenario_values)})
+        heat_demand_scenarios[f"Scenario{i + 1}"] = scenario_dict
+    return heat_demand_scenarios
+
+
+def generate(date, period='day', num_scenarios=1000, desired_num_scenarios=10, seed=None,
+             df_data=None, table=None, reduction='backward', sampler='mc'):
+    """Generate and reduce the scenarios of one period.
+
+    Returns the file name part ('20230501_to_20230501_day'), the forecast and
+    actual demand ({"heat_demand": ...}) and the reduced scenarios as dicts
+    ready for json.dump, together with the Kantorovich distance of the
+    reduction.
+    """
+    if df_data is None:
+        df_data = load_validation_data()
+    if table is None:
+        table = IntervalTable.from_data(df_data)
+
+    data = period_data(df_data, date, period)
+    if data.empty:
+        raise ValueError(f"No complete day of validation data in the {period} from {date}")
+
+    values, probabilities = draw_scenarios(
+        data['forecast_demand'].to_numpy(), data['hour'].to_numpy(), num_scenarios, table, seed, sampler
+    )
+    kept, reduced_probabilities, distance = reduce_scenarios(
+        values, probabilities, desired_num_scenarios, reduction, seed
+    )
+
+    start_date, end_date = period_range(date, period)
+    filename_date = f"{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}_{period}"
+
+    return {
+        'filename_date': filename_date,
+        'heat_demand': {"heat_demand": {str(t + 1): float(v) for t, v in enumerate(data['forecast_demand'])}},
+        'actual_heat_demand': {"heat_demand": {str(t + 1): float(v) for t, v in enumerate(data['actual_demand'])}},
+        'reduced_heat_demand_scenarios': to_scenario_dict(values[kept], reduced_probabilities),
+        'kantorovich_distance': distance,
+    }
+
+
+def write(result, output_path):
+    """Write forecast, actual demand and reduced scenarios as in the notebook."""
+    os.makedirs(output_path, exist_ok=True)
+    for kind in ['heat_demand', 'actual_heat_demand', 'reduced_heat_demand_scenarios']:
+        with open(os.path.join(output_path, f"{kind}_{result['filename_date']}.json"), 'w') as json_file:
+            json.dump(result[kind], json_file, indent=4)
+
+
+def _generate_and_write(args):
+    date, period, num_scenarios, desired_num_scenarios, seed, reduction, sampler, history_path, output_path = args
+    df_data, table = None, None
+    if history_path is not None:
+        # Fehlermodell aus dem gespeicherten Zustand, ohne die Historie neu auszuwerten
+        history = MeasurementHistory(history_path)
+        df_data, table = history.data(), IntervalTable(*history.errors())
+    result = generate(date, period, num_scenarios, desired_num_scenarios, seed, df_data, table, reduction, sampler)
+    write(result, output_path)
+    return result['filename_date'], result['kantorovich_distance']
+
+
+def _compare(args):
+    date, period, num_scenarios, desired_num_scenarios, seed, sampler = args
+    df_data = load_validation_data()
+    data = period_data(df_data, date, period)
+    values, probabilities = draw_scenarios(
+        data['forecast_demand'].to_numpy(), data['hour'].to_numpy(), num_scenarios,
+        IntervalTable.from_data(df_data), seed, sampler
+    )
+    df_report = compare_reductions(values, probabilities, desired_num_scenarios, seed=seed)
+    df_report.insert(0, 'Date', date)
+    return df_report
+
+
+def main():
+    default_output = resolve_path(load_config(), 'deterministic', 'input_path') + 'demands'
+
+    parser = argparse.ArgumentParser(description='Generate reduced heat demand scenarios.')
+    parser.add_argument('dates', nargs='+', help='start dates of the periods, e.g. 2023-05-01 or 2023-05-01..2023-05-15')
+    parser.add_argument('--period', choices=PERIODS, default='day')
+    parser.add_argument('--scenarios', type=int, default=1000, help='number of scenarios before reduction')
+    parser.add_argument('--reduced', type=int, default=10, help='number of scenarios after reduction')
+    parser.add_argument('--reduction', choices=REDUCTION_METHODS, default='backward')
+    parser.add_argument('--sampler', choices=SAMPLERS, default='mc')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=default_output)
+    parser.add_argument('--history', default=None,
+                        help='measurement history (common.measurements) instead of the validation data')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--compare', action='store_true',
+                        help='print quality and runtime of all reduction methods instead of writing files')
+    args = parser.parse_args()
+    try:
+        args.dates = parse_dates(args.dates)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    # Eigener Seed je Periode, damit das Ergebnis nicht von der Reihenfolge der Prozesse abhängt
+    seeds = np.random.SeedSequence(args.seed).spawn(len(args.dates))
+
+    if args.compare:
+        tasks = [(date, args.period, args.scenarios, args.reduced, seed, args.sampler) for date, seed in zip(args.dates, seeds)]
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            df_report = pd.concat(executor.map(_compare, tasks), ignore_index=True)
+        print(df_report.to_string(index=False))
+        print(df_report.groupby('Method')[['KantorovichDistance', 'Runtime']].mean().to_string())
+        return
+
+    tasks = [
+        (date, args.period, args.scenarios, args.reduced, seed, args.reduction, args.sampler, args.history, args.output)
+        for date, seed in zip(args.dates, seeds)
+    ]
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for filename_date, distance in executor.map(_generate_and_write, tasks):
+            print(f"Scenarios {filename_date} written to {args.output} (Kantorovich distance {distance:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Scenario providers: heat demand scenarios by name, without loading all of them.
+
+A provider knows the scenario names and returns the probability and the
+demand path (array of shape (T,)) of a single scenario on request, so a
+scenario creator only touches its own scenarios:
+
+- GeneratedScenarios: scenarios drawn on demand from the hourly error model
+  (common.demands.sample_heat_demand). Scenario i uses its own child of the
+  seed, so every scenario is reproducible independently of the others.
+- IndexedScenarioStore: one scenario per line (JSON lines) plus an index of
+  byte offsets; reading a scenario is a seek and one json.loads. main_s uses
+  it with use_indexed_scenarios; the store of a scenario file is converted
+  once (IndexedScenarioStore.for_json) and rebuilt when the file is newer.
+- ScenarioSet: all scenarios in memory as one (n_scenarios, T) array with a
+  probability vector and the shared forecast.
+
+HourlyValues wraps a row of an array as Pyomo data ({t: value}, t = 1..T)
+without copying it into a dict.
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+
+import numpy as np
+
+from common.demands import load_forecast_errors, sample_heat_demand
+
+
+def scenario_name(index):
+    """Name of the scenario with the 0-based index, as in the scenario files."""
+    return f'Scenario{index + 1}'
+
+
+def _values(scenario_values):
+    """Demand path of a scenario dict with string hour keys ('1' ... 'T')."""
+    hours = sorted(int(key) for key in scenario_values if key.isdigit())
+    return np.array([scenario_values[str(t)] for t in hours], dtype=float)
+
+
+class HourlyValues(Mapping):
+    """Read-only view of an array (T,) as {t: value} with t = 1..T."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __getitem__(self, t):
+        if not 1 <= t <= len(self.values):
+            raise KeyError(t)
+        return float(self.values[t - 1])
+
+    def __iter__(self):
+        return iter(range(1, len(self.values) + 1))
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ScenarioProvider(ABC):
+    """Interface of the providers; names is set by every provider."""
+
+    names = []
+
+    @abstractmethod
+    def probability(self, name):
+        """Probability of the scenario."""
+
+    @abstractmethod
+    def heat_demand_scenario(self, name):
+        """Demand path of the scenario, array of shape (T,)."""
+
+
+class GeneratedScenarios(ScenarioProvider):
+    """Equally likely scenarios sampled around the forecast on demand."""
+
+    def __init__(self, forecast, num_scenarios, seed=None, errors=None):
+        self.forecast = np.asarray(forecast, dtype=float)
+        self.errors = errors if errors is not None else load_forecast_errors()
+        # Entropie festhalten, damit auch ohne Seed jedes Szenario reproduzierbar bleibt
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.index = {scenario_name(i): i for i in range(num_scenarios)}
+        self.names = list(self.index)
+
+    def probability(self, name):
+        return 1 / len(self.names)
+
+    def heat_demand_scenario(self, name):
+        seed = np.random.SeedSequence(self.entropy, spawn_key=(self.index[name],))
+        return sample_heat_demand(self.forecast, 1, self.errors, seed)[0]
+
+
+class IndexedScenarioStore(ScenarioProvider):
+    """Scenarios stored as JSON lines with an index of byte offsets (file + '.index.json')."""
+
+    def __init__(self, file):
+        self.file = file
+        with open(file + '.index.json') as f:
+            self.index = json.load(f)
+        self.names = list(self.index)
+
+    def _read(self, name):
+        offset, length = self.index[name]
+        with open(self.file, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def probability(self, name):
+        return self._read(name)['Probability']
+
+    def heat_demand_scenario(self, name):
+        return _values(self._read(name))
+
+    @staticmethod
+    def write(file, scenarios):
+        """Write scenarios in the schema of the scenario files ({name: {"Probability", "1", ...}})."""
+        os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+        index = {}
+        with open(file, 'wb') as f:
+            for name, scenario_values in scenarios.items():
+                line = json.dumps(scenario_values).encode()
+                index[name] = [f.tell(), len(line)]
+                f.write(line + b'\n')
+        with open(file + '.index.json', 'w') as f:
+            json.dump(index, f)
+        return IndexedScenarioStore(file)
+
+    @classmethod
+    def from_json(cls, json_file, file):
+        """Convert a reduced_heat_demand_scenarios_*.json file into an indexed store."""
+        with open(json_file) as f:
+            return cls.write(file, json.load(f))
+
+    @classmethod
+    def for_json(cls, json_file, store_path):
+        """Indexed store of a scenario file in store_path, converted only if missing or older than the file."""
+        file = os.path.join(store_path, os.path.basename(json_file).replace('.json', '.jsonl'))
+        index_file = file + '.index.json'
+        if os.path.exists(index_file) and os.path.getmtime(index_file) >= os.path.getmtime(json_file):
+            return cls(file)
+        return cls.from_json(json_file, file)
+
+
+class ScenarioSet(ScenarioProvider):
+    """Scenarios as arrays: values (n_scenarios, T), probabilities (n_scenarios,), forecast (T,)."""
+
+    def __init__(self, names, values, probabilities, forecast):
+        self.names = list(names)
+        self.values = np.asarray(values, dtype=float)
+        self.probabilities = np.asarray(probabilities, dtype=float)
+        self.forecast = np.asarray(forecast, dtype=float)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        # Abweichung Prognose - Szenario für alle Szenarien auf einmal
+        self.delta = self.forecast - self.values
+
+    def probability(self, name):
+        return float(self.probabilities[self.index[name]])
+
+    def heat_demand_scenario(self, name):
+        return self.values[self.index[name]]
+
+    def delta_heat_demand(self, name):
+        return self.delta[self.index[name]]
+
+    @classmethod
+    def from_arrays(cls, values, forecast, probabilities=None):
+        """Scenarios named Scenario1..n; equally likely if no probabilities are given."""
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        if probabilities is None:
+            probabilities = np.full(len(values), 1 / len(values))
+        return cls([scenario_name(i) for i in range(len(values))], values, probabilities, forecast)
+
+    @classmethod
+    def from_json(cls, file, forecast):
+        """Scenarios of a reduced_heat_demand_scenarios_*.json file; incomplete scenarios are skipped."""
+        with open(file) as f:
+            scenario_data = json.load(f)
+
+        n_hours = len(forecast)
+        names, values, probabilities = [], [], []
+        for name, scenario_values in scenario_data.items():
+            try:
+                row = [scenario_values[str(t)] for t in range(1, n_hours + 1)]
+                probability = scenario_values['Probability']
+            except KeyError as e:
+                print(f"Fehler im Szenario {name}: fehlender Schlüssel {e}")
+                continue
+            names.append(name)
+            values.append(row)
+            probabilities.append(probability)
+
+        return cls(names, np.array(values, dtype=float).reshape(len(names), n_hours), probabilities, forecast)
@@ -0,0 +1,267 @@
+"""Scenario reduction of demand paths for large scenario sets.
+
+Two methods, both without a full n x n distance matrix (distances are
+computed in blocks of rows):
+
+- backward_reduction: the rule of scenario_generation.ipynb. The scenario
+  with the smallest probability-weighted distance to its nearest remaining
+  neighbour is removed until the desired number is left. The nearest
+  neighbours are updated incrementally: only scenarios whose neighbour was
+  removed are recomputed. Scenarios keep their original index throughout;
+  the notebook rebuilt scenario_names after every removal but kept indexing
+  the original distance matrix, so it compared the wrong scenarios from the
+  second removal on.
+- forward_selection: fast forward selection. The scenario that reduces the
+  Kantorovich distance most is added until the desired number is selected.
+- kmedoids_reduction: weighted k-medoids clustering. The medoids are the kept
+  scenarios and the probability mass of each cluster their probability; the
+  clustering objective is the Kantorovich distance of the result.
+
+With redistribution='nearest' the probability of every removed scenario goes
+to its nearest kept scenario. For a given kept set that is optimal, and the
+Kantorovich distance between the original and the reduced distribution is
+then sum_i p_i * min_j d(i, j). redistribution='greedy' (backward only)
+reproduces the notebook, which moves the probability to the nearest neighbour
+at the time of removal.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+
+BLOCK_SIZE = 1024
+METHODS = ['backward', 'forward', 'kmedoids']
+
+
+def distances(a, b, b_squared=None):
+    """Euclidean distances between the rows of a (m, T) and b (n, T).
+
+    b_squared: squared row norms of b, if already known (reused over blocks).
+    """
+    if b_squared is None:
+        b_squared = np.einsum('ij,ij->i', b, b)
+    # |a|^2 + |b|^2 - 2ab in place, um Kopien großer Blöcke zu vermeiden
+    squared = a @ b.T
+    squared *= -2
+    squared += np.einsum('ij,ij->i', a, a)[:, None]
+    squared += b_squared[None, :]
+    np.maximum(squared, 0.0, out=squared)
+    return np.sqrt(squared, out=squared)
+
+
+def distance_matrix(values):
+    """Euclidean distances between all scenarios, values of shape (n_scenarios, T)."""
+    return distances(values, values)
+
+
+def _nearest(values, rows, candidates, block_size=BLOCK_SIZE):
+    """Nearest candidate (index, distance) of each row, excluding the row itself."""
+    nearest_index = np.empty(len(rows), dtype=int)
+    nearest_distance = np.empty(len(rows))
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        block_distances = distances(values[block], values[candidates])
+        block_distances[block[:, None] == candidates[None, :]] = np.inf
+        position = np.argmin(block_distances, axis=1)
+        nearest_index[start:start + block_size] = candidates[position]
+        nearest_distance[start:start + block_size] = block_distances[np.arange(len(block)), position]
+    return nearest_index, nearest_distance
+
+
+def redistribute(values, probabilities, kept, block_size=BLOCK_SIZE):
+    """Probabilities of the kept scenarios, each removed scenario moved to its nearest kept one."""
+    kept = np.asarray(kept)
+    reduced_probabilities = np.zeros(len(kept))
+    for start in range(0, len(values), block_size):
+        block_distances = distances(values[start:start + block_size], values[kept])
+        np.add.at(reduced_probabilities, np.argmin(block_distances, axis=1), probabilities[start:start + block_size])
+    return reduced_probabilities / reduced_probabilities.sum()
+
+
+def kantorovich_distance(values, probabilities, kept, block_size=BLOCK_SIZE):
+    """Kantorovich distance of the kept set with optimal redistribution."""
+    values = np.asarray(values, dtype=float)
+    probabilities = np.asarray(probabilities, dtype=float)
+    kept = np.asarray(kept)
+    distance = 0.0
+    for start in range(0, len(values), block_size):
+        block_distances = distances(values[start:start + block_size], values[kept])
+        distance += probabilities[start:start + block_size] @ block_distances.min(axis=1)
+    return distance / probabilities.sum()
+
+
+def backward_reduction(values, probabilities, desired_num_scenarios, redistribution='nearest',
+                       block_size=BLOCK_SIZE):
+    """Backward reduction; returns the indices of the kept scenarios and their probabilities."""
+    values = np.asarray(values, dtype=float)
+    probabilities = np.array(probabilities, dtype=float)
+    n_scenarios = len(probabilities)
+    remaining = np.ones(n_scenarios, dtype=bool)
+
+    all_scenarios = np.arange(n_scenarios)
+    nearest_index, nearest_distance = _nearest(values, all_scenarios, all_scenarios, block_size)
+
+    for _ in range(n_scenarios - desired_num_scenarios):
+        weighted = np.where(remaining, probabilities * nearest_distance, np.inf)
+        d = int(np.argmin(weighted))
+        if redistribution == 'greedy':
+            probabilities[nearest_index[d]] += probabilities[d]
+        remaining[d] = False
+
+        # Nur Szenarien neu berechnen, deren nächster Nachbar entfernt wurde
+        affected = np.flatnonzero(remaining & (nearest_index == d))
+        if len(affected):
+            nearest_index[affected], nearest_distance[affected] = _nearest(
+                values, affected, np.flatnonzero(remaining), block_size
+            )
+
+    kept = np.flatnonzero(remaining)
+    if redistribution == 'greedy':
+        return kept, probabilities[kept] / probabilities[kept].sum()
+    return kept, redistribute(values, np.asarray(probabilities), kept, block_size)
+
+
+def forward_selection(values, probabilities, desired_num_scenarios, block_size=BLOCK_SIZE):
+    """Fast forward selection; returns the indices of the selected scenarios and their probabilities.
+
+    The candidates are ranked in float32 on centered values (distances are
+    invariant to the shift, which keeps the rounding error of |a|^2 + |b|^2 - 2ab
+    small); the probabilities of the selection are computed in float64.
+    """
+    values = np.asarray(values, dtype=float)
+    probabilities = np.asarray(probabilities, dtype=float)
+    n_scenarios = len(probabilities)
+
+    centered = (values - values.mean(axis=0)).astype(np.float32)
+    squared = np.einsum('ij,ij->i', centered, centered)
+    weights = probabilities.astype(np.float32)
+    selected = []
+    # Abstand jedes Szenarios zur bisherigen Auswahl
+    current = np.full(n_scenarios, np.inf, dtype=np.float32)
+
+    for _ in range(desired_num_scenarios):
+        best, best_score, best_distances = -1, np.inf, None
+        for start in range(0, n_scenarios, block_size):
+            block_distances = distances(centered[start:start + block_size], centered, squared)
+            # Kantorovich-Abstand, falls Kandidat u zusätzlich gewählt wird
+            np.minimum(block_distances, current[None, :], out=block_distances)
+            scores = block_distances @ weights
+            scores[[i - start for i in selected if start <= i < start + len(scores)]] = np.inf
+            position = int(np.argmin(scores))
+            if scores[position] < best_score:
+                best, best_score, best_distances = start + position, scores[position], block_distances[position]
+        selected.append(best)
+        current = best_distances
+
+    kept = np.array(selected)
+    return kept, redistribute(values, probabilities, kept, block_size)
+
+
+def _assign(values, medoids, block_size=BLOCK_SIZE):
+    """Index of the nearest medoid and the distance to it for every scenario."""
+    labels = np.empty(len(values), dtype=int)
+    distance = np.empty(len(values))
+    for start in range(0, len(values), block_size):
+        block_distances = distances(values[start:start + block_size], values[medoids])
+        labels[start:start + block_size] = np.argmin(block_distances, axis=1)
+        distance[start:start + block_size] = block_distances.min(axis=1)
+    return labels, distance
+
+
+def _kmedoids(values, probabilities, desired_num_scenarios, rng, max_iter, block_size):
+    """One weighted k-medoids run; returns the medoids and the clustering objective."""
+    n_scenarios = len(probabilities)
+
+    # k-means++ mit Gewichtung durch die Szenariowahrscheinlichkeiten
+    # Abstände zu einem Medoid direkt berechnet: identische Pfade ergeben exakt 0 (nicht |a|^2 + |b|^2 - 2ab)
+    medoids = [int(rng.choice(n_scenarios, p=probabilities / probabilities.sum()))]
+    nearest_distance = np.linalg.norm(values - values[medoids[0]], axis=1)
+    for _ in range(desired_num_scenarios - 1):
+        weights = probabilities * nearest_distance ** 2
+        if weights.sum() <= 0:
+            # Alle Szenarien fallen mit einem Medoid zusammen, keine weiteren unterscheidbaren Pfade
+            break
+        medoids.append(int(rng.choice(n_scenarios, p=weights / weights.sum())))
+        nearest_distance = np.minimum(nearest_distance, np.linalg.norm(values - values[medoids[-1]], axis=1))
+    medoids = np.array(medoids)
+
+    for _ in range(max_iter):
+        labels, _ = _assign(values, medoids, block_size)
+        new_medoids = medoids.copy()
+        for k in range(len(medoids)):
+            members = np.flatnonzero(labels == k)
+            if len(members) == 0:
+                continue
+            cost = np.zeros(len(members))
+            for start in range(0, len(members), block_size):
+                cost[start:start + block_size] = (
+                    distances(values[members[start:start + block_size]], values[members]) @ probabilities[members]
+                )
+            new_medoids[k] = members[np.argmin(cost)]
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+
+    _, distance = _assign(values, medoids, block_size)
+    return medoids, distance @ probabilities
+
+
+def kmedoids_reduction(values, probabilities, desired_num_scenarios, seed=None, n_init=5, max_iter=50,
+                       block_size=BLOCK_SIZE):
+    """Weighted k-medoids; returns the indices of the medoids and the cluster probabilities.
+
+    Initialization with weighted k-means++, then alternating assignment to the
+    nearest medoid and update of every medoid to the member with the smallest
+    weighted distance to its cluster, until the medoids no longer change. The
+    best of n_init runs is kept. If the scenarios have fewer distinct paths
+    (with positive probability) than desired_num_scenarios, the seeding stops
+    early and fewer medoids are returned; a warning is printed.
+    """
+    values = np.asarray(values, dtype=float)
+    probabilities = np.asarray(probabilities, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    runs = [_kmedoids(values, probabilities, desired_num_scenarios, rng, max_iter, block_size) for _ in range(n_init)]
+    medoids, _ = min(runs, key=lambda run: run[1])
+    if len(medoids) < desired_num_scenarios:
+        print(f"Warning: only {len(medoids)} distinct scenarios, k-medoids returns {len(medoids)} "
+              f"instead of {desired_num_scenarios} scenarios.")
+
+    labels, _ = _assign(values, medoids, block_size)
+    cluster_probabilities = np.bincount(labels, weights=probabilities, minlength=len(medoids))
+    order = np.argsort(medoids)
+    return medoids[order], cluster_probabilities[order] / cluster_probabilities.sum()
+
+
+def reduce_scenarios(values, probabilities, desired_num_scenarios, method='backward', seed=None):
+    """Reduce scenarios with the given method ('backward', 'forward', 'kmedoids').
+
+    Returns the kept indices, their probabilities and the Kantorovich distance
+    of the reduced set. The seed is only used by the k-medoids initialization.
+    """
+    if method == 'backward':
+        kept, reduced_probabilities = backward_reduction(values, probabilities, desired_num_scenarios)
+    elif method == 'forward':
+        kept, reduced_probabilities = forward_selection(values, probabilities, desired_num_scenarios)
+    elif method == 'kmedoids':
+        kept, reduced_probabilities = kmedoids_reduction(values, probabilities, desired_num_scenarios, seed)
+    else:
+        raise ValueError(f"Unknown reduction method: {method}")
+    return kept, reduced_probabilities, kantorovich_distance(values, probabilities, kept)
+
+
+def compare_reductions(values, probabilities, desired_num_scenarios, methods=METHODS, seed=None):
+    """Kantorovich distance and runtime of every method on the same scenarios."""
+    rows = []
+    for method in methods:
+        start = time.perf_counter()
+        kept, _, distance = reduce_scenarios(values, probabilities, desired_num_scenarios, method, seed)
+        rows.append({
+            'Method': method,
+            'Scenarios': len(probabilities),
+            'Reduced': len(kept),
+            'KantorovichDistance': distance,
+            'Runtime': time.perf_counter() - start,
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,124 @@
+"""Demand and scenario arrays in shared memory for worker processes.
+
+The parent process loads the data once (e.g. the values of a DemandStore)
+and copies every array into a multiprocessing.shared_memory block. Workers
+receive a small picklable handle (block names, shapes, dtypes and the index
+of the store) and attach NumPy views on the same memory, so memory and start
+up time per worker do not grow with the data or the number of workers.
+
+    with share_demand_store(DemandStore.open()) as shared:
+        results = map_with_store(evaluate_day, days, shared, workers=4)
+
+evaluate_day(store, day) gets a SharedDemandStore with the interface of
+DemandStore (heat_demand, scenarios, frame, ...).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from common.demand_store import DemandStore
+
+
+# Namen der in diesem Prozess erzeugten Blöcke
+_owned = set()
+
+
+class SharedArrays:
+    """Named arrays in shared memory, owned by the process that created them."""
+
+    def __init__(self, arrays):
+        self.blocks = {}
+        self.handle = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks[name] = block
+            _owned.add(block.name)
+            self.handle[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        """Release and remove the shared memory blocks."""
+        for block in self.blocks.values():
+            _owned.discard(block.name)
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Im Worker geöffnete Blöcke, damit die Views gültig bleiben
+_attached = []
+
+
+def _open_block(block_name):
+    try:
+        return shared_memory.SharedMemory(name=block_name, track=False)
+    except TypeError:
+        # Python < 3.13: Block nicht vom resource_tracker des Workers verwalten lassen (gehört dem Parent)
+        block = shared_memory.SharedMemory(name=block_name)
+        if block_name not in _owned:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def attach(handle):
+    """Read-only views on the arrays of a SharedArrays handle."""
+    arrays = {}
+    for name, (block_name, shape, dtype) in handle.items():
+        block = _open_block(block_name)
+        _attached.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    return arrays
+
+
+class SharedDemandStore(DemandStore):
+    """DemandStore on shared memory (created in the worker from a handle)."""
+
+    def __init__(self, handle):
+        self.path = handle['path']
+        self.index = handle['index']
+        self.data = attach(handle['arrays'])['values']
+
+
+class SharedStore(SharedArrays):
+    """Values of a DemandStore in shared memory, with the handle for SharedDemandStore."""
+
+    def __init__(self, store):
+        super().__init__({'values': np.asarray(store.data)})
+        self.store_handle = {'path': store.path, 'index': store.index, 'arrays': self.handle}
+
+
+def share_demand_store(store=None):
+    """Copy the values of a DemandStore (default store if None) into shared memory."""
+    return SharedStore(store if store is not None else DemandStore.open())
+
+
+_worker_store = None
+
+
+def _init_worker(store_handle):
+    global _worker_store
+    _worker_store = SharedDemandStore(store_handle)
+
+
+def _call(args):
+    function, item = args
+    return function(_worker_store, item)
+
+
+def map_with_store(function, items, shared, workers=None):
+    """Call function(store, item) for all items in worker processes sharing the store data.
+
+    function must be picklable (a module-level function).
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.store_handle,)) as executor:
+        return list(executor.map(_call, [(function, item) for item in items]))
@@ -0,0 +1,241 @@
+"""Core-aware scheduling of solves with runtime prediction from past solver logs.
+
+Several Gurobi processes on one node each take all cores by default and slow
+each other down, and one long extensive form started last determines the end
+of a study. The scheduler therefore
+
+    1. reads the Gurobi log files of earlier runs (LogFile of main_d/main_s)
+       into one row per solve: scenarios, horizon, binaries, threads, seconds,
+    2. fits log(seconds) = c + sum(b_f * log(feature_f)) by least squares,
+       pulled towards default exponents (ridge), so features without
+       variation in the history keep their default,
+    3. chooses the number of parallel processes P and the thread budget
+       cores // P per solve with the smallest predicted makespan, simulating
+       longest-processing-time-first (LPT) list scheduling of the jobs.
+
+Without history the default exponents only give the relative order of the
+jobs (seconds proportional to scenarios and horizon).
+
+common.pipeline uses the plan with --cores: ready nodes are started
+longest-first and every solve gets the Threads option of its budget.
+
+Usage (from the models directory):
+    python -m common.solve_scheduler [--cores 16]   history, fitted model and thread scaling
+"""
+import argparse
+import glob
+import heapq
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from common.config import load_config, resolve_path
+
+
+FEATURES = ['scenarios', 'horizon', 'binaries', 'threads']
+# Exponenten ohne Historie: Laufzeit proportional zu Szenarien und Stunden, Threads mit abnehmendem Nutzen
+DEFAULT_EXPONENTS = {'scenarios': 1.0, 'horizon': 1.0, 'binaries': 0.0, 'threads': -0.5}
+# Gewicht, mit dem die Exponenten zu den Standardwerten gezogen werden
+RIDGE_WEIGHT = 1.0
+DEFAULT_SCENARIOS = 10
+PERIOD_HOURS = {'day': 24, 'week': 168}
+
+_OPTIMIZE = re.compile(r'Optimize a model with (\d+) rows, (\d+) columns')
+_VARIABLE_TYPES = re.compile(r'Variable types: \d+ continuous, \d+ integer \((\d+) binary\)')
+_RUNTIME = re.compile(r'(?:Explored \d+ nodes \(\d+ simplex iterations\) in|Solved in \d+ iterations and) ([\d.]+) seconds')
+_THREADS = re.compile(r'Thread count was (\d+)')
+_SCENARIOS = re.compile(r'Extensive form with (\d+) scenarios')
+_PERIOD = re.compile(r'_\d{8}_(\w+?)(?:_USE_\w+)?(?:_Scenario\d+)?\.log$')
+
+
+def parse_solver_log(file):
+    """One dict per solve of a Gurobi log file (a file holds several solves, e.g. SAA iterations).
+
+    Runs of the stochastic model log the scenario count of every extensive
+    form; solves without it are single-scenario (deterministic) solves.
+    """
+    match = _PERIOD.search(os.path.basename(file))
+    horizon = PERIOD_HOURS.get(match.group(1), 24) if match else 24
+    model = 'stochastic' if os.sep + 'stochastic' + os.sep in os.path.abspath(file) else 'deterministic'
+
+    solves, current, scenarios = [], None, 1
+    with open(file, errors='replace') as f:
+        for line in f:
+            if (match := _SCENARIOS.search(line)):
+                scenarios = int(match.group(1))
+            elif (match := _OPTIMIZE.search(line)):
+                current = {'file': os.path.basename(file), 'model': model, 'scenarios': scenarios, 'horizon': horizon,
+                           'rows': int(match.group(1)), 'columns': int(match.group(2)), 'binaries': 0}
+            elif current is None:
+                continue
+            elif (match := _VARIABLE_TYPES.search(line)) and not current['binaries']:
+                # Erste Angabe: Binärvariablen des Originalmodells (vor dem Presolve)
+                current['binaries'] = int(match.group(1))
+            elif (match := _RUNTIME.search(line)):
+                current['seconds'] = float(match.group(1))
+            elif (match := _THREADS.search(line)):
+                current['threads'] = int(match.group(1))
+                if 'seconds' in current:
+                    solves.append(current)
+                current = None
+    return solves
+
+
+def solver_history(log_paths=None, config=None):
+    """All solves of the log directories of both models as DataFrame."""
+    if log_paths is None:
+        config = config or load_config()
+        log_paths = [resolve_path(config, model, 'log_path') for model in ('deterministic', 'stochastic')]
+    rows = [solve for path in log_paths for file in sorted(glob.glob(os.path.join(path, '*.log')))
+            for solve in parse_solver_log(file)]
+    return pd.DataFrame(rows, columns=['file', 'model', 'scenarios', 'horizon', 'rows', 'columns', 'binaries',
+                                       'threads', 'seconds'])
+
+
+class RuntimePredictor:
+    """Log-linear runtime model: seconds = exp(c) * prod(feature ** exponent)."""
+
+    def __init__(self, intercept=0.0, exponents=None, binaries_per_scenario_hour=None):
+        self.intercept = intercept
+        self.exponents = dict(DEFAULT_EXPONENTS if exponents is None else exponents)
+        self.binaries_per_scenario_hour = binaries_per_scenario_hour or {}
+        self.samples = 0
+
+    @classmethod
+    def fit(cls, history, weight=RIDGE_WEIGHT):
+        """Fit the exponents by least squares on the logs, pulled towards the default exponents.
+
+        The pull keeps the exponents of features without variation (e.g. all
+        solves with the same horizon) at their defaults and stabilises the
+        collinear scenarios and binaries.
+        """
+        predictor = cls()
+        history = history[history['seconds'] > 0]
+        if history.empty:
+            return predictor
+
+        features = history[FEATURES].astype(float).copy()
+        features['binaries'] += 1
+        logs = np.log(features).to_numpy()
+        prior = np.array([DEFAULT_EXPONENTS[name] for name in FEATURES])
+
+        # Ridge-Regression als erweitertes Kleinste-Quadrate-Problem (Achsenabschnitt ohne Strafterm)
+        design = np.vstack([
+            np.column_stack([np.ones(len(history)), logs]),
+            np.column_stack([np.zeros(len(FEATURES)), np.sqrt(weight) * np.eye(len(FEATURES))]),
+        ])
+        target = np.concatenate([np.log(history['seconds'].to_numpy()), np.sqrt(weight) * prior])
+        coefficients = np.linalg.lstsq(design, target, rcond=None)[0]
+
+        predictor.intercept = float(coefficients[0])
+        predictor.exponents = {name: float(value) for name, value in zip(FEATURES, coefficients[1:])}
+        # Mehr Threads machen eine Lösung in der Planung nie langsamer und höchstens linear schneller
+        predictor.exponents['threads'] = min(max(predictor.exponents['threads'], -1.0), 0.0)
+        predictor.binaries_per_scenario_hour = (
+            history['binaries'] / (history['scenarios'] * history['horizon'])
+        ).groupby(history['model']).median().to_dict()
+        predictor.samples = len(history)
+        return predictor
+
+    def binaries(self, model, scenarios, horizon):
+        """Expected binaries of a solve (from earlier solves of the model, 0 without history)."""
+        ratio = self.binaries_per_scenario_hour.get(model)
+        if ratio is None and self.binaries_per_scenario_hour:
+            ratio = float(np.median(list(self.binaries_per_scenario_hour.values())))
+        return (ratio or 0.0) * scenarios * horizon
+
+    def predict(self, scenarios, horizon, threads, binaries=None, model='deterministic'):
+        """Predicted seconds of one solve."""
+        if binaries is None:
+            binaries = self.binaries(model, scenarios, horizon)
+        features = {'scenarios': scenarios, 'horizon': horizon, 'binaries': binaries + 1, 'threads': threads}
+        return float(np.exp(self.intercept + sum(self.exponents[name] * np.log(features[name]) for name in FEATURES)))
+
+
+class SolveJob:
+    """Solves of one batch job: repeats solves of the given size (e.g. all wait-and-see scenarios)."""
+
+    def __init__(self, name, scenarios=1, horizon=24, repeats=1, binaries=None, model='deterministic'):
+        self.name = name
+        self.scenarios = scenarios
+        self.horizon = horizon
+        self.repeats = repeats
+        self.binaries = binaries
+        self.model = model
+
+    def seconds(self, predictor, threads):
+        return self.repeats * predictor.predict(self.scenarios, self.horizon, threads, self.binaries, self.model)
+
+
+class Schedule:
+    """Process count, thread budget per solve and predicted seconds per job."""
+
+    def __init__(self, processes, threads, seconds, makespan):
+        self.processes = processes
+        self.threads = threads
+        self.seconds = seconds
+        self.makespan = makespan
+
+    def order(self):
+        """Job names longest first."""
+        return sorted(self.seconds, key=self.seconds.get, reverse=True)
+
+
+def lpt_makespan(durations, processes):
+    """Makespan of longest-processing-time-first list scheduling on identical processes."""
+    finish = [0.0] * processes
+    for duration in sorted(durations, reverse=True):
+        heapq.heapreplace(finish, finish[0] + duration)
+    return max(finish)
+
+
+def plan(jobs, cores=None, predictor=None, processes=None):
+    """Schedule with the smallest predicted makespan over all process counts (or the given one)."""
+    cores = cores or os.cpu_count()
+    predictor = predictor or RuntimePredictor.fit(solver_history())
+    candidates = [processes] if processes else range(1, max(min(cores, len(jobs)), 1) + 1)
+
+    best = None
+    for count in candidates:
+        threads = max(cores // count, 1)
+        seconds = {job.name: job.seconds(predictor, threads) for job in jobs}
+        makespan = lpt_makespan(list(seconds.values()), count) if seconds else 0.0
+        # Bei gleicher Dauer weniger Prozesse (weniger Speicher und Lizenzen)
+        if best is None or makespan < best.makespan * (1 - 1e-9):
+            best = Schedule(count, threads, seconds, makespan)
+    return best
+
+
+def scenario_count(scenario_file, default=DEFAULT_SCENARIOS):
+    """Number of scenarios in a reduced scenario file (default if it does not exist yet)."""
+    if not os.path.exists(scenario_file):
+        return default
+    with open(scenario_file) as f:
+        return len(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the solver history, the fitted runtime model and the thread scaling.')
+    parser.add_argument('--cores', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    history = solver_history()
+    predictor = RuntimePredictor.fit(history)
+    print(f"{len(history)} solves in the logs")
+    if not history.empty:
+        print(history.groupby(['model', 'scenarios'])[['binaries', 'threads', 'seconds']].mean().to_string())
+    print('\nseconds = exp({:.3f}) * '.format(predictor.intercept)
+          + ' * '.join(f'{name}^{exponent:.2f}' for name, exponent in predictor.exponents.items()))
+
+    print(f'\nPredicted seconds of a day ({args.cores} cores):')
+    threads = [t for t in (1, 2, 4, 8, 16, 32) if t <= args.cores]
+    rows = {f'{scenarios} scenarios': [predictor.predict(scenarios, 24, t, model='stochastic' if scenarios > 1 else 'deterministic')
+                                       for t in threads] for scenarios in (1, 5, 10, 20)}
+    print(pd.DataFrame(rows, index=pd.Index(threads, name='threads')).T.round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
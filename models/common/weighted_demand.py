@@ -0,0 +1,106 @@
+"""Probability-weighted heat demand of the scenario files (batch of mean_heat_demand.ipynb).
+
+For every reduced_heat_demand_scenarios_*.json (optionally only a range of
+start dates) the weighted demand sum_s p_s * d_s is computed as one
+matrix-vector product and written to
+weighted_heat_demand/weighted_heat_demand_<start date>.json, the input of
+main_d.run_forecast(weighted=True). As in the notebook, scenarios with a
+negative probability are skipped, missing hours count as 0 and the weights
+are not renormalized (a warning is printed if they do not sum to 1). Files
+whose output is newer than the scenario file are skipped, as are scenario
+files without the heat_demand_*.json forecast of their day (e.g. 20230303 and
+20230514): a weighted run of such a day could not be compared with the other
+cases of the day.
+
+run_forecast(weighted=True) does not build the files itself; the CLI
+(spma.py run --case weighted), the study pipeline and the __main__ block of
+main_d call build() before the run.
+
+Usage (from the models directory):
+    python -m common.weighted_demand [START_DATE END_DATE] [--force]
+"""
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from common.config import load_config, resolve_path
+from common.demand_files import extract_scenario_info
+
+
+TOLERANCE = 1e-6
+
+
+def weighted_demand(scenarios):
+    """Weighted demand {"heat_demand": {"1": ...}} of scenarios in the schema of the scenario files."""
+    n_hours = max(int(key) for values in scenarios.values() for key in values if key.isdigit())
+    names = list(scenarios)
+    probabilities = np.array([scenarios[name].get('Probability', 0) for name in names], dtype=float)
+    values = np.array([[scenarios[name].get(str(t), 0) for t in range(1, n_hours + 1)] for name in names], dtype=float)
+
+    for name in np.array(names)[probabilities < 0]:
+        print(f"Warnung: Wahrscheinlichkeit für {name} ist negativ. Überspringe dieses Szenario.")
+    probabilities = np.maximum(probabilities, 0.0)
+
+    if abs(probabilities.sum() - 1.0) > TOLERANCE:
+        print(f"Warnung: Die Summe der Wahrscheinlichkeiten ({probabilities.sum()}) weicht von 1 ab.")
+
+    weighted = probabilities @ values
+    return {"heat_demand": {str(t): float(value) for t, value in enumerate(weighted, start=1)}}
+
+
+def build(start_date=None, end_date=None, demands_path=None, force=False):
+    """Write the weighted demand of all scenario files (start dates YYYYMMDD, inclusive).
+
+    Returns the list of written files.
+    """
+    if demands_path is None:
+        demands_path = resolve_path(load_config(), 'deterministic', 'input_path') + 'demands'
+    output_path = os.path.join(demands_path, 'weighted_heat_demand')
+    os.makedirs(output_path, exist_ok=True)
+
+    written = []
+    for scenario_file in sorted(glob.glob(os.path.join(demands_path, 'reduced_heat_demand_scenarios_*.json'))):
+        file_start_date, _, _ = extract_scenario_info(scenario_file)
+        if file_start_date is None:
+            continue
+        if (start_date is not None and file_start_date < str(start_date)) or \
+                (end_date is not None and file_start_date > str(end_date)):
+            continue
+
+        forecast_file = os.path.join(demands_path, os.path.basename(scenario_file).replace('reduced_heat_demand_scenarios_', 'heat_demand_'))
+        if not os.path.exists(forecast_file):
+            print(f"Warning: no forecast {os.path.basename(forecast_file)}, {os.path.basename(scenario_file)} skipped.")
+            continue
+
+        output_file = os.path.join(output_path, f'weighted_heat_demand_{file_start_date}.json')
+        # Nur neu berechnen, wenn die Szenariodatei neuer ist als das Ergebnis
+        if not force and os.path.exists(output_file) and os.path.getmtime(output_file) >= os.path.getmtime(scenario_file):
+            continue
+
+        with open(scenario_file, encoding='utf-8') as f:
+            result = weighted_demand(json.load(f))
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+        written.append(output_file)
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the weighted heat demand of all scenario files.')
+    parser.add_argument('start_date', nargs='?', default=None, help='first start date, e.g. 20230301')
+    parser.add_argument('end_date', nargs='?', default=None, help='last start date, e.g. 20230731')
+    parser.add_argument('--force', action='store_true', help='rebuild files that are up to date')
+    args = parser.parse_args()
+
+    written = build(args.start_date, args.end_date, force=args.force)
+    print(f"{len(written)} weighted heat demand files written")
+    for file in written:
+        print(f"  {file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,17 @@
-import pandas as pd 
-
 from pyomo.environ import *
-from pyomo.network import * 
+from pyomo.network import *
+
+from common.asset_specs import storage_spec
 
 class HeatStorage:
 
-    def __init__(self, name, filepath, index_col=0):
+    def __init__(self, name, filepath):
         self.name = name
-        self.get_data(filepath, index_col)
+        self.get_data(filepath)
 
-    def get_data(self, filepath, index_col):
-        self.data = pd.read_csv(
-            filepath,
-            index_col=index_col
-        )
+    def get_data(self, filepath):
+        # Einmal je Prozess gelesene und geprüfte Grenzen (common.asset_specs)
+        self.spec = storage_spec(filepath)
 
     def add_to_model(self, model):
         model.add_component(
@@ -34,8 +32,13 @@ class HeatStorage:
         asset.heat_balance = Var(t, within=Reals)
         asset.heat_capacity = Var(t, within=NonNegativeReals)
 
+        # Limits of the storage
+        max_heat = self.spec.max_heat
+        min_content = self.spec.min_content
+        max_content = self.spec.max_content
+
         # Declare Params
-        asset.initial_soc = Param(initialize=self.data.loc['max', 'content']*0.8)
+        asset.initial_soc = Param(initialize=self.spec.initial_soc)
 
 
         asset.heat_in = Port()
@@ -57,22 +60,22 @@ class HeatStorage:
        # Declare construction rules for components
         def max_heat_charge_rule(asset, t):
             """Maximum heat charge constraint"""
-            return asset.heat_charge[t] <= self.data.loc['max', 'heat']*asset.bin_charge[t]
+            return asset.heat_charge[t] <= max_heat*asset.bin_charge[t]
         asset.max_heat_charge_constr = Constraint(t, rule=max_heat_charge_rule)
 
         def max_heat_discharge_rule(asset, t):
             """Maximum heat discharge constraint"""
-            return asset.heat_discharge[t] <= self.data.loc['max', 'heat']*asset.bin_discharge[t]
+            return asset.heat_discharge[t] <= max_heat*asset.bin_discharge[t]
         asset.max_heat_discharge_constr = Constraint(t, rule=max_heat_discharge_rule)
 
         def max_heat_capacity(asset, t):
             """Maximum heat capacity constraint"""
-            return asset.heat_capacity[t] <= self.data.loc['max', 'content']
+            return asset.heat_capacity[t] <= max_content
         asset.max_heat_capacity_constr = Constraint(t, rule=max_heat_capacity)
 
         def min_heat_capacity(asset, t):
             """Minimum heat capacity constraint"""
-            return asset.heat_capacity[t] >= self.data.loc['min', 'content']
+            return asset.heat_capacity[t] >= min_content
         asset.min_heat_capacity_constr = Constraint(t, rule=min_heat_capacity)
 
         def heat_balance_rule(asset, t):
@@ -1,87 +1,169 @@
 import pandas as pd
 
-from pyomo.opt import SolverFactory
+from pyomo.common.errors import ApplicationError
+from pyomo.opt import SolverFactory, TerminationCondition
 from pyomo.environ import *
 from pyomo.network import *
 from datetime import datetime
 
-import assets.chp_d as chp
-import assets.boiler_d as boiler
-import assets.heat_storage_d as heat_storage
-import assets.grid_d as grid
-
-import json
 import os
 import re
 import glob
+import sys
+from statistics import NormalDist
 
-# Load the config.json
-with open('../config.json', 'r') as f:
-    config = json.load(f)
-
-# Model Config
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# Die Assets lesen ihre Daten über common.asset_specs
+import assets.chp_d as chp
+import assets.boiler_d as boiler
+import assets.heat_storage_d as heat_storage
+import assets.grid_d as grid
+from common import asset_specs, dispatch_heuristic, weighted_demand
+from common.batch_runner import run_batch
+from common.demand_store import DemandStore
+from common.demand_files import extract_scenario_info, load_heat_demand, load_heat_demand_scenarios
+from common.demands import load_forecast_errors
+from common.model_snapshot import SnapshotCache
+from common.plant import Plant, Storage
+from common.result_cache import ResultCache
+from common.run_config import RunConfig
+from common.run_keys import SOLVER_NAME, SOLVER_OPTIONS, actual_key, forecast_key, scenarios_key
+
+# Konfiguration der Läufe (config.json über einen absoluten Pfad, Modelle erhalten sie als RunConfig)
 model_type = 'deterministic'
-model_config = config['deterministic']
-
-# Global Config
-global_config = config['global']
-
-# Paths
-data_path = global_config['data_path']
-
-# Declare paths
-PATH_IN = os.path.join(data_path, model_config['input_path'])
-PATH_OUT = os.path.join(data_path, model_config['output_path'])
-PATH_OUT_LOGS = os.path.join(data_path, model_config['log_path'])
-PATH_OUT_TIMESERIES = os.path.join(data_path, model_config['timeseries_path'])
-PATH_OUT_OBJECTIVES = os.path.join(data_path, model_config['objectives_path'])
-PATH_OUT_ACTUAL = os.path.join(data_path, model_config['actual_path'])
-PATH_OUT_SCENARIOS = os.path.join(data_path, model_config['scenarios_path'])
-
-# Heat Demand Data
-FILE_HEAT_DEMAND = global_config['heat_demand_file']
-FILE_HEAT_DEMAND_SCENARIOS = global_config['heat_demand_scenario_file']
-
-# Weighted Heat Demand
-WEIGHTED_HEAT_DEMAND = global_config['weighted_heat_demand']
-
-# Declare constants
-GAS_PRICE = global_config['gas_price']  # €/kWh  (HS)
-POWER_PRICE = global_config['power_price']  # €/kWh (el)
-HEAT_PRICE = global_config['heat_price']  # €/kWh (th)
-CALORIFIC_VALUE_NGAS = global_config['calorific_value_ngas']  # kWh/m3
-
-# CHP
-CHP_BONUS_SELF_CONSUMPTION = global_config['chp_bonus_self_consumption']  # €/kWhel
-CHP_BONUS = global_config['chp_bonus']  # €/kWhel
-CHP_INDEX_EEX = global_config['chp_index_eex']  # €/kWhel
-ENERGY_TAX_REFUND_GAS = global_config['energy_tax_refund_gas']  # €/kWhHS
-AVOIDED_GRID_FEES = global_config['avoided_grid_fees']  # €/kWhel
-SHARE_SELF_CONSUMPTION = global_config['share_self_consumption']  # %
-SHARE_FEED_IN = global_config['share_feed_in']  # %
-
-# Boiler
-POWERCOST_TO_HEAT_SALES_RATIO = global_config['power_cost_to_heat_sales_ratio']
-
-# Heat Storage
-COST_CHARGE = global_config['cost_charge']  # €/kWh
-COST_DISCHARGE = global_config['cost_discharge']  # €/kWh
-
-# Costs
-MAINTENANCE_COSTS = global_config['maintenance_cost']  # €/kWh (HS)
+RUN_CONFIG = RunConfig.from_config(model_type)
+
+# Abbrüche durch Limits; ohne Lösung gilt der Lauf als ohne Incumbent beendet
+LIMIT_CONDITIONS = (TerminationCondition.maxTimeLimit, TerminationCondition.maxIterations,
+                    TerminationCondition.maxEvaluations)
+
+
+class NoIncumbentError(RuntimeError):
+    """A limit (e.g. TimeLimit) ended the solve before any feasible solution was found."""
+
+
+# Terme der Zielfunktion; Funktionen des Moduls, damit create_instance mit der Regel nur die RunConfig kopiert
+# (nicht das Model mit Solver und Zeitreihen)
+def objective_expr(model, config):
+    """Objective function expression."""
+    objective_expr = (
+        _gas_costs(model, config) +
+        _power_costs(model, config) +
+        _storage_costs(model, config) +
+        _maintenance_costs(model, config) -
+        _power_revenue(model, config) -
+        _heat_revenue(model, config) -
+        _chp_revenue(model, config)
+    )
+    return objective_expr
+
+
+def _gas_costs(model, config):
+    """ Calculate gas costs for CHP and Boiler."""
+    gas_costs = (
+        quicksum(model.chp1.gas[t] * model.GAS_PRICE[t] for t in model.t) +
+        quicksum(model.chp2.gas[t] * model.GAS_PRICE[t] for t in model.t) +
+        quicksum(model.boiler1.gas[t] * model.GAS_PRICE[t] for t in model.t)
+    )
+    return gas_costs
+
+
+def _power_costs(model, config):
+    """Calculate power costs for Boiler."""
+    power_costs = quicksum(model.boiler1.heat[t] * config.power_cost_to_heat_sales_ratio * model.POWER_PRICE[t] for t in model.t)
+    return power_costs
+
+
+# New
+def _storage_costs(model, config):
+    """Calculate storage costs for Heat Storage."""
+    storage_costs = (
+        quicksum(model.heat_storage1.heat_charge[t] * config.cost_charge for t in model.t) +
+        quicksum(model.heat_storage1.heat_discharge[t] * config.cost_discharge for t in model.t)
+    )
+    return storage_costs
+
+
+def _maintenance_costs(model, config):
+    """Calculate maintenance costs for CHP."""
+    maintenance_costs = (
+        quicksum(model.chp1.bin[t] * config.maintenance_cost for t in model.t) +
+        quicksum(model.chp2.bin[t] * config.maintenance_cost for t in model.t)
+    )
+    return maintenance_costs
+
+
+def _power_revenue(model, config):
+    """Calculate power revenue for CHP."""
+    power_revenue = (
+        quicksum(model.chp1.power[t] * model.POWER_PRICE[t] for t in model.t) +
+        quicksum(model.chp2.power[t] * model.POWER_PRICE[t] for t in model.t)
+    )
+    return power_revenue
+
+
+def _heat_revenue(model, config):
+    """Calculate heat revenue for CHP and Boiler."""
+    heat_revenue = (
+        quicksum(model.chp1.heat[t] * model.HEAT_PRICE[t] for t in model.t) +
+        quicksum(model.chp2.heat[t] * model.HEAT_PRICE[t] for t in model.t) +
+        quicksum(model.boiler1.heat[t] * model.HEAT_PRICE[t] for t in model.t)
+    )
+    return heat_revenue
+
+
+def _chp_revenue(model, config):
+    """Calculate CHP revenue."""
+    chp_bonus_for_self_consumption = (
+        quicksum(model.chp1.power[t] * config.chp_bonus_self_consumption * config.share_self_consumption for t in model.t) +
+        quicksum(model.chp2.power[t] * config.chp_bonus_self_consumption * config.share_self_consumption for t in model.t)
+    )
+
+    chp_bonus_for_feed_in = (
+        quicksum(model.chp1.power[t] * config.chp_bonus * config.share_feed_in for t in model.t) +
+        quicksum(model.chp2.power[t] * config.chp_bonus * config.share_feed_in for t in model.t)
+    )
+
+    chp_index = (
+        quicksum((model.chp1.power[t] - model.chp1.power[t] * config.share_self_consumption) * config.chp_index_eex for t in model.t) +
+        quicksum((model.chp2.power[t] - model.chp2.power[t] * config.share_self_consumption) * config.chp_index_eex for t in model.t)
+    )
+
+    avoided_grid_fees = (
+        quicksum((model.chp1.power[t] - model.chp1.power[t] * config.share_self_consumption) * config.avoided_grid_fees for t in model.t) +
+        quicksum((model.chp2.power[t] - model.chp2.power[t] * config.share_self_consumption) * config.avoided_grid_fees for t in model.t)
+    )
+
+    energy_tax_refund = (
+        quicksum(model.chp1.gas[t] * config.energy_tax_refund_gas for t in model.t) +
+        quicksum(model.chp2.gas[t] * config.energy_tax_refund_gas for t in model.t)
+    )
+
+    chp_revenue = (
+        chp_bonus_for_self_consumption +
+        chp_bonus_for_feed_in +
+        chp_index +
+        avoided_grid_fees +
+        energy_tax_refund
+    )
+    return chp_revenue
 
 
 class Model:
     """Model class."""
 
-    def __init__(self, heat_demand_data):
+    def __init__(self, heat_demand_data, run_config=None):
+        """run_config: RunConfig of the run (paths, prices, flags), default from config.json."""
+        self.config = run_config or RUN_CONFIG
         self.model = AbstractModel()
         self.instance = None
         self.solver = None
         self.timeseries_data = None
         self.results = None
         self.results_data = None
-        self.USE_WEIGHTED_HEAT_DEMAND = Model.USE_WEIGHTED_HEAT_DEMAND
+        self.start_dispatch = None
+        # optimal, feasible (Limit mit Incumbent) oder heuristic (Fallback, keine MIP-Lösung)
+        self.status = None
         self._load_timeseries_data(heat_demand_data)
         self.objective_value = None  # Hinzugefügt: Variable zum Speichern des Zielfunktionswerts
 
@@ -98,7 +180,8 @@ class Model:
 
         self.timeseries_data = {None: {
             't': {None: t_values},
-            'heat_demand': heat_demand
+            'heat_demand': heat_demand,
+            **self.config.price_data(t_values)
         }}
 
     def add_components(self):
@@ -107,37 +190,37 @@ class Model:
         # Sets
         self.model.t = Set(ordered=True)
 
-        # Parameters
-        self.model.GAS_PRICE = Param(initialize=GAS_PRICE)
-        self.model.POWER_PRICE = Param(initialize=POWER_PRICE)
-        self.model.HEAT_PRICE = Param(initialize=HEAT_PRICE)
+        # Parameters (prices per hour from RunConfig.price_data, mutable for common.price_sweep)
+        self.model.GAS_PRICE = Param(self.model.t, mutable=True)
+        self.model.POWER_PRICE = Param(self.model.t, mutable=True)
+        self.model.HEAT_PRICE = Param(self.model.t, mutable=True)
         self.model.heat_demand = Param(self.model.t)
 
         # Assets
 
         chp1 = chp.Chp(
-            'chp1', PATH_IN + '/assets/chp_operation_1.csv'
+            'chp1', self.config.path_in + 'assets/chp_operation_1.csv'
         )
         chp2 = chp.Chp(
-            'chp2', PATH_IN + '/assets/chp_operation_2.csv'
+            'chp2', self.config.path_in + 'assets/chp_operation_2.csv'
         )
 
         boiler1 = boiler.Boiler(
-            'boiler1', PATH_IN + '/assets/boiler_operation.csv'
+            'boiler1', self.config.path_in + 'assets/boiler_operation.csv'
         )
 
         heat_storage1 = heat_storage.HeatStorage(
-            'heat_storage1', PATH_IN + '/assets/heat_storage.csv'
+            'heat_storage1', self.config.path_in + 'assets/heat_storage.csv'
         )
 
         ngas_grid = grid.NGasGrid('ngas_grid')
 
         power_grid = grid.ElectricalGrid(
-            'power_grid', PATH_IN + '/assets/power_grid.csv'
+            'power_grid', self.config.path_in + 'assets/power_grid.csv'
         )
 
         heat_grid = grid.HeatGrid(
-            'heat_grid', PATH_IN + '/assets/heat_grid.csv'
+            'heat_grid', self.config.path_in + 'assets/heat_grid.csv'
         )
 
         chp1.add_to_model(self.model)
@@ -150,8 +233,9 @@ class Model:
 
     def add_objective(self):
         """Add objective function to model."""
+        config = self.config
         self.model.objective = Objective(
-            rule=self.objective_expr,
+            rule=lambda model: objective_expr(model, config),
             sense=minimize
         )
 
@@ -212,21 +296,139 @@ class Model:
             destination=self.instance.heat_storage1.heat_in
         )
 
-    def solve(self):
-        """Solve the model."""
+    def add_chance_constraints(self, service_level, forecast=None):
+        """Tighten storage power and content with Gaussian quantiles of the forecast error.
+
+        The actual demand deviates from heat_demand by the forecast error
+        e ~ N(mu, sigma) of the hour (common.demands.load_forecast_errors) and,
+        as in the second stage of the stochastic model, the heat storage takes
+        the deviation. With the quantiles of the service level alpha
+
+            q_up = mu + z_alpha * sigma     (demand above plan)
+            q_down = z_alpha * sigma - mu   (demand below plan)
+
+        each hour keeps discharge and charge headroom and a content reserve, so
+        that every constraint holds with probability alpha:
+
+            heat_discharge <= max_heat - q_up,    heat_capacity >= min_content + q_up
+            heat_charge <= max_heat - q_down,     heat_capacity <= max_content - q_down
+
+        Only the storage is tightened: the heat balance stays the balance of
+        the planned demand, and the units are not redispatched, so the storage
+        alone takes the deviation. The hourly constraints hold with probability
+        alpha each, not jointly over the day, and as in the stochastic model
+        the content reserve covers the deviation of the hour only.
+
+        service_level: float or dict {t: alpha}. forecast: forecast the errors
+        refer to, if heat_demand is not the forecast (e.g. weighted demand).
+        """
+        heat_demand = self.timeseries_data[None]['heat_demand']
+        if forecast is None:
+            forecast = heat_demand
+        if not isinstance(service_level, dict):
+            service_level = {t: service_level for t in heat_demand}
+
+        mu, sigma = load_forecast_errors()
+        storage = Storage('heat_storage1', self.config.path_in + 'assets/heat_storage.csv')
+
+        reserve_up, reserve_down = {}, {}
+        for t in self.instance.t:
+            hour = (t - 1) % 24  # t = 1 entspricht Stunde 0
+            z = NormalDist().inv_cdf(service_level[t])
+            mean = forecast[t] + mu[hour] - heat_demand[t]
+            reserve_up[t] = min(max(mean + z * sigma[hour], 0), storage.max_heat)
+            reserve_down[t] = min(max(z * sigma[hour] - mean, 0), storage.max_heat)
+            if reserve_up[t] == storage.max_heat or reserve_down[t] == storage.max_heat:
+                print(f'Warning: service level {service_level[t]} in hour {t} exceeds the storage power.')
+
+        heat_storage1 = self.instance.heat_storage1
+        self.instance.reserve_up = Param(self.instance.t, initialize=reserve_up)
+        self.instance.reserve_down = Param(self.instance.t, initialize=reserve_down)
+
+        def chance_discharge_rule(model, t):
+            return heat_storage1.heat_discharge[t] <= storage.max_heat - model.reserve_up[t]
+        self.instance.chance_discharge_constr = Constraint(self.instance.t, rule=chance_discharge_rule)
+
+        def chance_charge_rule(model, t):
+            return heat_storage1.heat_charge[t] <= storage.max_heat - model.reserve_down[t]
+        self.instance.chance_charge_constr = Constraint(self.instance.t, rule=chance_charge_rule)
+
+        def chance_min_capacity_rule(model, t):
+            return heat_storage1.heat_capacity[t] >= storage.min_content + model.reserve_up[t]
+        self.instance.chance_min_capacity_constr = Constraint(self.instance.t, rule=chance_min_capacity_rule)
+
+        def chance_max_capacity_rule(model, t):
+            return heat_storage1.heat_capacity[t] <= storage.max_content - model.reserve_down[t]
+        self.instance.chance_max_capacity_constr = Constraint(self.instance.t, rule=chance_max_capacity_rule)
+
+    def solve(self, warmstart=False):
+        """Solve the model; status is 'optimal' or 'feasible' (limit reached with an incumbent).
+
+        Raises NoIncumbentError if a limit ends the solve without a solution
+        and RuntimeError for every other termination without a solution
+        (e.g. infeasible).
+        """
+        # warmstart only if requested, not every solver interface accepts the keyword
+        solve_kwargs = {'warmstart': True} if warmstart else {}
         self.results = self.solver.solve(
             self.instance,
             symbolic_solver_labels=True,
             tee=True,
-            load_solutions=True,
+            load_solutions=False,
             report_timing=True,
+            **solve_kwargs
         )
+        termination = self.results.solver.termination_condition
+        if len(self.results.solution) == 0:
+            if termination in LIMIT_CONDITIONS:
+                raise NoIncumbentError(f'{termination} reached without a feasible solution')
+            raise RuntimeError(f'Solver ended without a solution ({termination})')
+        self.instance.solutions.load_from(self.results)
+        self.status = 'optimal' if termination == TerminationCondition.optimal else 'feasible'
         # Nach dem Lösen des Modells den Zielfunktionswert speichern
         self.objective_value = value(self.instance.objective)
 
+    def set_initial_values(self, dispatch):
+        """Set the variable values of the instance from a heuristic dispatch."""
+        for name, values in dispatch.variables().items():
+            variables = self.instance.find_component(name)
+            if variables is None:
+                continue
+            for t, v in zip(self.instance.t, values):
+                variables[t].value = float(v)
+
+    def solve_with_fallback(self, dispatch):
+        """Solve the model with the heuristic dispatch as MIP start.
+
+        The heuristic dispatch becomes the answer (status 'heuristic') only if
+        the solver cannot run (not installed, no free license) or a limit ends
+        the solve without an incumbent, e.g. when the MIP start was rejected.
+        Every other error is raised.
+        """
+        self.set_initial_values(dispatch)
+        if not self.solver.available(exception_flag=False):
+            self.use_dispatch(dispatch, f'solver {self.solver.name} is not available')
+            return
+        try:
+            self.solve(warmstart=True)
+        except ApplicationError as e:
+            # Solver ließ sich nicht starten (z.B. keine freie Lizenz)
+            self.use_dispatch(dispatch, f'solver failed to run ({e})')
+        except NoIncumbentError as e:
+            self.use_dispatch(dispatch, str(e))
+
+    def use_dispatch(self, dispatch, reason):
+        """Take the heuristic dispatch as result, marked with status 'heuristic'."""
+        print(f'Warning: {reason}; the results are the heuristic dispatch, not a MIP solution.')
+        self.results = None
+        self.set_initial_values(dispatch)
+        self.status = 'heuristic'
+        self.objective_value = value(self.instance.objective)
+
     def write_results(self):
         """Write results to file."""
-        self.results.write()
+        if self.results is not None:
+            self.results.write()
 
         df_params = pd.DataFrame()
         df_variables = pd.DataFrame()
@@ -254,104 +456,6 @@ class Model:
         """Save results to object."""
         self.results_data.to_csv(filepath)
 
-    def objective_expr(self, model):
-        """Objective function expression."""
-        objective_expr = (
-            self._gas_costs(model) +
-            self._power_costs(model) +
-            self._storage_costs(model) +
-            self._maintenance_costs(model) -
-            self._power_revenue(model) -
-            self._heat_revenue(model) -
-            self._chp_revenue(model)
-        )
-        return objective_expr
-
-    def _gas_costs(self, model):
-        """ Calculate gas costs for CHP and Boiler."""
-        gas_costs = (
-            quicksum(model.chp1.gas[t] * model.GAS_PRICE for t in model.t) +
-            quicksum(model.chp2.gas[t] * model.GAS_PRICE for t in model.t) +
-            quicksum(model.boiler1.gas[t] * model.GAS_PRICE for t in model.t)
-        )
-        return gas_costs
-
-    def _power_costs(self, model):
-        """Calculate power costs for Boiler."""
-        power_costs = quicksum(model.boiler1.heat[t] * POWERCOST_TO_HEAT_SALES_RATIO * model.POWER_PRICE for t in model.t)
-        return power_costs
-
-    # New
-    def _storage_costs(self, model):
-        """Calculate storage costs for Heat Storage."""
-        storage_costs = (
-            quicksum(model.heat_storage1.heat_charge[t] * COST_CHARGE for t in model.t) +
-            quicksum(model.heat_storage1.heat_discharge[t] * COST_DISCHARGE for t in model.t)
-        )
-        return storage_costs
-
-    def _maintenance_costs(self, model):
-        """Calculate maintenance costs for CHP."""
-        maintenance_costs = (
-            quicksum(model.chp1.bin[t] * MAINTENANCE_COSTS for t in model.t) +
-            quicksum(model.chp2.bin[t] * MAINTENANCE_COSTS for t in model.t)
-        )
-        return maintenance_costs
-
-    def _power_revenue(self, model):
-        """Calculate power revenue for CHP."""
-        power_revenue = (
-            quicksum(model.chp1.power[t] * model.POWER_PRICE for t in model.t) +
-            quicksum(model.chp2.power[t] * model.POWER_PRICE for t in model.t)
-        )
-        return power_revenue
-
-    def _heat_revenue(self, model):
-        """Calculate heat revenue for CHP and Boiler."""
-        heat_revenue = (
-            quicksum(model.chp1.heat[t] * model.HEAT_PRICE for t in model.t) +
-            quicksum(model.chp2.heat[t] * model.HEAT_PRICE for t in model.t) +
-            quicksum(model.boiler1.heat[t] * model.HEAT_PRICE for t in model.t)
-        )
-        return heat_revenue
-
-    def _chp_revenue(self, model):
-        """Calculate CHP revenue."""
-        chp_bonus_for_self_consumption = (
-            quicksum(model.chp1.power[t] * CHP_BONUS_SELF_CONSUMPTION * SHARE_SELF_CONSUMPTION for t in model.t) +
-            quicksum(model.chp2.power[t] * CHP_BONUS_SELF_CONSUMPTION * SHARE_SELF_CONSUMPTION for t in model.t)
-        )
-
-        chp_bonus_for_feed_in = (
-            quicksum(model.chp1.power[t] * CHP_BONUS * SHARE_FEED_IN for t in model.t) +
-            quicksum(model.chp2.power[t] * CHP_BONUS * SHARE_FEED_IN for t in model.t)
-        )
-
-        chp_index = (
-            quicksum((model.chp1.power[t] - model.chp1.power[t] * SHARE_SELF_CONSUMPTION) * CHP_INDEX_EEX for t in model.t) +
-            quicksum((model.chp2.power[t] - model.chp2.power[t] * SHARE_SELF_CONSUMPTION) * CHP_INDEX_EEX for t in model.t)
-        )
-
-        avoided_grid_fees = (
-            quicksum((model.chp1.power[t] - model.chp1.power[t] * SHARE_SELF_CONSUMPTION) * AVOIDED_GRID_FEES for t in model.t) +
-            quicksum((model.chp2.power[t] - model.chp2.power[t] * SHARE_SELF_CONSUMPTION) * AVOIDED_GRID_FEES for t in model.t)
-        )
-
-        energy_tax_refund = (
-            quicksum(model.chp1.gas[t] * ENERGY_TAX_REFUND_GAS for t in model.t) +
-            quicksum(model.chp2.gas[t] * ENERGY_TAX_REFUND_GAS for t in model.t)
-        )
-
-        chp_revenue = (
-            chp_bonus_for_self_consumption +
-            chp_bonus_for_feed_in +
-            chp_index +
-            avoided_grid_fees +
-            energy_tax_refund
-        )
-        return chp_revenue
-
-
     def _extract_scenario_info(self, file):
         """Extract the start date, end date, and period from the file name."""
         base_name = os.path.basename(file)
@@ -397,240 +501,447 @@ class Model:
         return None, None, None
 
 
-if __name__ == "__main__":
-    # Flag zum Steuern, ob mehrere Szenarien durchlaufen werden sollen
-    
-    run_actual_heat_demand = False 
-    run_multiple_scenarios = False # Setzen Sie diesen Wert auf False, um nur ein Szenario zu laufen
-    Model.USE_WEIGHTED_HEAT_DEMAND = True
+# Quelldateien, die den Aufbau der Instanz bestimmen (Schlüssel der Snapshots)
+SNAPSHOT_SOURCES = [os.path.abspath(__file__), asset_specs.__file__] + sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', '*.py')))
 
-    # Einheitliche Solver-Einstellungen
-    solver_name = 'gurobi'
-    solver_options = {
-        'MIPGap': 0.01,
-        'TimeLimit': 1000,
-    }
 
-    if run_multiple_scenarios:
-        # Pfad zu den Szenario-Dateien
-        scenario_files = glob.glob(f'{PATH_IN}demands/reduced_heat_demand_scenarios_*.json')
+def _selected(start_date, dates):
+    """True if the start date (YYYYMMDD) is in dates (None = all dates)."""
+    return dates is None or start_date in dates
 
-        # Liste zur Speicherung aller Zielfunktionswerte
-        all_objective_values = []
 
-        # Iteration über alle Szenario-Dateien
-        for scenario_file in scenario_files:
-            # Laden der Heat-Demand-Szenarien aus der aktuellen Datei
-            with open(scenario_file) as f:
-                heat_demand_scenarios = json.load(f)
+def build_instance(model):
+    """Build the instance of a model (components, objective, arcs), returns the instance."""
+    print('Adding components...')
+    model.add_components()
 
-            # Entfernen der "Probability" Einträge aus den Szenarien
-            for scenario in heat_demand_scenarios:
-                if 'Probability' in heat_demand_scenarios[scenario]:
-                    del heat_demand_scenarios[scenario]['Probability']
+    print('Adding objective...')
+    model.add_objective()
 
-            # Extrahieren von Startdatum, Enddatum und Zeitraum aus dem Dateinamen
-            dummy_model = Model({})
-            start_date, end_date, period = dummy_model._extract_scenario_info(scenario_file)
+    print('Instantiating model...')
+    model.instantiate_model()
 
-            # Liste zur Speicherung der Zielfunktionswerte für die aktuelle Datei
-            objective_values = []
+    print('Declaring arcs...')
+    model.add_arcs()
+    model.expand_arcs()
+    return model.instance
 
-            # Iteration über alle Szenarien in der aktuellen Datei
-            for scenario_name, heat_demand_data in heat_demand_scenarios.items():
-                print(f'\n### Running scenario: {scenario_name} from file: {os.path.basename(scenario_file)} ###\n')
 
-                model = Model(heat_demand_data)
+def build_model(heat_demand_data, log_filename, solver_name=SOLVER_NAME, solver_options=None,
+                use_heuristic_start=True, service_level=None, forecast=None, snapshots=None, run_config=None):
+    """Model for one heat demand with built instance, solver and heuristic start, ready to solve.
 
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                log_filename = f"{PATH_OUT_LOGS}logfile_{timestamp}_{start_date}_{period}_{scenario_name}.log"
+    snapshots: SnapshotCache (common.model_snapshot); a stored instance of the
+    same heat demand is loaded instead of built. run_config: RunConfig of the
+    model (default from config.json).
+    """
+    model = Model(heat_demand_data, run_config)
 
-                print('Setting solver...')
-                # Verwendung der einheitlichen Solver-Einstellungen
-                solver_options_with_log = solver_options.copy()
-                solver_options_with_log['LogFile'] = log_filename
-                model.set_solver(
-                    solver_name=solver_name,
-                    **solver_options_with_log
-                )
+    print('Setting solver...')
+    # Verwendung der einheitlichen Solver-Einstellungen
+    solver_options_with_log = dict(SOLVER_OPTIONS if solver_options is None else solver_options)
+    solver_options_with_log['LogFile'] = log_filename
+    model.set_solver(
+        solver_name=solver_name,
+        **solver_options_with_log
+    )
 
-                print('Adding components...')
-                model.add_components()
-
-                print('Adding objective...')
-                model.add_objective()
-
-                print('Instantiating model...')
-                model.instantiate_model()
+    if snapshots is None:
+        build_instance(model)
+    else:
+        key = snapshots.key(SNAPSHOT_SOURCES, {'heat_demand': heat_demand_data, 'prices': model.config.prices()})
+        # Nutzen je Horizont getrennt erfasst (lohnt sich erst bei langen Horizonten, siehe common.model_snapshot)
+        model.instance = snapshots.build(key, lambda: build_instance(model), f'{model_type}_{len(heat_demand_data)}h')
+
+    if service_level is not None:
+        print('Adding chance constraints...')
+        model.add_chance_constraints(service_level, forecast)
+
+    if use_heuristic_start:
+        # Mit Chance Constraints hält der Start (und Fallback) die verschärften Speichergrenzen ein
+        reserves = None
+        if service_level is not None:
+            reserves = ([value(model.instance.reserve_up[t]) for t in model.instance.t],
+                        [value(model.instance.reserve_down[t]) for t in model.instance.t])
+        try:
+            # Preise des Modells je Stunde (GAS_PRICE[t], POWER_PRICE[t], HEAT_PRICE[t])
+            plant = Plant.from_run_config(model.config, list(model.instance.t))
+            model.start_dispatch = dispatch_heuristic.dispatch(heat_demand_data, plant, reserves=reserves)
+        except ValueError as e:
+            print(f'No heuristic dispatch ({e}), solving without MIP start and fallback.')
+    return model
+
+
+def solve_model(model):
+    """Solve a model of build_model (with the heuristic dispatch as MIP start and fallback, if any)."""
+    print('Solving model...')
+    if model.start_dispatch is not None:
+        model.solve_with_fallback(model.start_dispatch)
+    else:
+        model.solve()
+    return model
+
+
+def solve_heat_demand(heat_demand_data, log_filename, solver_name=SOLVER_NAME, solver_options=None,
+                      use_heuristic_start=True, service_level=None, forecast=None, snapshots=None, run_config=None):
+    """Build and solve the model for one heat demand, returns the solved model (see build_model)."""
+    model = build_model(heat_demand_data, log_filename, solver_name, solver_options, use_heuristic_start,
+                        service_level, forecast, snapshots, run_config)
+    solve_model(model)
+
+    print('Writing results...')
+    model.write_results()
+    return model
+
+
+def _solve_job(job):
+    """Solve stage of the batch runs: solve the models of a job."""
+    for model in job['models']:
+        solve_model(model)
+    return job
+
+
+def _combined_status(statuses):
+    """Status of several models written together: the weakest one (heuristic < feasible < optimal)."""
+    for status in ('heuristic', 'feasible'):
+        if status in statuses:
+            return status
+    return 'optimal'
+
+
+def _batch_options(pipelined, name):
+    """Options of common.batch_runner.run_batch: next day built and previous day written during a solve, or in sequence."""
+    return {'prefetch': 1 if pipelined else 0, 'background_writes': pipelined, 'name': name}
+
+
+def run_forecast(dates=None, weighted=True, use_demand_store=False, service_level=None, use_cache=False,
+                 use_snapshots=False, run_config=None, pipelined=False, **solve_options):
+    """Deterministic runs on the forecast or the weighted heat demand of all (or the given) days.
+
+    With use_cache, runs whose inputs did not change are restored from the
+    result cache (common.result_cache) instead of being solved. With
+    use_snapshots, built instances are reused (common.model_snapshot).
+    run_config: RunConfig of the runs (default from config.json). With
+    pipelined, the next day is loaded and built and the previous day written
+    while a day is solved (common.batch_runner). The weighted heat demand files
+    are not built here (common.weighted_demand.build, called by the CLI and
+    the study pipeline). With use_demand_store the store is built first if it
+    is missing or older than a demand file (DemandStore.open).
+    """
+    run_config = (run_config or RUN_CONFIG).replace(use_weighted_heat_demand=weighted)
+    cache = ResultCache() if use_cache else None
+    snapshots = SnapshotCache() if use_snapshots else None
+
+    if weighted:
+        heat_demand_files = glob.glob(f'{run_config.path_in}demands/weighted_heat_demand/weighted_heat_demand_*.json')
+        prefix = 'weighted_'
+    else:
+        heat_demand_files = glob.glob(f'{run_config.path_in}demands/heat_demand_*.json')
+        prefix = ''
+
+    if use_demand_store:
+        # Alle Bedarfe mit einem Zugriff auf den Index des Stores
+        store = DemandStore.open()
+        kind = 'weighted' if weighted else 'forecast'
+        heat_demands = [
+            ((row['start_date'], row['end_date'], row['period']),
+             lambda row=row: store.heat_demand(row['start_date'], row['period'], kind))
+            for _, row in store.select(kind).iterrows() if _selected(row['start_date'], dates)
+        ]
+    else:
+        # Die Dateien werden erst beim Vorbereiten des Tages gelesen
+        heat_demands = []
+        for heat_demand_file in heat_demand_files:
+            scenario_info = extract_scenario_info(heat_demand_file)
+            if _selected(scenario_info[0], dates):
+                heat_demands.append((scenario_info, lambda file=heat_demand_file: load_heat_demand(file)))
+
+    # Dateiendung für Läufe mit Chance Constraints
+    if service_level is None:
+        suffix = ''
+    elif isinstance(service_level, dict):
+        suffix = '_cc'
+    else:
+        suffix = f'_cc{round(service_level * 100)}'
+
+    def prepare(task):
+        """Load the heat demand of a day and build its model (None if restored from the cache)."""
+        (start_date, end_date, period), load = task
+        heat_demand_data = load()
+
+        # Die Prognosefehler beziehen sich auf die Prognose, nicht auf den gewichteten Bedarf
+        forecast = None
+        if service_level is not None and weighted and use_demand_store:
+            forecast = store.heat_demand(start_date, period)
+        elif service_level is not None and weighted:
+            forecast = load_heat_demand(f'{run_config.path_in}demands/heat_demand_{start_date}_to_{end_date}_{period}.json')
+
+        objectives_file = f'{run_config.path_out_objectives}d_{prefix}{start_date}_to_{end_date}_{period}{suffix}_obj.csv'
+        output_file = f'd_{prefix}{start_date}_to_{end_date}_{period}{suffix}_ts.csv'
+
+        key = inputs = None
+        if cache is not None:
+            key = forecast_key(cache, run_config, heat_demand_data, weighted, service_level, forecast, **solve_options)
+            if cache.get(key) is not None:
+                print(f'\n### Result for {start_date} restored from the cache. ###')
+                return None
+            if use_demand_store:
+                inputs = []
+            elif weighted:
+                inputs = [f'{run_config.path_in}demands/weighted_heat_demand/weighted_heat_demand_{start_date}.json']
+            else:
+                inputs = [f'{run_config.path_in}demands/heat_demand_{start_date}_to_{end_date}_{period}.json']
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        log_filename = f"{run_config.path_out_logs}{prefix}logfile_{timestamp}_{start_date}_{period}.log"
+        model = build_model(heat_demand_data, log_filename, service_level=service_level, forecast=forecast,
+                            snapshots=snapshots, run_config=run_config, **solve_options)
+        return {'models': [model], 'objectives_file': objectives_file, 'output_file': output_file, 'key': key,
+                'inputs': inputs}
+
+    def write(job):
+        """Write the results and the objective value of a day and store them in the cache."""
+        model = job['models'][0]
+        print('Writing results...')
+        model.write_results()
+
+        # Save the objective value to a CSV file
+        df_objective = pd.DataFrame([{'ObjectiveValue': model.objective_value, 'Status': model.status}])
+        df_objective.to_csv(job['objectives_file'], index=False)
+
+        # Speichern der Ergebnisse
+        model.save_results(run_config.path_out_timeseries + job['output_file'])
+
+        if cache is not None:
+            cache.put(job['key'], [job['objectives_file'], run_config.path_out_timeseries + job['output_file']],
+                      job['output_file'], job['inputs'], model.status)
+
+        print('\n### Single scenario has been processed. ###')
+
+    # Iteration über alle Heat-Demand-Dateien
+    run_batch(heat_demands, prepare, _solve_job, write, **_batch_options(pipelined, f'd_{prefix}forecast{suffix}'))
+
+
+def run_scenarios(dates=None, use_demand_store=False, use_cache=False, use_snapshots=False, run_config=None,
+                  pipelined=False, **solve_options):
+    """Wait-and-see runs: every scenario of all (or the given) scenario files on its own.
+
+    With pipelined, the models of the next scenario file are built and the
+    results of the previous one written while a file is solved. With
+    use_demand_store the store is built first if it is missing or stale.
+    """
+    run_config = (run_config or RUN_CONFIG).replace(use_weighted_heat_demand=False)
+    cache = ResultCache() if use_cache else None
+    snapshots = SnapshotCache() if use_snapshots else None
+
+    if use_demand_store:
+        # Szenarien ohne "Probability" direkt aus dem Store
+        store = DemandStore.open()
+        scenario_sets = [
+            ((start_date, rows['end_date'].iloc[0], period), {
+                row['scenario']: dict(enumerate(store.values(row), start=1)) for _, row in rows.iterrows()
+            })
+            for (start_date, period), rows in store.select('scenarios').groupby(['start_date', 'period'])
+        ]
+    else:
+        # Pfad zu den Szenario-Dateien
+        scenario_files = glob.glob(f'{run_config.path_in}demands/reduced_heat_demand_scenarios_*.json')
+        scenario_sets = [(extract_scenario_info(scenario_file), scenario_file) for scenario_file in scenario_files]
+
+    def prepare(scenario_set):
+        """Load the scenarios of a file and build one model per scenario (None if restored from the cache)."""
+        (start_date, end_date, period), scenario_source = scenario_set
+        if use_demand_store:
+            heat_demand_scenarios = scenario_source
+            scenario_file = f'reduced_heat_demand_scenarios_{start_date}_to_{end_date}_{period}.json'
+        else:
+            scenario_file = scenario_source
+            # Laden der Heat-Demand-Szenarien ohne "Probability" aus der aktuellen Datei
+            heat_demand_scenarios = load_heat_demand_scenarios(scenario_file)
+
+        objectives_file = f'{run_config.path_out_scenarios}d_scenarios_{start_date}_to_{end_date}_{period}_obj.csv'
+        key = None
+        if cache is not None:
+            # Ein Cache-Eintrag je Szenariodatei (alle Szenarien und ihre Zielfunktionswerte)
+            key = scenarios_key(cache, run_config, heat_demand_scenarios, **solve_options)
+            if cache.get(key) is not None:
+                print(f'\n### Results for scenario file {start_date} restored from the cache. ###')
+                return None
+
+        # Ein Modell je Szenario in der aktuellen Datei
+        models = []
+        for scenario_name, heat_demand_data in heat_demand_scenarios.items():
+            print(f'\n### Building scenario: {scenario_name} from file: {os.path.basename(scenario_file)} ###\n')
 
-                print('Declaring arcs...')
-                model.add_arcs()
-                model.expand_arcs()
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            log_filename = f"{run_config.path_out_logs}logfile_{timestamp}_{start_date}_{period}_{scenario_name}.log"
+            models.append(build_model(heat_demand_data, log_filename, snapshots=snapshots, run_config=run_config,
+                                      **solve_options))
 
-                print('Solving model...')
-                model.solve()
+        return {'models': models, 'scenario_names': list(heat_demand_scenarios), 'dates': (start_date, end_date, period),
+                'scenario_file': scenario_file, 'objectives_file': objectives_file, 'key': key}
 
-                # Zielfunktionswert speichern
-                objective_value = model.objective_value
-                objective_values.append({'Scenario': scenario_name, 'ObjectiveValue': objective_value})
+    def write(job):
+        """Write the results of all scenarios of a file and their objective values."""
+        start_date, end_date, period = job['dates']
 
-                print('Writing results...')
-                model.write_results()
+        # Liste zur Speicherung der Zielfunktionswerte für die aktuelle Datei
+        objective_values = []
+        output_files = [job['objectives_file']]
 
-                # Speichern der Ergebnisse mit Szenarioname und Dateiname im Dateinamen
-                output_file = f'd_{start_date}_to_{end_date}_{period}_{scenario_name}_ts.csv'
-                model.save_results(PATH_OUT_SCENARIOS + output_file)
+        for scenario_name, model in zip(job['scenario_names'], job['models']):
+            model.write_results()
 
-            # Speichern der Zielfunktionswerte für die aktuelle Datei
-            df_objectives = pd.DataFrame(objective_values)
-            objectives_file = f'{PATH_OUT_SCENARIOS}d_scenarios_{start_date}_to_{end_date}_{period}_obj.csv'
-            df_objectives.to_csv(objectives_file, index=False)
-            
-            print(f'\n### Scenario file {start_date} have been processed  ###')
+            # Zielfunktionswert speichern
+            objective_values.append({'Scenario': scenario_name, 'ObjectiveValue': model.objective_value, 'Status': model.status})
+
+            # Speichern der Ergebnisse mit Szenarioname und Dateiname im Dateinamen
+            output_file = f'd_{start_date}_to_{end_date}_{period}_{scenario_name}_ts.csv'
+            model.save_results(run_config.path_out_scenarios + output_file)
+            output_files.append(run_config.path_out_scenarios + output_file)
+
+        # Speichern der Zielfunktionswerte für die aktuelle Datei
+        df_objectives = pd.DataFrame(objective_values)
+        df_objectives.to_csv(job['objectives_file'], index=False)
+
+        if cache is not None:
+            inputs = [] if use_demand_store else [job['scenario_file']]
+            cache.put(job['key'], output_files, os.path.basename(job['objectives_file']), inputs,
+                      _combined_status([model.status for model in job['models']]))
+
+        print(f'\n### Scenario file {start_date} have been processed  ###')
+
+    # Iteration über alle Szenario-Dateien
+    scenario_sets = [scenario_set for scenario_set in scenario_sets if _selected(scenario_set[0][0], dates)]
+    run_batch(scenario_sets, prepare, _solve_job, write, **_batch_options(pipelined, 'd_scenarios'))
+
+
+def run_actual(dates=None, use_cache=False, use_snapshots=False, run_config=None, pipelined=False,
+               use_demand_store=False, **solve_options):
+    """Runs on the actual heat demand (perfect information) of all (or the given) days.
+
+    With pipelined, the next day is built and the previous day written while a day is solved.
+    With use_demand_store the actual demand is read from the demand store (DemandStore.open).
+    """
+    run_config = (run_config or RUN_CONFIG).replace(use_weighted_heat_demand=False)
+    cache = ResultCache() if use_cache else None
+    snapshots = SnapshotCache() if use_snapshots else None
+    store = DemandStore.open() if use_demand_store else None
+
+    # Pfad zu den tatsächlichen Heat-Demand-Dateien
+    actual_heat_demand_files = []
+    for actual_heat_demand_file in glob.glob(f'{run_config.path_in}demands/actual_heat_demand_*.json'):
+        # Extrahieren von Startdatum, Enddatum und Zeitraum
+        start_date_actual = extract_scenario_info(actual_heat_demand_file)[0]
+
+        # Überprüfen, ob die Extraktion erfolgreich war
+        if start_date_actual is None:
+            print(f"Warnung: Konnte Startdatum nicht aus dem Dateinamen {actual_heat_demand_file} extrahieren.")
+            continue  # Überspringen dieser Datei oder entsprechend behandeln
+        if _selected(start_date_actual, dates):
+            actual_heat_demand_files.append(actual_heat_demand_file)
+
+    def prepare(actual_heat_demand_file):
+        """Load the actual heat demand of a day and build its model (None if restored from the cache)."""
+        start_date_actual, end_date_actual, period_actual = extract_scenario_info(actual_heat_demand_file)
+
+        # Laden des tatsächlichen Heat Demands aus dem Store oder der entsprechenden Datei
+        if store is not None:
+            actual_heat_demand_data = store.heat_demand(start_date_actual, period_actual, 'actual')
+        else:
+            actual_heat_demand_data = load_heat_demand(actual_heat_demand_file)
 
-        #     # Hinzufügen der Ergebnisse zur Gesamtliste
-        #     all_objective_values.extend(objective_values)
+        output_file_actual = f'd_actual_{start_date_actual}_to_{end_date_actual}_{period_actual}_ts.csv'
+        objectives_file_actual = f'{run_config.path_out_actual}d_actual_{start_date_actual}_to_{end_date_actual}_{period_actual}_obj.csv'
 
-        # # Optional: Speichern aller Zielfunktionswerte in einer Gesamtdatei
-        # df_all_objectives = pd.DataFrame(all_objective_values)
-        # all_objectives_file = f'{PATH_OUT_SCENARIOS}d_all_scenarios_objectives.csv'
-        # df_all_objectives.to_csv(all_objectives_file, index=False)
+        key = None
+        if cache is not None:
+            key = actual_key(cache, run_config, actual_heat_demand_data, **solve_options)
+            if cache.get(key) is not None:
+                print(f'\n### Actual heat demand result {start_date_actual} restored from the cache. ###')
+                return None
 
-    else:
+        timestamp_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
+        log_filename_actual = f"{run_config.path_out_logs}logfile_actual_{timestamp_actual}_{start_date_actual}_{period_actual}.log"
+        print('Building actual heat demand model...')
+        actual_model = build_model(actual_heat_demand_data, log_filename_actual, snapshots=snapshots,
+                                   run_config=run_config, **solve_options)
+        return {'models': [actual_model], 'start_date': start_date_actual, 'file': actual_heat_demand_file,
+                'output_file': output_file_actual, 'objectives_file': objectives_file_actual, 'key': key}
 
-        if Model.USE_WEIGHTED_HEAT_DEMAND:
-            heat_demand_files = glob.glob(f'{PATH_IN}demands/weighted_heat_demand/weighted_heat_demand_*.json')
-            prefix = 'weighted_'
-        else:
-            #heat_demand_file = FILE_HEAT_DEMAND
-            heat_demand_files = glob.glob(f'{PATH_IN}demands/heat_demand_*.json')
-            prefix = ''
-        
-          # Iteration über alle Heat-Demand-Dateien
-        for heat_demand_file in heat_demand_files:
-            # Laden des Heat Demands aus der Datei
-            with open(heat_demand_file) as f:
-                heat_demand_data = json.load(f)
+    def write(job):
+        """Write the results and the objective value of a day and store them in the cache."""
+        actual_model = job['models'][0]
+        actual_model.write_results()
 
+        # Speichern der Ergebnisse
+        actual_model.save_results(run_config.path_out_actual + job['output_file'])
 
-            # # Laden des Heat Demands aus der ursprünglichen Datei
-            # with open(f'{PATH_IN}demands/{heat_demand_file}') as f:
-            #     heat_demand_data = json.load(f)
+        # Speichern des Zielfunktionswertes
+        df_objectives_actual = pd.DataFrame([{'Scenario': 'actual', 'ObjectiveValue': actual_model.objective_value,
+                                              'Status': actual_model.status}])
+        df_objectives_actual.to_csv(job['objectives_file'], index=False)
 
-            # Falls die Daten in einem speziellen Format vorliegen (z.B. unter 'heat_demand'), anpassen
-            if 'heat_demand' in heat_demand_data:
-                heat_demand_data = heat_demand_data['heat_demand']
+        if cache is not None:
+            cache.put(job['key'], [run_config.path_out_actual + job['output_file'], job['objectives_file']],
+                      job['output_file'], [job['file']], actual_model.status)
 
-            model = Model(heat_demand_data)
+        print(f"\n### Actual heat demand scenario {job['start_date']} has been processed. ###")
 
-            start_date, end_date, period = model._extract_scenario_info(heat_demand_file)
+    # Iteration über alle tatsächlichen Heat-Demand-Dateien
+    run_batch(actual_heat_demand_files, prepare, _solve_job, write, **_batch_options(pipelined, 'd_actual'))
 
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_filename = f"{PATH_OUT_LOGS}{prefix}logfile_{timestamp}_{start_date}_{period}.log"
 
-            print('Setting solver...')
-            # Verwendung der einheitlichen Solver-Einstellungen
-            solver_options_with_log = solver_options.copy()
-            solver_options_with_log['LogFile'] = log_filename
-            model.set_solver(
-                solver_name=solver_name,
-                **solver_options_with_log
-            )
+if __name__ == "__main__":
+    # Flag zum Steuern, ob mehrere Szenarien durchlaufen werden sollen
+    
+    run_actual_heat_demand = False 
+    run_multiple_scenarios = False # Setzen Sie diesen Wert auf False, um nur ein Szenario zu laufen
+    use_weighted_heat_demand = True
 
-            print('Adding components...')
-            model.add_components()
+    # Heuristischer Dispatch als MIP-Start und Fallback (siehe common/dispatch_heuristic.py)
+    use_heuristic_start = True
 
-            print('Adding objective...')
-            model.add_objective()
+    # Bedarfe aus dem spaltenorientierten Demand Store statt aus den JSON-Dateien laden
+    # (wird erzeugt bzw. neu erzeugt, wenn er fehlt oder älter als eine Bedarfsdatei ist)
+    use_demand_store = False
 
-            print('Instantiating model...')
-            model.instantiate_model()
+    # Service-Level je Stunde für Chance Constraints (None = ohne), z.B. 0.95 oder {t: 0.95, ...}
+    service_level = None
 
-            print('Declaring arcs...')
-            model.add_arcs()
-            model.expand_arcs()
+    # Nur diese Starttage rechnen (None = alle), z.B. ['20230316', '20230622']
+    dates = None
 
-            print('Solving model...')
-            model.solve()
+    # Ergebnisse unveränderter Läufe aus dem Cache holen statt neu zu lösen (python -m common.result_cache stats)
+    use_cache = True
 
-            # Save the objective value to a CSV file
-            objective_value = model.objective_value
-            df_objective = pd.DataFrame([{'ObjectiveValue': objective_value}])
-            objectives_file = f'{PATH_OUT_OBJECTIVES}d_{prefix}{start_date}_to_{end_date}_{period}_obj.csv'
-            df_objective.to_csv(objectives_file, index=False)
+    # Aufgebaute Instanzen wiederverwenden statt neu zu konstruieren (python -m common.model_snapshot report);
+    # lohnt sich erst bei langen Horizonten (Monat), bei Tagesmodellen ist Laden nicht schneller als Aufbauen
+    use_snapshots = False
 
-            print('Writing results...')
-            model.write_results()
+    # Nächsten Tag während des Lösens laden und aufbauen, Ergebnisse im Hintergrund schreiben
+    # (Laufzeiten vergleichen mit: python -m common.batch_runner report)
+    pipelined = True
 
-            # Speichern der Ergebnisse
-            output_file = f'd_{prefix}{start_date}_to_{end_date}_{period}_ts.csv'
-            model.save_results(PATH_OUT_TIMESERIES + output_file)
+    solve_options = {
+        'solver_name': SOLVER_NAME,
+        'solver_options': SOLVER_OPTIONS,
+        'use_heuristic_start': use_heuristic_start,
+    }
 
-            print('\n### Single scenario has been processed. ###')
+    if run_multiple_scenarios:
+        run_scenarios(dates, use_demand_store, use_cache, use_snapshots, pipelined=pipelined, **solve_options)
+    else:
+        if use_weighted_heat_demand:
+            # Fehlende oder veraltete gewichtete Bedarfe aus den Szenariodateien erzeugen
+            if dates is None:
+                weighted_demand.build()
+            else:
+                for start_date in dates:
+                    weighted_demand.build(start_date, start_date)
+        run_forecast(dates, use_weighted_heat_demand, use_demand_store, service_level, use_cache, use_snapshots,
+                     pipelined=pipelined, **solve_options)
 
     # Erweiterung: Optimieren des tatsächlichen Heat Demands
     if run_actual_heat_demand:
-        # Pfad zu den tatsächlichen Heat-Demand-Dateien
-        actual_heat_demand_files = glob.glob(f'{PATH_IN}demands/actual_heat_demand_*.json')
-            
-        # Iteration über alle tatsächlichen Heat-Demand-Dateien
-        for actual_heat_demand_file in actual_heat_demand_files:
-            # Laden des tatsächlichen Heat Demands aus der entsprechenden Datei
-            with open(actual_heat_demand_file) as f:
-                actual_heat_demand_data = json.load(f)
-
-            if 'heat_demand' in actual_heat_demand_data:
-                 actual_heat_demand_data = actual_heat_demand_data['heat_demand']
-
-            actual_model = Model(actual_heat_demand_data)
-
-            # Extrahieren von Startdatum, Enddatum und Zeitraum
-            start_date_actual, end_date_actual, period_actual = actual_model._extract_scenario_info(actual_heat_demand_file)
-
-            # Überprüfen, ob die Extraktion erfolgreich war
-            if start_date_actual is None:
-                print(f"Warnung: Konnte Startdatum nicht aus dem Dateinamen {actual_heat_demand_file} extrahieren.")
-                continue  # Überspringen dieser Datei oder entsprechend behandeln
-
-            timestamp_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_filename_actual = f"{PATH_OUT_LOGS}logfile_actual_{timestamp_actual}_{start_date_actual}_{period_actual}.log"
-
-            print('Setting solver for actual heat demand...')
-            # Verwendung der einheitlichen Solver-Einstellungen
-            solver_options_with_log = solver_options.copy()
-            solver_options_with_log['LogFile'] = log_filename_actual
-            actual_model.set_solver(
-                solver_name=solver_name,
-                **solver_options_with_log
-            )
-
-            print('Adding components...')
-            actual_model.add_components()
-
-            print('Adding objective...')
-            actual_model.add_objective()
-
-            print('Instantiating model...')
-            actual_model.instantiate_model()
-
-            print('Declaring arcs...')
-            actual_model.add_arcs()
-            actual_model.expand_arcs()
-
-            print('Solving model...')
-            actual_model.solve()
-
-            print('Writing results...')
-            actual_model.write_results()
-
-            # Speichern der Ergebnisse
-            output_file_actual = f'd_actual_{start_date_actual}_to_{end_date_actual}_{period_actual}_ts.csv'
-            actual_model.save_results(PATH_OUT_ACTUAL + output_file_actual)
-
-            # Speichern des Zielfunktionswertes
-            objective_value_actual = actual_model.objective_value
-            df_objectives_actual = pd.DataFrame([{'Scenario': 'actual', 'ObjectiveValue': objective_value_actual}])
-            objectives_file_actual = f'{PATH_OUT_ACTUAL}d_actual_{start_date_actual}_to_{end_date_actual}_{period_actual}_obj.csv'
-            df_objectives_actual.to_csv(objectives_file_actual, index=False)
-
-            print(f'\n### Actual heat demand scenario {start_date_actual} has been processed. ###')
\ No newline at end of file
+        run_actual(dates, use_cache, use_snapshots, pipelined=pipelined, use_demand_store=use_demand_store, **solve_options)
@@ -0,0 +1,15 @@
+"""Command line of the models, callable from any directory (see common.cli).
+
+    python models/spma.py run --model stochastic --dates 2023-03-16..2023-07-10 --case special
+    python models/spma.py list | status
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common.cli import main
+
+
+if __name__ == "__main__":
+    main()
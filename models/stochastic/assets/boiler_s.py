@@ -1,21 +1,19 @@
-import pandas as pd
-
 from pyomo.environ import *
 from pyomo.network import *
 
+from common.asset_specs import unit_spec
+
 class Boiler:
     """Boiler class"""
 
-    def __init__(self, name, filepath, index_col=0, **kwargs):
+    def __init__(self, name, filepath, **kwargs):
         self.name = name
-        self.get_data(filepath, index_col)
+        self.get_data(filepath)
         # leave **kwargs for future use
 
-    def get_data(self, filepath, index_col):
-        self.data = pd.read_csv(
-            filepath,
-            index_col=index_col
-        )
+    def get_data(self, filepath):
+        # Einmal je Prozess gelesene und geprüfte Kennlinie (common.asset_specs)
+        self.spec = unit_spec(filepath)
     
     def add_to_model(self, model):
         model.add_component(
@@ -54,26 +52,14 @@ class Boiler:
             include_splitfrac=False
         )
 
-        boiler_op_data = self.data
-
-        # Heat
-        heat_1 = boiler_op_data.loc[1, 'heat']
-        heat_2 = boiler_op_data.loc[2, 'heat']
-        heat_3 = boiler_op_data.loc[3, 'heat']
-
-        # eta_th
-        eta_th_1 = boiler_op_data.loc[1, 'eta_th']
-        eta_th_2 = boiler_op_data.loc[2, 'eta_th']
-        eta_th_3 = boiler_op_data.loc[3, 'eta_th']
+        spec = self.spec
 
-        # Gas
-        gas_1 = heat_1 / eta_th_1
-        gas_2 = heat_2 / eta_th_2
-        gas_3 = heat_3 / eta_th_3
+        # Heat (breakpoints 1 (min), 2 and 3 (max))
+        heat_1, heat_2, heat_3 = spec.heat
 
-        # print("Gas Boiler :", gas_1, gas_2, gas_3)
-        # print("Heat Boiler:", heat_1, heat_2, heat_3)
-        # print("eta_th Boiler:", eta_th_1, eta_th_2, eta_th_3)
+        # Lines (slope, intercept) of gas and thermal efficiency over the heat in region 1 and 2
+        gas_line_1, gas_line_2 = spec.segments['gas']
+        eta_th_line_1, eta_th_line_2 = spec.segments['eta_th']
 
         # Constraints
 
@@ -89,10 +75,9 @@ class Boiler:
 
 
         # Helper function
-        def linear_function(x, x1, x2, y1, y2):
-            """Helper function for linear interpolation."""
-            a = (y2 - y1) / (x2 - x1)
-            b = y1 - a * x1
+        def linear_function(x, segment):
+            """Helper function for linear interpolation (line of the spec)."""
+            a, b = segment
             return a * x + b 
         
         # Big-M Parameter
@@ -119,23 +104,23 @@ class Boiler:
         # Upper bounds
         def gas_upper_bound_y1_constraint(asset, t):
             """Upper bound on gas consumption in region 1"""
-            return asset.gas[t] <= (linear_function(asset.heat[t], heat_1, heat_2, gas_1, gas_2) + M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.gas[t] <= (linear_function(asset.heat[t], gas_line_1) + M * (1 - asset.y1[t])) * asset.bin[t]
         asset.gas_upper_bound_y1_constr = Constraint(t, rule=gas_upper_bound_y1_constraint)
 
         def gas_upper_bound_y2_constraint(asset, t):
             """Upper bound on gas consumption in region 2"""
-            return asset.gas[t] <= (linear_function(asset.heat[t], heat_2, heat_3, gas_2, gas_3) + M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.gas[t] <= (linear_function(asset.heat[t], gas_line_2) + M * (1 - asset.y2[t])) * asset.bin[t]
         asset.gas_upper_bound_y2_constr = Constraint(t, rule=gas_upper_bound_y2_constraint)
 
         # Lower bounds
         def gas_lower_bound_y1_constraint(asset, t):
             """Lower bound on gas consumption in region 1"""
-            return asset.gas[t] >= (linear_function(asset.heat[t], heat_1, heat_2, gas_1, gas_2) - M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.gas[t] >= (linear_function(asset.heat[t], gas_line_1) - M * (1 - asset.y1[t])) * asset.bin[t]
         asset.gas_lower_bound_y1_constr = Constraint(t, rule=gas_lower_bound_y1_constraint)
 
         def gas_lower_bound_y2_constraint(asset, t):
             """Lower bound on gas consumption in region 2"""
-            return asset.gas[t] >= (linear_function(asset.heat[t], heat_2, heat_3, gas_2, gas_3) - M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.gas[t] >= (linear_function(asset.heat[t], gas_line_2) - M * (1 - asset.y2[t])) * asset.bin[t]
         asset.gas_lower_bound_y2_constr = Constraint(t, rule=gas_lower_bound_y2_constraint)
 
         # Constraints for thermal efficiency depending on thermal load
@@ -143,22 +128,22 @@ class Boiler:
         # Upper bounds
         def eta_th_upper_bound_y1_constraint(asset, t):
             """Upper bound on thermal efficiency in region 1"""
-            return asset.eta_th[t] <= (linear_function(asset.heat[t], heat_1, heat_2, eta_th_1, eta_th_2) + M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.eta_th[t] <= (linear_function(asset.heat[t], eta_th_line_1) + M * (1 - asset.y1[t])) * asset.bin[t]
         asset.eta_th_upper_bound_y1_constr = Constraint(t, rule=eta_th_upper_bound_y1_constraint)
 
         def eta_th_upper_bound_y2_constraint(asset, t):
             """Upper bound on thermal efficiency in region 2"""
-            return asset.eta_th[t] <= (linear_function(asset.heat[t], heat_2, heat_3, eta_th_2, eta_th_3) + M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.eta_th[t] <= (linear_function(asset.heat[t], eta_th_line_2) + M * (1 - asset.y2[t])) * asset.bin[t]
         asset.eta_th_upper_bound_y2_constr = Constraint(t, rule=eta_th_upper_bound_y2_constraint)
 
         # Lower bounds
         def eta_th_lower_bound_y1_constraint(asset, t):
             """Lower bound on thermal efficiency in region 1"""
-            return asset.eta_th[t] >= (linear_function(asset.heat[t], heat_1, heat_2, eta_th_1, eta_th_2) - M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.eta_th[t] >= (linear_function(asset.heat[t], eta_th_line_1) - M * (1 - asset.y1[t])) * asset.bin[t]
         asset.eta_th_lower_bound_y1_constr = Constraint(t, rule=eta_th_lower_bound_y1_constraint)
 
         def eta_th_lower_bound_y2_constraint(asset, t):
             """Lower bound on thermal efficiency in region 2"""
-            return asset.eta_th[t] >= (linear_function(asset.heat[t], heat_2, heat_3, eta_th_2, eta_th_3) - M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.eta_th[t] >= (linear_function(asset.heat[t], eta_th_line_2) - M * (1 - asset.y2[t])) * asset.bin[t]
         asset.eta_th_lower_bound_y2_constr = Constraint(t, rule=eta_th_lower_bound_y2_constraint)
        
@@ -1,21 +1,19 @@
-import pandas as pd
-
 from pyomo.environ import *
 from pyomo.network import *
 
+from common.asset_specs import unit_spec
+
 class Chp:
     """Combined Heat and Power Plant (CHP) class"""
 
-    def __init__(self, name, filepath, index_col=0, **kwargs):
+    def __init__(self, name, filepath, **kwargs):
         self.name = name
-        self.get_data(filepath, index_col)
+        self.get_data(filepath)
         # leave **kwargs for future use
 
-    def get_data(self, filepath, index_col):
-        self.data = pd.read_csv(
-            filepath,
-            index_col=index_col
-        )
+    def get_data(self, filepath):
+        # Einmal je Prozess gelesene und geprüfte Kennlinie (common.asset_specs)
+        self.spec = unit_spec(filepath)
     
     def add_to_model(self, model):
         model.add_component(
@@ -77,32 +75,16 @@ class Chp:
             include_splitfrac=False
         )
         
-        chp_op_data = self.data
-
-        # Heat
-        heat_1 = chp_op_data.loc[1, 'heat']
-        heat_2 = chp_op_data.loc[2, 'heat']
-        heat_3 = chp_op_data.loc[3, 'heat']
-
-        # eta_th
-        eta_th_1 = chp_op_data.loc[1, 'eta_th']
-        eta_th_2 = chp_op_data.loc[2, 'eta_th']
-        eta_th_3 = chp_op_data.loc[3, 'eta_th']
-
-        # eta_el
-        eta_el_1 = chp_op_data.loc[1, 'eta_el']
-        eta_el_2 = chp_op_data.loc[2, 'eta_el']
-        eta_el_3 = chp_op_data.loc[3, 'eta_el']
-
-        # Power 
-        power_1 = eta_el_1 * (heat_1/eta_th_1)
-        power_2 = eta_el_2 * (heat_2/eta_th_2)
-        power_3 = eta_el_3 * (heat_3/eta_th_3)
-            
-        # Gas 
-        gas_1 = heat_1/eta_th_1
-        gas_2 = heat_2/eta_th_2
-        gas_3 = heat_3/eta_th_3
+        spec = self.spec
+
+        # Heat (breakpoints 1 (min), 2 and 3 (max))
+        heat_1, heat_2, heat_3 = spec.heat
+
+        # Lines (slope, intercept) of power, gas and efficiencies over the heat in region 1 and 2
+        power_line_1, power_line_2 = spec.segments['power']
+        gas_line_1, gas_line_2 = spec.segments['gas']
+        eta_th_line_1, eta_th_line_2 = spec.segments['eta_th']
+        eta_el_line_1, eta_el_line_2 = spec.segments['eta_el']
 
         # print("Gas CHP :", gas_1, gas_2, gas_3)
         # print("Power CHP:", power_1, power_2, power_3)
@@ -111,20 +93,17 @@ class Chp:
         # Constraints
         def thermal_load_max_rule(asset, t):
             """Rule for the maximum thermal load."""
-            thermal_load_max = chp_op_data.loc[3, 'heat']
-            return asset.heat[t] <= thermal_load_max * asset.bin[t]
+            return asset.heat[t] <= heat_3 * asset.bin[t]
         asset.thermal_load_max_constr = Constraint(t, rule=thermal_load_max_rule)
     
         def thermal_load_min_rule(asset, t):
             """Rule for the minimum thermal load."""
-            thermal_load_min = chp_op_data.loc[1, 'heat']
-            return thermal_load_min * asset.bin[t] <= asset.heat[t]
+            return heat_1 * asset.bin[t] <= asset.heat[t]
         asset.thermal_load_min_constr = Constraint(t, rule=thermal_load_min_rule)
 
-        def linear_function(x, x1, x2, y1, y2):
-            """Helper function for linear interpolation."""
-            a = (y2 - y1) / (x2 - x1)
-            b = y1 - a * x1
+        def linear_function(x, segment):
+            """Helper function for linear interpolation (line of the spec)."""
+            a, b = segment
             return a * x + b
             
         
@@ -152,23 +131,23 @@ class Chp:
         # Upper bounds
         def power_upper_bound_y1_constraint(asset, t):
             """Upper bound on power in region 1"""
-            return asset.power[t] <= (linear_function(asset.heat[t], heat_1, heat_2, power_1, power_2) + M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.power[t] <= (linear_function(asset.heat[t], power_line_1) + M * (1 - asset.y1[t])) * asset.bin[t]
         asset.power_upper_bound_y1_constr = Constraint(t, rule=power_upper_bound_y1_constraint)
 
         def power_upper_bound_y2_constraint(asset, t):
             """Upper bound on power in region 2"""
-            return asset.power[t] <= (linear_function(asset.heat[t], heat_2, heat_3, power_2, power_3) + M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.power[t] <= (linear_function(asset.heat[t], power_line_2) + M * (1 - asset.y2[t])) * asset.bin[t]
         asset.power_upper_bound_y2_constr = Constraint(t, rule=power_upper_bound_y2_constraint)
 
         # Lower bounds
         def power_lower_bound_y1_constraint(asset, t):
             """Lower bound on power in region 1"""
-            return asset.power[t] >= (linear_function(asset.heat[t], heat_1, heat_2, power_1, power_2) - M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.power[t] >= (linear_function(asset.heat[t], power_line_1) - M * (1 - asset.y1[t])) * asset.bin[t]
         asset.power_lower_bound_y1_constr = Constraint(t, rule=power_lower_bound_y1_constraint)
 
         def power_lower_bound_y2_constraint(asset, t):
             """Lower bound on power in region 2"""
-            return asset.power[t] >= (linear_function(asset.heat[t], heat_2, heat_3, power_2, power_3) - M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.power[t] >= (linear_function(asset.heat[t], power_line_2) - M * (1 - asset.y2[t])) * asset.bin[t]
         asset.power_lower_bound_y2_constr = Constraint(t, rule=power_lower_bound_y2_constraint)
 
         # Constraints for gas depending on thermal load
@@ -176,23 +155,23 @@ class Chp:
         # Upper bounds
         def gas_upper_bound_y1_constraint(asset, t):
             """Upper bound on gas consumption in region 1"""
-            return asset.gas[t] <= (linear_function(asset.heat[t], heat_1, heat_2, gas_1, gas_2) + M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.gas[t] <= (linear_function(asset.heat[t], gas_line_1) + M * (1 - asset.y1[t])) * asset.bin[t]
         asset.gas_upper_bound_y1_constr = Constraint(t, rule=gas_upper_bound_y1_constraint)
 
         def gas_upper_bound_y2_constraint(asset, t):
             """Upper bound on gas consumption in region 2"""
-            return asset.gas[t] <= (linear_function(asset.heat[t], heat_2, heat_3, gas_2, gas_3) + M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.gas[t] <= (linear_function(asset.heat[t], gas_line_2) + M * (1 - asset.y2[t])) * asset.bin[t]
         asset.gas_upper_bound_y2_constr = Constraint(t, rule=gas_upper_bound_y2_constraint)
 
         # Lower bounds
         def gas_lower_bound_y1_constraint(asset, t):
             """Lower bound on gas consumption in region 1"""
-            return asset.gas[t] >= (linear_function(asset.heat[t], heat_1, heat_2, gas_1, gas_2) - M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.gas[t] >= (linear_function(asset.heat[t], gas_line_1) - M * (1 - asset.y1[t])) * asset.bin[t]
         asset.gas_lower_bound_y1_constr = Constraint(t, rule=gas_lower_bound_y1_constraint)
 
         def gas_lower_bound_y2_constraint(asset, t):
             """Lower bound on gas consumption in region 2"""
-            return asset.gas[t] >= (linear_function(asset.heat[t], heat_2, heat_3, gas_2, gas_3) - M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.gas[t] >= (linear_function(asset.heat[t], gas_line_2) - M * (1 - asset.y2[t])) * asset.bin[t]
         asset.gas_lower_bound_y2_constr = Constraint(t, rule=gas_lower_bound_y2_constraint)
 
         # Constraints for thermal efficiency depending on thermal load
@@ -200,23 +179,23 @@ class Chp:
         # Upper bounds
         def eta_th_upper_bound_y1_constraint(asset, t):
             """Upper bound on thermal efficiency in region 1"""
-            return asset.eta_th[t] <= (linear_function(asset.heat[t], heat_1, heat_2, eta_th_1, eta_th_2) + M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.eta_th[t] <= (linear_function(asset.heat[t], eta_th_line_1) + M * (1 - asset.y1[t])) * asset.bin[t]
         asset.eta_th_upper_bound_y1_constr = Constraint(t, rule=eta_th_upper_bound_y1_constraint)
 
         def eta_th_upper_bound_y2_constraint(asset, t):
             """Upper bound on thermal efficiency in region 2"""
-            return asset.eta_th[t] <= (linear_function(asset.heat[t], heat_2, heat_3, eta_th_2, eta_th_3) + M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.eta_th[t] <= (linear_function(asset.heat[t], eta_th_line_2) + M * (1 - asset.y2[t])) * asset.bin[t]
         asset.eta_th_upper_bound_y2_constr = Constraint(t, rule=eta_th_upper_bound_y2_constraint)
 
         # Lower bounds
         def eta_th_lower_bound_y1_constraint(asset, t):
             """Lower bound on thermal efficiency in region 1"""
-            return asset.eta_th[t] >= (linear_function(asset.heat[t], heat_1, heat_2, eta_th_1, eta_th_2) - M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.eta_th[t] >= (linear_function(asset.heat[t], eta_th_line_1) - M * (1 - asset.y1[t])) * asset.bin[t]
         asset.eta_th_lower_bound_y1_constr = Constraint(t, rule=eta_th_lower_bound_y1_constraint)
 
         def eta_th_lower_bound_y2_constraint(asset, t):
             """Lower bound on thermal efficiency in region 2"""
-            return asset.eta_th[t] >= (linear_function(asset.heat[t], heat_2, heat_3, eta_th_2, eta_th_3) - M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.eta_th[t] >= (linear_function(asset.heat[t], eta_th_line_2) - M * (1 - asset.y2[t])) * asset.bin[t]
         asset.eta_th_lower_bound_y2_constr = Constraint(t, rule=eta_th_lower_bound_y2_constraint)
 
         # Constraints for electrical efficiency depending on thermal load
@@ -224,23 +203,23 @@ class Chp:
         # Upper bounds
         def eta_el_upper_bound_y1_constraint(asset, t):
             """Upper bound on electrical efficiency in region 1"""
-            return asset.eta_el[t] <= (linear_function(asset.heat[t], heat_1, heat_2, eta_el_1, eta_el_2) + M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.eta_el[t] <= (linear_function(asset.heat[t], eta_el_line_1) + M * (1 - asset.y1[t])) * asset.bin[t]
         asset.eta_el_upper_bound_y1_constr = Constraint(t, rule=eta_el_upper_bound_y1_constraint)
 
         def eta_el_upper_bound_y2_constraint(asset, t):
             """Upper bound on electrical efficiency in region 2"""
-            return asset.eta_el[t] <= (linear_function(asset.heat[t], heat_2, heat_3, eta_el_2, eta_el_3) + M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.eta_el[t] <= (linear_function(asset.heat[t], eta_el_line_2) + M * (1 - asset.y2[t])) * asset.bin[t]
         asset.eta_el_upper_bound_y2_constr = Constraint(t, rule=eta_el_upper_bound_y2_constraint)
 
         # Lower bounds
         def eta_el_lower_bound_y1_constraint(asset, t):
             """Lower bound on electrical efficiency in region 1"""
-            return asset.eta_el[t] >= (linear_function(asset.heat[t], heat_1, heat_2, eta_el_1, eta_el_2) - M * (1 - asset.y1[t])) * asset.bin[t]
+            return asset.eta_el[t] >= (linear_function(asset.heat[t], eta_el_line_1) - M * (1 - asset.y1[t])) * asset.bin[t]
         asset.eta_el_lower_bound_y1_constr = Constraint(t, rule=eta_el_lower_bound_y1_constraint)
 
         def eta_el_lower_bound_y2_constraint(asset, t):
             """Lower bound on electrical efficiency in region 2"""
-            return asset.eta_el[t] >= (linear_function(asset.heat[t], heat_2, heat_3, eta_el_2, eta_el_3) - M * (1 - asset.y2[t])) * asset.bin[t]
+            return asset.eta_el[t] >= (linear_function(asset.heat[t], eta_el_line_2) - M * (1 - asset.y2[t])) * asset.bin[t]
         asset.eta_el_lower_bound_y2_constr = Constraint(t, rule=eta_el_lower_bound_y2_constraint)
 
         ########################################## NOT IMPLEMENTED ##########################################
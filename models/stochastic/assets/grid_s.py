@@ -1,19 +1,17 @@
-import pandas as pd
-
 from pyomo.environ import *
 from pyomo.network import *
 
+from common.asset_specs import limit_spec
+
 class ElectricalGrid:
     """"Electrical Grid class"""
-    def __init__(self, name, filepath, index_col=0):
+    def __init__(self, name, filepath):
         self.name = name
-        self.get_data(filepath, index_col)
+        self.get_data(filepath)
         
-    def get_data(self, filepath, index_col):
-        self.data = pd.read_csv(
-            filepath,
-            index_col=index_col
-        )
+    def get_data(self, filepath):
+        # Einmal je Prozess gelesene und geprüfte Grenzen (common.asset_specs)
+        self.spec = limit_spec(filepath, 'power')
 
     def add_to_model(self, model):
         model.add_component(
@@ -47,14 +45,16 @@ class ElectricalGrid:
             include_splitfrac=False
         )
 
+        max_power = self.spec.max
+
         def max_power_supply_rule(asset, t):
             """Maximum power supply constraint"""
-            return asset.power_supply[t] <= self.data.loc['max', 'power']
+            return asset.power_supply[t] <= max_power
         asset.max_power_supply_constr = Constraint(t, rule=max_power_supply_rule)
 
         def max_power_feedin_rule(asset, t):
             """Maximum power feed-in constraint"""
-            return asset.power_feedin[t] <= self.data.loc['max', 'power']
+            return asset.power_feedin[t] <= max_power
         asset.max_power_feedin_constr = Constraint(t, rule=max_power_feedin_rule)
 
         def power_balance_rule(asset, t):
@@ -119,15 +119,13 @@ class NGasGrid:
 
 class HeatGrid:
     """"Heat Grid class"""
-    def __init__(self, name, filepath, index_col=0):
+    def __init__(self, name, filepath):
         self.name = name
-        self.get_data(filepath, index_col)
+        self.get_data(filepath)
         
-    def get_data(self, filepath, index_col):
-        self.data = pd.read_csv(
-            filepath,
-            index_col=index_col
-        )
+    def get_data(self, filepath):
+        # Einmal je Prozess gelesene und geprüfte Grenzen (common.asset_specs)
+        self.spec = limit_spec(filepath, 'heat')
 
     def add_to_model(self, model):
         model.add_component(
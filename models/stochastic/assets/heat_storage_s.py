@@ -1,18 +1,17 @@
-import pandas as pd 
 from pyomo.environ import *
-from pyomo.network import * 
+from pyomo.network import *
+
+from common.asset_specs import storage_spec
 
 class HeatStorage:
 
-    def __init__(self, name, filepath, index_col=0):
+    def __init__(self, name, filepath):
         self.name = name
-        self.get_data(filepath, index_col)
+        self.get_data(filepath)
 
-    def get_data(self, filepath, index_col):
-        self.data = pd.read_csv(
-            filepath,
-            index_col=index_col
-        )
+    def get_data(self, filepath):
+        # Einmal je Prozess gelesene und geprüfte Grenzen (common.asset_specs)
+        self.spec = storage_spec(filepath)
 
     def add_to_model(self, model):
         model.add_component(
@@ -33,8 +32,13 @@ class HeatStorage:
         asset.heat_balance = Var(t, within=Reals)
         asset.heat_capacity = Var(t, within=NonNegativeReals)
 
+        # Limits of the storage
+        max_heat = self.spec.max_heat
+        min_content = self.spec.min_content
+        max_content = self.spec.max_content
+
         # Declare Params
-        asset.initial_soc = Param(initialize=self.data.loc['max', 'content']*0.8)
+        asset.initial_soc = Param(initialize=self.spec.initial_soc)
         
         # Second Stage Components
         asset.dispatch_heat_capacity = Var(t, within=NonNegativeReals)
@@ -69,22 +73,22 @@ class HeatStorage:
         # Declare construction rules for components
         def max_heat_charge_rule(asset, t):
             """Maximum heat charge constraint"""
-            return asset.heat_charge[t] <= self.data.loc['max', 'heat'] * asset.bin_charge[t]
+            return asset.heat_charge[t] <= max_heat * asset.bin_charge[t]
         asset.max_heat_charge_constr = Constraint(t, rule=max_heat_charge_rule)
 
         def max_heat_discharge_rule(asset, t):
             """Maximum heat discharge constraint"""
-            return asset.heat_discharge[t] <= self.data.loc['max', 'heat'] * asset.bin_discharge[t]
+            return asset.heat_discharge[t] <= max_heat * asset.bin_discharge[t]
         asset.max_heat_discharge_constr = Constraint(t, rule=max_heat_discharge_rule)
 
         def max_heat_capacity(asset, t):
             """Maximum heat capacity constraint"""
-            return asset.heat_capacity[t] <= self.data.loc['max', 'content']
+            return asset.heat_capacity[t] <= max_content
         asset.max_heat_capacity_constr = Constraint(t, rule=max_heat_capacity)
 
         def min_heat_capacity(asset, t):
             """Minimum heat capacity constraint"""
-            return asset.heat_capacity[t] >= self.data.loc['min', 'content']
+            return asset.heat_capacity[t] >= min_content
         asset.min_heat_capacity_constr = Constraint(t, rule=min_heat_capacity)
 
         def heat_balance_rule(asset, t):
@@ -134,13 +138,13 @@ class HeatStorage:
         def max_heat_charge_secondstage_rule(asset, t):
             """Second Stage Maximum heat charge constraint"""
             return (asset.heat_charge[t] + asset.dispatch_heat_charge[t]
-                    <= self.data.loc['max', 'heat'])
+                    <= max_heat)
         asset.max_heat_charge_secondstagerule = Constraint(t, rule=max_heat_charge_secondstage_rule)
 
         def max_heat_discharge_secondstage_rule(asset, t):
             """Second Stage Maximum heat discharge constraint"""
             return (asset.heat_discharge[t] + asset.dispatch_heat_discharge[t]
-                    <= self.data.loc['max', 'heat'])
+                    <= max_heat)
         asset.max_heat_discharge_secondstagerule = Constraint(t, rule=max_heat_discharge_secondstage_rule)
 
         def capacity_balance_secondstage_rule(asset, t):
@@ -158,7 +162,7 @@ class HeatStorage:
         # Limit on storage capacity
         def max_storage_capacity_secondstage_rule(asset, t):
             """Second Stage Maximum storage capacity constraint"""
-            return (asset.dispatch_storage_capacity[t] <= self.data.loc['max', 'content'])
+            return (asset.dispatch_storage_capacity[t] <= max_content)
         asset.max_storage_capacity_secondstage_rule = Constraint(t, rule=max_storage_capacity_secondstage_rule)
 
         # Enforce that extension is only used when storage capacity is at maximum
@@ -170,14 +174,12 @@ class HeatStorage:
         # Storage capacity must be at max before extension is used
         def storage_capacity_full_rule(asset, t):
             """Ensure storage capacity is full before using extension"""
-            max_content = self.data.loc['max', 'content']
             return asset.dispatch_storage_capacity[t] >= max_content - M * (1 - asset.use_extension[t])
         asset.storage_capacity_full_constr = Constraint(t, rule=storage_capacity_full_rule)
 
         # Storage capacity cannot exceed maximum capacity
         def storage_capacity_limit_rule(asset, t):
             """Storage capacity limit considering epsilon"""
-            max_content = self.data.loc['max', 'content']
             return asset.dispatch_storage_capacity[t] <= max_content - epsilon * asset.use_extension[t]
         asset.storage_capacity_limit_constr = Constraint(t, rule=storage_capacity_limit_rule)
 
@@ -8,7 +8,22 @@ import pyomo.environ as pyo
 import mpisppy.utils.sputils as sputils
 
 # Local imports
-from model_s import Model, PATH_IN, FILE_HEAT_DEMAND, FILE_HEAT_DEMAND_SCENARIOS
+from model_s import Model, RUN_CONFIG
+from saa import run_saa
+from common import weighted_demand
+from common.batch_runner import run_batch
+from common.demand_store import DemandStore
+from common.demand_files import load_heat_demand
+from common.model_snapshot import SnapshotCache
+from common.result_cache import ResultCache
+from common.run_config import SPECIAL_CASE
+from common.run_keys import SAA_OPTIONS, SOLVER_NAME, SOLVER_OPTIONS, stochastic_key
+from common.scenario_provider import GeneratedScenarios, IndexedScenarioStore
+
+
+# Indexed stores of the scenario files (use_indexed_scenarios), below path_in and outside of demands,
+# since common.demand_store collects every *.json below demands
+SCENARIO_STORE_DIR = 'scenario_store'
 
 
 def extract_scenario_info(file):
@@ -28,118 +43,317 @@ def extract_scenario_info(file):
         return None, None, None
 
 
-def main():
-    """Main function to run the model."""
-    
-    ####################### Options ########################
+def matched_files(dates=None, run_config=None):
+    """Heat demand files with their scenario files, optionally only the given start dates (YYYYMMDD)."""
+    path_in = (run_config or RUN_CONFIG).path_in
 
-    # Set to True to enable automatic processing
-    automate_processing = True 
+    # Path to the directory containing heat demand files
+    heat_demand_files = glob.glob(
+        os.path.join(path_in, 'demands', 'heat_demand_*.json')
+    )
 
-    # Do you want to use the weighted heat demand?
-    Model.USE_WEIGHTED_HEAT_DEMAND = False
+    # Dictionary to store matched files
+    matched = {}
 
-    # Do you want to use a special case?
-    USE_SPECIAL_CASE = True
+    for heat_demand_file in heat_demand_files:
+        if dates is not None and extract_scenario_info(heat_demand_file)[0] not in dates:
+            continue
 
-    # Define the number of scenarios (only relevant if automate_processing = False)
-    scen_count = 10
+        # Extract the key part of the filename
+        base_name = os.path.basename(heat_demand_file)
+        key = base_name[len('heat_demand_') : -len('.json')]
 
-    #################### End of Options ####################    
- 
+        # Corresponding scenario file
+        scenario_file = os.path.join(
+            path_in, 'demands', f'reduced_heat_demand_scenarios_{key}.json'
+        )
+        if os.path.exists(scenario_file):
+            matched[heat_demand_file] = scenario_file
+        else:
+            print(f"Warning: Scenario file for {heat_demand_file} not found.")
+
+    return matched
+
+
+def run_day(heat_demand_file, scenario_file, solver_name=SOLVER_NAME, solver_options=None, scen_count=10,
+            use_generated_scenarios=False, scenario_seed=42, use_saa=False, saa_options=None, use_cache=False,
+            use_snapshots=False, run_config=None, use_indexed_scenarios=False, demand_store=None):
+    """Solve and write the stochastic model of one heat demand file.
+
+    With use_cache the results of an unchanged run are restored from the
+    result cache (common.result_cache); then no model is built and None is returned.
+    With use_snapshots the scenario instances are loaded from common.model_snapshot
+    when their structure and data did not change. run_config is the RunConfig of
+    the run (weighted demand, decision rule, special case, prices and paths).
+    With use_indexed_scenarios the scenarios are read one by one from an indexed
+    store of the scenario file (common.scenario_provider.IndexedScenarioStore)
+    instead of loading the whole file. With a demand_store (common.demand_store)
+    the heat demand and the scenarios come from the store instead of the JSON files.
+    """
+    job = prepare_day(heat_demand_file, scenario_file, solver_name, solver_options, scen_count,
+                      use_generated_scenarios, scenario_seed, use_saa, saa_options, use_cache, use_snapshots, run_config,
+                      use_indexed_scenarios, demand_store)
+    if job is None:
+        return None
+    write_day(solve_day(job))
+    return job['model']
+
+
+def prepare_day(heat_demand_file, scenario_file, solver_name=SOLVER_NAME, solver_options=None, scen_count=10,
+                use_generated_scenarios=False, scenario_seed=42, use_saa=False, saa_options=None, use_cache=False,
+                use_snapshots=False, run_config=None, use_indexed_scenarios=False, demand_store=None):
+    """Load the inputs of run_day and build its model (decision rule model or extensive form).
+
+    Returns the job for solve_day and write_day, or None if the results were
+    restored from the cache. With SAA the extensive forms are built while solving.
+    """
+    run_config = run_config or RUN_CONFIG
+
+    # Extract scenario information from the filename
+    start_date, end_date, period = extract_scenario_info(heat_demand_file)
+    if run_config.use_weighted_heat_demand:
+        # Gewichteter Bedarf dieses Tages (weighted_heat_demand der config.json ist ein fester Tag)
+        run_config = run_config.for_day(start_date)
+
+    print(f"Processing scenario from {start_date} to {end_date} ({period})")
+
+    solver_options = SOLVER_OPTIONS if solver_options is None else solver_options
+    saa_options = SAA_OPTIONS if saa_options is None else saa_options
+    cache = ResultCache() if use_cache else None
+    key = inputs = None
+    if cache is not None:
+        key, inputs = stochastic_key(cache, run_config, heat_demand_file, scenario_file, solver_name, solver_options,
+                                     scen_count, use_generated_scenarios, scenario_seed, use_saa, saa_options)
+        if cache.get(key) is not None:
+            print(f"\n### Scenario {start_date}_to_{end_date}_{period} restored from the cache. ###")
+            return None
+
+    # Create a model instance
+    scenario_provider = None
+    if use_generated_scenarios and not use_saa:
+        if demand_store is not None:
+            forecast = demand_store.heat_demand(start_date, period)
+        else:
+            forecast = load_heat_demand(heat_demand_file)
+        scenario_provider = GeneratedScenarios(
+            [forecast[t] for t in sorted(forecast)], scen_count, scenario_seed
+        )
+    elif use_indexed_scenarios and not use_saa:
+        # Gleiche Szenarien wie die Datei, aber einzeln gelesen (Ergebnis und Cache-Schlüssel unverändert)
+        scenario_provider = IndexedScenarioStore.for_json(
+            scenario_file, os.path.join(run_config.path_in, SCENARIO_STORE_DIR)
+        )
+    model = Model(heat_demand_file, scenario_file, scenario_provider, SnapshotCache() if use_snapshots else None,
+                  run_config, demand_store)
 
-    # Define the solver and options
-    solver_name = 'gurobi'
-    solver_options = {
-        'MIPGap': 0.01,
-        'TimeLimit': 1000,
+    # Set solver options
+    solver_options_with_log = dict(solver_options)
+    solver_options_with_log['LogFile'] = model.logfile_name
+
+    # Create the extensive form
+    options = {
+        'solver': solver_name,
+        'solver_options': solver_options_with_log,
     }
 
-    if USE_SPECIAL_CASE:
-        Model.SPECIAL_CASE = '_USE_EXT_COST_10'
-    else:
-        Model.SPECIAL_CASE = ''
+    try:
+        if model.config.use_decision_rule:
+            # One model of deterministic size, independent of the number of scenarios
+            model.build_decision_rule_model()
+        elif not use_saa:
+            # Create scenario creator arguments
+            scenario_creator_kwargs = {}
 
-    if automate_processing:
-        # Path to the directory containing heat demand files
-        heat_demand_files = glob.glob(
-            os.path.join(PATH_IN, 'demands', 'heat_demand_*.json')
+            # Create a list of scenario names
+            scenario_names = [f'Scenario{i + 1}' for i in range(scen_count)]
+
+            model.create_extensive_form(options, scenario_names, scenario_creator_kwargs)
+    except Exception:
+        model.close_logging()
+        raise
+
+    return {'model': model, 'options': options, 'use_saa': use_saa, 'saa_options': saa_options, 'cache': cache,
+            'key': key, 'inputs': inputs}
+
+
+def solve_day(job):
+    """Solve the model of a prepare_day job (decision rule, SAA or EF)."""
+    model, options = job['model'], job['options']
+    try:
+        if model.config.use_decision_rule:
+            model.solve_decision_rule(options['solver'], options['solver_options'])
+        elif job['use_saa']:
+            # Solve with sampled scenarios until the gap of the bounds is small enough
+            saa_result = run_saa(model, options, **job['saa_options'])
+            print(saa_result.history.to_string(index=False))
+        else:
+            # Solve the model
+            model.solve()
+    except Exception:
+        model.close_logging()
+        raise
+    return job
+
+
+def write_day(job):
+    """Write and cache the results of a solved prepare_day job and close its log."""
+    model, cache = job['model'], job['cache']
+    start_date, end_date, period = model.start_date, model.end_date, model.period
+    try:
+        if model.config.use_decision_rule:
+            written_files = model.write_decision_rule_results()
+            if cache is not None:
+                cache.put(job['key'], written_files, f'{start_date}_to_{end_date}_{period} decision rule', job['inputs'],
+                          model.status)
+
+            print(
+                f"\n### Scenario {start_date}_to_{end_date}_{period} has been processed (decision rule). ###"
+            )
+            return
+
+        ef_instance = model.ef_instance
+
+        # Output the objective value for the extensive form
+        print(f"EF objective: {pyo.value(ef_instance.ef.EF_Obj)}")
+
+        # Output the objective value for each scenario
+        for sname, smodel in sputils.ef_scenarios(ef_instance.ef):
+            print(f"Objective Value for {sname}: {pyo.value(smodel.objective)}")
+
+        # Write results
+        written_files = model.write_results(ef_instance.ef)
+
+        # Write objective values
+        written_files.append(model.write_objective_values(ef_instance.ef))
+
+        if cache is not None:
+            cache.put(job['key'], written_files, f'{start_date}_to_{end_date}_{period}{model.config.special_case}',
+                      job['inputs'], model.status)
+
+        print(
+            f"\n### Scenario {start_date}_to_{end_date}_{period} has been processed. ###"
         )
+    finally:
+        model.close_logging()
 
-        # Dictionary to store matched files
-        matched_files = {}
 
-        for heat_demand_file in heat_demand_files:
-            # Extract the key part of the filename
-            base_name = os.path.basename(heat_demand_file)
-            key = base_name[len('heat_demand_') : -len('.json')]
+def run(dates=None, use_special_case=False, use_weighted_heat_demand=False, use_decision_rule=False,
+        run_config=None, pipelined=False, use_demand_store=False, **day_options):
+    """run_day for all heat demand files with a scenario file (or only the given start dates).
 
-            # Corresponding scenario file
-            scenario_file = os.path.join(
-                PATH_IN, 'demands', f'reduced_heat_demand_scenarios_{key}.json'
-            )
-            if os.path.exists(scenario_file):
-                matched_files[heat_demand_file] = scenario_file
-            else:
-                print(f"Warning: Scenario file for {heat_demand_file} not found.")
+    With pipelined, the next day is loaded and built and the previous day
+    written while a day is solved (common.batch_runner). With
+    use_weighted_heat_demand every day uses its own weighted heat demand
+    (weighted_heat_demand/weighted_heat_demand_<date>.json, built by
+    common.weighted_demand). With use_demand_store the days are loaded from
+    the demand store (DemandStore.open builds it if it is missing or stale).
+    """
+    run_config = (run_config or RUN_CONFIG).replace(
+        use_weighted_heat_demand=use_weighted_heat_demand,
+        use_decision_rule=use_decision_rule,
+        special_case=SPECIAL_CASE if use_special_case else '',
+    )
 
-        # Iterate over the matched files
-        for heat_demand_file, scenario_file in matched_files.items():
-            # Extract scenario information from the filename
-            start_date, end_date, period = extract_scenario_info(heat_demand_file)
+    demand_store = DemandStore.open() if use_demand_store else None
 
-            print(f"Processing scenario from {start_date} to {end_date} ({period})")
+    def prepare(files):
+        heat_demand_file, scenario_file = files
+        return prepare_day(heat_demand_file, scenario_file, run_config=run_config, demand_store=demand_store,
+                           **day_options)
 
-            # Create a model instance
-            model = Model(heat_demand_file, scenario_file)
+    name = f"s_{run_config.prefix}{'decision_rule' if use_decision_rule else 'ef'}{run_config.special_case}"
+    run_batch(matched_files(dates, run_config).items(), prepare, solve_day, write_day,
+              prefetch=1 if pipelined else 0, background_writes=pipelined, name=name)
 
-            # Set solver options
-            solver_options_with_log = solver_options.copy()
-            solver_options_with_log['LogFile'] = model.logfile_name
 
-            # Create scenario creator arguments
-            scenario_creator_kwargs = {}
+def main():
+    """Main function to run the model."""
+    
+    ####################### Options ########################
 
-            # Create a list of scenario names
-            scenario_names = [f'Scenario{i + 1}' for i in range(scen_count)]
+    # Set to True to enable automatic processing
+    automate_processing = True 
 
-            # Create the extensive form
-            options = {
-                'solver': solver_name,
-                'solver_options': solver_options_with_log,
-            }
-            ef_instance = model.create_extensive_form(
-                options, scenario_names, scenario_creator_kwargs
-            )
+    # Do you want to use the weighted heat demand?
+    use_weighted_heat_demand = False
 
-            # Solve the model
-            model.solve()
+    # Do you want to use the affine decision rule model instead of the extensive form?
+    use_decision_rule = False
 
-            # Output the objective value for the extensive form
-            print(f"EF objective: {pyo.value(ef_instance.ef.EF_Obj)}")
+    # Do you want to use a special case?
+    USE_SPECIAL_CASE = True
 
-            # Output the objective value for each scenario
-            for sname, smodel in sputils.ef_scenarios(ef_instance.ef):
-                print(f"Objective Value for {sname}: {pyo.value(smodel.objective)}")
+    # Define the number of scenarios (only relevant if automate_processing = False)
+    scen_count = 10
 
-            # Write results
-            model.write_results(ef_instance.ef)
+    # Generate scen_count scenarios on demand from the error model instead of reading the scenario file
+    # (only relevant if automate_processing = True and use_saa = False)
+    use_generated_scenarios = False
+    scenario_seed = 42
 
-            # Write objective values
-            model.write_objective_values(ef_instance.ef)
+    # Read the scenarios one by one from an indexed store of the scenario file instead of loading the whole file
+    # (only relevant if automate_processing = True and use_saa = False; converted once per scenario file)
+    use_indexed_scenarios = False
 
-            print(
-                f"\n### Scenario {start_date}_to_{end_date}_{period} has been processed. ###"
-            )
+    # Load the heat demands and scenarios from the columnar demand store instead of the JSON files
+    # (only relevant if automate_processing = True; built again if it is missing or older than a demand file)
+    use_demand_store = False
+
+    # Adaptive scenario count with SAA bounds instead of the scenario file (only relevant if automate_processing = True)
+    use_saa = False
+    saa_options = dict(SAA_OPTIONS)
+
+    # Only these start dates (only relevant if automate_processing = True, None = all), e.g. ['20230316']
+    dates = None
+
+    # Restore unchanged runs from the result cache instead of solving them (only relevant if automate_processing = True)
+    use_cache = True
+
+    # Load built scenario instances instead of constructing them again (python -m common.model_snapshot report);
+    # pays off for scenario instances with a month horizon only, day and week instances load no faster than they build
+    use_snapshots = False
+
+    # Build the next day and write the previous one while a day is solved (only relevant if automate_processing = True)
+    # (compare the run times with: python -m common.batch_runner report)
+    pipelined = True
+
+    #################### End of Options ####################    
+ 
+
+    # Define the solver and options
+    solver_name = SOLVER_NAME
+    solver_options = dict(SOLVER_OPTIONS)
+
+    if automate_processing:
+        if use_weighted_heat_demand:
+            # Fehlende oder veraltete gewichtete Bedarfe der Tage aus den Szenariodateien erzeugen
+            if dates is None:
+                weighted_demand.build()
+            else:
+                for start_date in dates:
+                    weighted_demand.build(start_date, start_date)
+        run(
+            dates, USE_SPECIAL_CASE, use_weighted_heat_demand, use_decision_rule, pipelined=pipelined,
+            solver_name=solver_name, solver_options=solver_options, scen_count=scen_count,
+            use_generated_scenarios=use_generated_scenarios, scenario_seed=scenario_seed,
+            use_saa=use_saa, saa_options=saa_options, use_cache=use_cache, use_snapshots=use_snapshots,
+            use_indexed_scenarios=use_indexed_scenarios, use_demand_store=use_demand_store
+        )
 
     else:
+        run_config = RUN_CONFIG.replace(
+            use_weighted_heat_demand=use_weighted_heat_demand,
+            use_decision_rule=use_decision_rule,
+            special_case=SPECIAL_CASE if USE_SPECIAL_CASE else '',
+        )
+
         # Specify the filenames of the desired files here
-        heat_demand_filename = FILE_HEAT_DEMAND  # or directly specify the filename as a string
-        scenario_filename = FILE_HEAT_DEMAND_SCENARIOS  # or directly specify the filename as a string
+        heat_demand_filename = run_config.heat_demand_file  # or directly specify the filename as a string
+        scenario_filename = run_config.heat_demand_scenario_file  # or directly specify the filename as a string
 
         # Construct paths
-        heat_demand_file = os.path.join(PATH_IN, 'demands', heat_demand_filename)
-        scenario_file = os.path.join(PATH_IN, 'demands', scenario_filename)
+        heat_demand_file = os.path.join(run_config.path_in, 'demands', heat_demand_filename)
+        scenario_file = os.path.join(run_config.path_in, 'demands', scenario_filename)
 
         # Check if the files exist
         if not os.path.exists(heat_demand_file):
@@ -150,7 +364,7 @@ def main():
             return
 
         # Create a model instance and pass the filenames
-        model = Model(heat_demand_file, scenario_file)
+        model = Model(heat_demand_file, scenario_file, run_config=run_config)
 
         # Set solver options
         solver_options_with_log = solver_options.copy()
@@ -160,7 +374,7 @@ def main():
         scenario_creator_kwargs = {}
 
         # Create a list of scenario names
-        all_scenario_names = list(model.scenario_data.keys())
+        all_scenario_names = model.scenario_names()
 
         # Create the extensive form
         options = {
@@ -180,6 +394,8 @@ def main():
         # Write objective values
         model.write_objective_values(ef_instance.ef)
 
+        model.close_logging()
+
         print(
             f"\n### Scenario {model.start_date}_to_{model.end_date}_{model.period} has been processed. ###"
         )
@@ -1,101 +1,201 @@
 # Standard library imports
+import glob
 import json
-import logging
 import os
+import sys
 from datetime import datetime
+from statistics import NormalDist
 
 # Third-party imports
+import numpy as np
 import pandas as pd
 import pyomo.environ as pyo
 from pyomo.network import Arc
+from pyomo.opt import TerminationCondition
 import mpisppy.utils.sputils as sputils
 from mpisppy.opt.ef import ExtensiveForm
 
-# Local imports
+# Local imports (die Assets lesen ihre Daten über common.asset_specs)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 import assets.boiler_s as boiler
 import assets.chp_s as chp
 import assets.grid_s as grid
 import assets.heat_storage_s as heat_storage
+from common import asset_specs
+from common.demands import load_forecast_errors, load_heat_demand
+from common.plant import Storage
+from common.run_config import RunConfig, close_run_logger, run_logger
+from common.scenario_provider import HourlyValues, ScenarioSet
 
 
-# Load the config.json
-with open ('../config.json', 'r') as f:
-    config = json.load(f)
-
-# Model Config
+# Konfiguration der Läufe (config.json über einen absoluten Pfad, Modelle erhalten sie als RunConfig)
 model_type = 'stochastic'
-model_config = config['stochastic']
-
-# Global Config
-global_config = config['global']
-
-# Paths
-data_path = global_config['data_path']
-
-# Declare paths
-PATH_IN = os.path.join(data_path, model_config['input_path'])
-PATH_OUT = os.path.join(data_path, model_config['output_path'])
-PATH_OUT_LOGS = os.path.join(data_path, model_config['log_path'])
-PATH_OUT_TIMESERIES = os.path.join(data_path, model_config['timeseries_path'])
-PATH_OUT_OBJECTIVES = os.path.join(data_path, model_config['objectives_path'])
-PATH_OUT_ROOT = os.path.join(data_path, model_config['root_path'])
-
-# Heat Demand Data
-FILE_HEAT_DEMAND = global_config['heat_demand_file']
-FILE_HEAT_DEMAND_SCENARIOS = global_config['heat_demand_scenario_file']
-DUMMY_FILE_HEAT_DEMAND = global_config['dummy_heat_demand_file']
-DUMMY_FILE_HEAT_DEMAND_SCENARIOS = global_config['dummy_heat_demand_scenario_file']
-
-# Weighted Heat Demand
-WEIGHTED_HEAT_DEMAND = global_config['weighted_heat_demand']
-
-# Declare constants
-GAS_PRICE = global_config['gas_price'] # €/kWh  (HS)
-POWER_PRICE = global_config['power_price'] # €/kWh (el)
-HEAT_PRICE = global_config['heat_price'] # €/kWh (th)
-CALORIFIC_VALUE_NGAS = global_config['calorific_value_ngas'] # kWh/m3
-
-# CHP 
-CHP_BONUS_SELF_CONSUMPTION= global_config['chp_bonus_self_consumption']  # €/kWhel
-CHP_BONUS= global_config['chp_bonus']  # €/kWhel
-CHP_INDEX_EEX= global_config['chp_index_eex']  # €/kWhel
-ENERGY_TAX_REFUND_GAS= global_config['energy_tax_refund_gas']  # €/kWhHS
-AVOIDED_GRID_FEES= global_config['avoided_grid_fees']  # €/kWhel
-SHARE_SELF_CONSUMPTION= global_config['share_self_consumption'] # %
-SHARE_FEED_IN= global_config['share_feed_in'] # %
-
-# Boiler
-POWERCOST_TO_HEAT_SALES_RATIO = global_config['power_cost_to_heat_sales_ratio'] 
-
-# Heat Storage
-COST_CHARGE = global_config['cost_charge'] # €/kWh
-COST_DISCHARGE = global_config['cost_discharge'] # €/kWh
-
-# Costs
-MAINTENANCE_COSTS = global_config['maintenance_cost'] # €/kWh (HS)
+RUN_CONFIG = RunConfig.from_config(model_type)
+
+# Decision Rule
+DECISION_RULE_SIGMA_RANGE = 3 # Fehlerbereich mu +/- 3 sigma wie in der Szenariogenerierung
+DECISION_RULE_SHORTFALL_COST = 10 # €/kWh, nicht abbildbare Abweichung (wie common.recourse_evaluator)
+BIG_M = 1e6
+
+# Abbruch durch ein Limit: Ergebnis ist zulässig, wenn der Solver eine Lösung gefunden hat (wie main_d)
+LIMIT_CONDITIONS = (TerminationCondition.maxTimeLimit, TerminationCondition.maxIterations,
+                    TerminationCondition.maxEvaluations)
+
+
+# Quelldateien, die den Aufbau der Szenario-Instanzen bestimmen (Schlüssel der Snapshots)
+SNAPSHOT_SOURCES = [os.path.abspath(__file__), asset_specs.__file__] + sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', '*.py')))
+
+
+# Kosten der Stufen; Funktionen des Moduls, damit create_instance mit den Regeln nur die RunConfig kopiert
+# (nicht das Model mit Logger und Szenarien)
+def _first_stage_cost_rule(model, config):
+    return (
+        _gas_costs(model, config) + 
+        _power_costs(model, config) +
+        _storage_costs(model, config) +	
+        _maintenance_costs(model, config) - 
+        _power_revenue(model, config) - 
+        _heat_revenue(model, config) - 
+        _chp_revenue(model, config)
+    )
+
+
+def _second_stage_cost_rule(model, config):
+    second = (
+        pyo.quicksum(model.heat_storage1.dispatch_heat_charge[t] * config.cost_charge for t in model.t) +
+        pyo.quicksum(model.heat_storage1.dispatch_heat_discharge[t] * config.cost_discharge for t in model.t) +
+        pyo.quicksum(model.heat_storage1.use_extension[t] * model.EXTENSION_COST for t in model.t)
+    )
+    return second
+
+
+def _gas_costs(model, config):
+    """ Calculate gas costs for CHP and Boiler."""
+    gas_costs = (
+        pyo.quicksum(model.chp1.gas[t] * model.GAS_PRICE[t] for t in model.t) +
+        pyo.quicksum(model.chp2.gas[t] * model.GAS_PRICE[t] for t in model.t) +  
+        pyo.quicksum(model.boiler1.gas[t] * model.GAS_PRICE[t] for t in model.t)
+    )
+    return gas_costs
+
+
+def _power_costs(model, config):
+    """Calculate power costs for CHP."""
+    power_costs = pyo.quicksum(model.boiler1.heat[t] * config.power_cost_to_heat_sales_ratio * model.POWER_PRICE[t] for t in model.t)
+    return power_costs
+
+
+def _storage_costs(model, config):
+    """Calculate storage costs for Heat Storage."""
+    storage_costs = (
+        pyo.quicksum(model.heat_storage1.heat_charge[t] * config.cost_charge for t in model.t) +
+        pyo.quicksum(model.heat_storage1.heat_discharge[t] * config.cost_discharge for t in model.t)
+    )
+    return storage_costs
+
+
+def _maintenance_costs(model, config):
+    """Calculate maintenance costs for CHP."""
+    maintenance_costs = (
+        pyo.quicksum(model.chp1.bin[t] * config.maintenance_cost for t in model.t) + 
+        pyo.quicksum(model.chp2.bin[t] * config.maintenance_cost for t in model.t) # New
+    )	
+    return maintenance_costs
+
+
+def _power_revenue(model, config):
+    """Calculate power revenue for CHP."""
+    power_revenue = (
+        pyo.quicksum(model.chp1.power[t] * model.POWER_PRICE[t] for t in model.t) + 
+        pyo.quicksum(model.chp2.power[t] * model.POWER_PRICE[t] for t in model.t) # New
+    )
+    return power_revenue
+
+
+def _heat_revenue(model, config):
+    """Calculate heat revenue for CHP and Boiler."""
+    heat_revenue = (
+    pyo.quicksum(model.chp1.heat[t] * model.HEAT_PRICE[t] for t in model.t) +
+    pyo.quicksum(model.chp2.heat[t] * model.HEAT_PRICE[t] for t in model.t) + # New
+    pyo.quicksum(model.boiler1.heat[t] * model.HEAT_PRICE[t] for t in model.t)
+    )
+    return heat_revenue
+
+
+def _chp_revenue(model, config):
+    """Calculate CHP revenue."""
+    chp_bonus_for_self_consumption = (
+        pyo.quicksum(model.chp1.power[t] * config.chp_bonus_self_consumption * config.share_self_consumption for t in model.t) +
+        pyo.quicksum(model.chp2.power[t] * config.chp_bonus_self_consumption * config.share_self_consumption for t in model.t) # New
+    )
+    chp_bonus_for_feed_in = (
+        pyo.quicksum(model.chp1.power[t] * config.chp_bonus * config.share_feed_in for t in model.t) +
+        pyo.quicksum(model.chp2.power[t] * config.chp_bonus * config.share_feed_in for t in model.t) # New
+    )
+    chp_index = (
+        pyo.quicksum((model.chp1.power[t] - model.chp1.power[t] * config.share_self_consumption) * config.chp_index_eex for t in model.t) +
+        pyo.quicksum((model.chp2.power[t] - model.chp2.power[t] * config.share_self_consumption) * config.chp_index_eex for t in model.t) # New
+    )
+    avoided_grid_fees = (
+        pyo.quicksum((model.chp1.power[t] - model.chp1.power[t] * config.share_self_consumption) * config.avoided_grid_fees for t in model.t) +
+        pyo.quicksum((model.chp2.power[t] - model.chp2.power[t] * config.share_self_consumption) * config.avoided_grid_fees for t in model.t) # New
+    )
+    energy_tax_refund = (
+        pyo.quicksum(model.chp1.gas[t] * config.energy_tax_refund_gas for t in model.t) +
+        pyo.quicksum(model.chp2.gas[t] * config.energy_tax_refund_gas for t in model.t) # New
+    )
+    
+    chp_revenue = (
+        chp_bonus_for_self_consumption +
+        chp_bonus_for_feed_in +
+        chp_index +
+        avoided_grid_fees +
+        energy_tax_refund
+    )
+    return chp_revenue
 
 
 class Model:
     """Model class."""
     
-    def __init__(self, heat_demand_file, heat_demand_scenario_file):
-        """Initialize the model."""
+    def __init__(self, heat_demand_file, heat_demand_scenario_file, scenario_provider=None, snapshots=None,
+                 run_config=None, demand_store=None):
+        """Initialize the model.
+
+        The scenarios of the file are held as common.scenario_provider.ScenarioSet.
+        With a scenario_provider the scenario file is not read; every scenario is
+        fetched from the provider when its instance is created. With a
+        demand_store (common.demand_store.DemandStore, also the SharedDemandStore
+        of a worker process) the heat demand and the scenarios of the day come
+        from the store instead of the JSON files. With snapshots
+        (common.model_snapshot.SnapshotCache) stored scenario instances are
+        loaded instead of built. run_config is the RunConfig of the run (paths,
+        prices, weighted demand, decision rule, special case), default from
+        config.json; the run logs to its own file (close_logging at the end).
+        """
+        self.config = run_config or RUN_CONFIG
         self.model = pyo.AbstractModel()
         self.instance = None
         self.ef_instance = None
         self.timeseries_data = None
-        self.scenario_data = None
+        self.scenarios = None
+        self.heat_demand = None
+        self.forecast = None
         self.results = None
         self.start_date = None
         self.end_date = None
         self.period = None
-        self.USE_WEIGHTED_HEAT_DEMAND = Model.USE_WEIGHTED_HEAT_DEMAND
-        self.SPECIAL_CASE = Model.SPECIAL_CASE
         self.logfile_name = None
+        self.logger = None
         
         # Speichern der Dateinamen als Instanzvariablen
         self.heat_demand_file = heat_demand_file
         self.heat_demand_scenario_file = heat_demand_scenario_file
+        self.scenario_provider = scenario_provider
+        self.demand_store = demand_store
+        self.snapshots = snapshots
+        # €/kWh: Szenario-Instanzen mit bepreister statt verbotener nicht abbildbarer Abweichung (SAA)
+        self.shortfall_cost = None
         
         # Konfigurieren des Loggings und Initialisieren der Komponenten
         self.configure_logging()
@@ -106,7 +206,6 @@ class Model:
         """Initialize basic model components."""
         self.model.t = pyo.Set(ordered=True)
         self._define_parameters()
-        self._load_scenario_data()        
         self._define_assets()
         self._define_expressions()
         self._define_objective()
@@ -114,9 +213,11 @@ class Model:
     def _define_parameters(self):
         """Define model parameters."""
         # Load Constants and the heat demand
-        self.model.GAS_PRICE = pyo.Param(initialize=GAS_PRICE)
-        self.model.POWER_PRICE = pyo.Param(initialize=POWER_PRICE)
-        self.model.HEAT_PRICE = pyo.Param(initialize=HEAT_PRICE)
+        # Prices per hour and the extension penalty (_parameter_data), mutable for common.price_sweep
+        self.model.GAS_PRICE = pyo.Param(self.model.t, mutable=True)
+        self.model.POWER_PRICE = pyo.Param(self.model.t, mutable=True)
+        self.model.HEAT_PRICE = pyo.Param(self.model.t, mutable=True)
+        self.model.EXTENSION_COST = pyo.Param(mutable=True)
         self.model.heat_demand = pyo.Param(self.model.t)
         self.model.heat_demand_scenario = pyo.Param(self.model.t)
         self.model.delta_heat_demand = pyo.Param(self.model.t)
@@ -130,27 +231,27 @@ class Model:
     
     def _add_chp_assets(self):
         """Define CHP assets."""
-        chp1 = chp.Chp('chp1', PATH_IN + '/assets/chp_operation_1.csv')
+        chp1 = chp.Chp('chp1', self.config.path_in + 'assets/chp_operation_1.csv')
         chp1.add_to_model(self.model)
         
-        chp2 = chp.Chp('chp2', PATH_IN + '/assets/chp_operation_2.csv')
+        chp2 = chp.Chp('chp2', self.config.path_in + 'assets/chp_operation_2.csv')
         chp2.add_to_model(self.model)
 
     def _add_boiler_assets(self):
         """Define Boiler assets."""
-        boiler1 = boiler.Boiler('boiler1', PATH_IN + '/assets/boiler_operation.csv')
+        boiler1 = boiler.Boiler('boiler1', self.config.path_in + 'assets/boiler_operation.csv')
         boiler1.add_to_model(self.model)
 
     def _add_heat_storage_assets(self):
         """Define Heat Storage assets."""
-        heat_storage1 = heat_storage.HeatStorage('heat_storage1', PATH_IN + '/assets/heat_storage.csv')
+        heat_storage1 = heat_storage.HeatStorage('heat_storage1', self.config.path_in + 'assets/heat_storage.csv')
         heat_storage1.add_to_model(self.model)
 
     def _add_grid_assets(self):
         """Define Grid assets."""
         ngas_grid = grid.NGasGrid('ngas_grid')
-        power_grid = grid.ElectricalGrid('power_grid', PATH_IN + '/assets/power_grid.csv')
-        heat_grid = grid.HeatGrid('heat_grid', PATH_IN + '/assets/heat_grid.csv')
+        power_grid = grid.ElectricalGrid('power_grid', self.config.path_in + 'assets/power_grid.csv')
+        heat_grid = grid.HeatGrid('heat_grid', self.config.path_in + 'assets/heat_grid.csv')
 
         for grid_assets in [ngas_grid, power_grid, heat_grid]:
             grid_assets.add_to_model(self.model)
@@ -211,107 +312,10 @@ class Model:
     
     def _define_expressions(self):
         """Define Model expressions."""
-        self.model.first_stage_cost = pyo.Expression(rule=self._first_stage_cost_rule)
-        self.model.second_stage_cost = pyo.Expression(rule=self._second_stage_cost_rule)
-
-    def _first_stage_cost_rule(self, model):
-        return (
-            self._gas_costs(model) + 
-            self._power_costs(model) +
-            self._storage_costs(model) +	
-            self._maintenance_costs(model) - 
-            self._power_revenue(model) - 
-            self._heat_revenue(model) - 
-            self._chp_revenue(model)
-        )
+        config = self.config
+        self.model.first_stage_cost = pyo.Expression(rule=lambda model: _first_stage_cost_rule(model, config))
+        self.model.second_stage_cost = pyo.Expression(rule=lambda model: _second_stage_cost_rule(model, config))
 
-    def _second_stage_cost_rule(self, model):
-        second = (
-            pyo.quicksum(model.heat_storage1.dispatch_heat_charge[t] * COST_CHARGE for t in model.t) +
-            pyo.quicksum(model.heat_storage1.dispatch_heat_discharge[t] * COST_DISCHARGE for t in model.t) +
-            pyo.quicksum(model.heat_storage1.use_extension[t] * 10 for t in model.t) 
-        )
-        return second
-
-    def _gas_costs(self, model):
-            """ Calculate gas costs for CHP and Boiler."""
-            gas_costs = (
-            pyo.quicksum(model.chp1.gas[t] * model.GAS_PRICE  for t in model.t) +
-            pyo.quicksum(model.chp2.gas[t] * model.GAS_PRICE  for t in model.t) +  
-            pyo.quicksum(model.boiler1.gas[t] * model.GAS_PRICE  for t in model.t)
-            )
-            return gas_costs
-    
-    def _power_costs(self, model):
-        """Calculate power costs for CHP."""
-        power_costs = pyo.quicksum(model.boiler1.heat[t] * POWERCOST_TO_HEAT_SALES_RATIO * model.POWER_PRICE for t in model.t)
-        return power_costs
-
-    def _storage_costs(self, model):
-        """Calculate storage costs for Heat Storage."""
-        storage_costs = (
-            pyo.quicksum(model.heat_storage1.heat_charge[t] * COST_CHARGE for t in model.t) +
-            pyo.quicksum(model.heat_storage1.heat_discharge[t] * COST_DISCHARGE for t in model.t)
-        )
-        return storage_costs
-    
-    def _maintenance_costs(self, model):
-        """Calculate maintenance costs for CHP."""
-        maintenance_costs = (
-            pyo.quicksum(model.chp1.bin[t] * MAINTENANCE_COSTS for t in model.t) + 
-            pyo.quicksum(model.chp2.bin[t] * MAINTENANCE_COSTS for t in model.t) # New
-        )	
-        return maintenance_costs
-
-    def _power_revenue(self, model):
-        """Calculate power revenue for CHP."""
-        power_revenue = (
-            pyo.quicksum(model.chp1.power[t] * model.POWER_PRICE for t in model.t) + 
-            pyo.quicksum(model.chp2.power[t] * model.POWER_PRICE for t in model.t) # New
-        )
-        return power_revenue
-    
-    def _heat_revenue(self, model):
-        """Calculate heat revenue for CHP and Boiler."""
-        heat_revenue = (
-        pyo.quicksum(model.chp1.heat[t] * model.HEAT_PRICE for t in model.t) +
-        pyo.quicksum(model.chp2.heat[t] * model.HEAT_PRICE for t in model.t) + # New
-        pyo.quicksum(model.boiler1.heat[t] * model.HEAT_PRICE for t in model.t)
-        )
-        return heat_revenue
-    
-    def _chp_revenue(self, model):
-        """Calculate CHP revenue."""
-        chp_bonus_for_self_consumption = (
-            pyo.quicksum(model.chp1.power[t] * CHP_BONUS_SELF_CONSUMPTION * SHARE_SELF_CONSUMPTION for t in model.t) +
-            pyo.quicksum(model.chp2.power[t] * CHP_BONUS_SELF_CONSUMPTION * SHARE_SELF_CONSUMPTION for t in model.t) # New
-        )
-        chp_bonus_for_feed_in = (
-            pyo.quicksum(model.chp1.power[t] * CHP_BONUS * SHARE_FEED_IN for t in model.t) +
-            pyo.quicksum(model.chp2.power[t] * CHP_BONUS * SHARE_FEED_IN for t in model.t) # New
-        )
-        chp_index = (
-            pyo.quicksum((model.chp1.power[t] - model.chp1.power[t] * SHARE_SELF_CONSUMPTION) * CHP_INDEX_EEX for t in model.t) +
-            pyo.quicksum((model.chp2.power[t] - model.chp2.power[t] * SHARE_SELF_CONSUMPTION) * CHP_INDEX_EEX for t in model.t) # New
-        )
-        avoided_grid_fees = (
-            pyo.quicksum((model.chp1.power[t] - model.chp1.power[t] * SHARE_SELF_CONSUMPTION) * AVOIDED_GRID_FEES for t in model.t) +
-            pyo.quicksum((model.chp2.power[t] - model.chp2.power[t] * SHARE_SELF_CONSUMPTION) * AVOIDED_GRID_FEES for t in model.t) # New
-        )
-        energy_tax_refund = (
-            pyo.quicksum(model.chp1.gas[t] * ENERGY_TAX_REFUND_GAS for t in model.t) +
-            pyo.quicksum(model.chp2.gas[t] * ENERGY_TAX_REFUND_GAS for t in model.t) # New
-        )
-        
-        chp_revenue = (
-            chp_bonus_for_self_consumption +
-            chp_bonus_for_feed_in +
-            chp_index +
-            avoided_grid_fees +
-            energy_tax_refund
-        )
-        return chp_revenue
-    
     def _define_objective(self):
         """Add objective function to model."""
         def objective_expression_rule(model):
@@ -322,8 +326,12 @@ class Model:
     def _load_scenario_data(self):
         """Load scenario data from files and load it in a dictionary."""  
 
-        if self.USE_WEIGHTED_HEAT_DEMAND:
-            with open(os.path.join(PATH_IN, 'demands', WEIGHTED_HEAT_DEMAND)) as f:
+        if self.demand_store is not None:
+            # Prognose bzw. gewichteter Bedarf des Tages aus dem Demand Store
+            kind = 'weighted' if self.config.use_weighted_heat_demand else 'forecast'
+            heat_demand_data = {'heat_demand': self.demand_store.heat_demand(self.start_date, self.period, kind)}
+        elif self.config.use_weighted_heat_demand:
+            with open(os.path.join(self.config.path_in, 'demands', self.config.weighted_heat_demand_file)) as f:
                 print('##########################################')
                 print('####### Data: Weighted Heat Demand #######')
                 print('##########################################')
@@ -335,9 +343,6 @@ class Model:
                 print('###############################################')
                 heat_demand_data = json.load(f)
 
-        with open(self.heat_demand_scenario_file) as f:
-            scenario_data = json.load(f)
-
         ################### For Testing ###################
 
         # with open(f'{PATH_IN}demands/{DUMMY_FILE_HEAT_DEMAND}') as f:
@@ -349,32 +354,216 @@ class Model:
         ################### For Testing ###################
 
         # Extrahiere t-Werte und konvertiere sie in int
-        t_values = list(map(int, heat_demand_data['heat_demand'].keys()))
         heat_demand = {int(k): v for k, v in heat_demand_data['heat_demand'].items()}
+        self.heat_demand = heat_demand
+        self.forecast = np.array([heat_demand[t] for t in sorted(heat_demand)], dtype=float)
+
+        # Szenarien kommen einzeln vom Provider, sonst alle als Array aus dem Store oder der Datei
+        if self.scenario_provider is not None:
+            self.scenarios = self.scenario_provider
+        elif self.demand_store is not None:
+            self.scenarios = self.demand_store.scenarios(self.start_date, self.period, self.forecast)
+        else:
+            self.scenarios = ScenarioSet.from_json(self.heat_demand_scenario_file, self.forecast)
+
+    def _scenario_data(self, scenario_name):
+        """Pyomo data of one scenario; the hourly values are views on the scenario arrays."""
+        if isinstance(self.scenarios, ScenarioSet):
+            heat_demand_scenario = self.scenarios.heat_demand_scenario(scenario_name)
+            delta_heat_demand = self.scenarios.delta_heat_demand(scenario_name)
+        else:
+            heat_demand_scenario = np.asarray(self.scenarios.heat_demand_scenario(scenario_name), dtype=float)
+            delta_heat_demand = self.forecast - heat_demand_scenario
+
+        return {
+            't': {None: sorted(self.heat_demand)},
+            'heat_demand': self.heat_demand,
+            'heat_demand_scenario': HourlyValues(heat_demand_scenario),
+            'delta_heat_demand': HourlyValues(delta_heat_demand),
+            'probability': {None: self.scenarios.probability(scenario_name)},
+            **self._parameter_data(sorted(self.heat_demand))
+        }
+
+    def _parameter_data(self, t_values):
+        """Pyomo data of the prices per hour and the extension penalty of the run configuration."""
+        return {**self.config.price_data(t_values), 'EXTENSION_COST': {None: self.config.extension_cost}}
+
+    def scenario_names(self):
+        """Names of all scenarios."""
+        return list(self.scenarios.names)
+
+    def set_scenarios(self, heat_demand_scenarios, probabilities=None):
+        """Replace the scenarios of the file by the given demand paths (n_scenarios, T)."""
+        self.scenarios = ScenarioSet.from_arrays(heat_demand_scenarios, self.forecast, probabilities)
+
+    def build_decision_rule_model(self):
+        """Build the affine decision rule model.
+
+        Instead of a copy of the second stage per scenario, the storage recourse
+        is an affine function of the positive and negative part of the hourly
+        demand deviation xi = heat_demand - actual demand:
+
+            dispatch_heat_charge(xi) = charge_0 + charge_plus * xi+ + charge_minus * xi-
+            dispatch_heat_discharge(xi) = dispatch_heat_charge(xi) - xi
+            dispatch_extension(xi) = extension_0 + extension_plus * xi+ + extension_minus * xi-
+
+        so dispatch_balance holds for every xi and the recourse of the EF
+        (charge xi+, discharge xi-) is one of the rules. The rules are piecewise
+        linear with a kink at xi = 0, so the second-stage constraints only have
+        to hold at the ends of the error range mu +/- 3 sigma and at 0.
+        Deviations beyond the storage power are covered by a shortfall priced
+        like in common.recourse_evaluator. The model has the size of one scenario.
+        """
+        t_values = sorted(self.heat_demand)
+        forecast = load_heat_demand(self.heat_demand_file)
+        mu, sigma = load_forecast_errors()
+        storage = Storage('heat_storage1', self.config.path_in + 'assets/heat_storage.csv')
+
+        # xi = heat_demand - (forecast + error), t = 1 entspricht Stunde 0
+        xi_points, xi_plus_mean, xi_minus_mean = {}, {}, {}
+        for t in t_values:
+            hour = (t - 1) % 24
+            xi_mean = self.heat_demand[t] - forecast[t] - mu[hour]
+            lower = xi_mean - DECISION_RULE_SIGMA_RANGE * sigma[hour]
+            upper = xi_mean + DECISION_RULE_SIGMA_RANGE * sigma[hour]
+            xi_points[t, 'lower'] = lower
+            xi_points[t, 'kink'] = min(max(0.0, lower), upper)
+            xi_points[t, 'upper'] = upper
+
+            # E[max(xi, 0)] und E[max(-xi, 0)] der Normalverteilung
+            z = xi_mean / sigma[hour]
+            xi_plus_mean[t] = xi_mean * NormalDist().cdf(z) + sigma[hour] * NormalDist().pdf(z)
+            xi_minus_mean[t] = xi_plus_mean[t] - xi_mean
+
+        # Nominal scenario without deviation; its second-stage variables stay at zero
+        scenario_data = {None: {
+            't': {None: t_values},
+            'heat_demand': self.heat_demand,
+            'heat_demand_scenario': self.heat_demand,
+            'delta_heat_demand': {t: 0 for t in t_values},
+            'probability': {None: 1.0},
+            **self._parameter_data(t_values)
+        }}
+        self.instance = self.model.create_instance(data=scenario_data, name='DecisionRule')
+        self._add_arcs()
+        self._expand_arcs()
 
-        # Initialisiere das Hauptdictionary
-        self.scenario_data = {}
+        heat_storage1 = self.instance.heat_storage1
+        for var in [heat_storage1.dispatch_heat_charge, heat_storage1.dispatch_heat_discharge,
+                    heat_storage1.dispatch_extension, heat_storage1.use_extension]:
+            var.fix(0)
+        self.instance.objective.deactivate()
+
+        rule = self.instance.decision_rule = pyo.Block()
+        rule.point = pyo.Set(initialize=['lower', 'kink', 'upper'])
+        rule.xi = pyo.Param(self.instance.t, rule.point, initialize=xi_points)
+        rule.xi_plus_mean = pyo.Param(self.instance.t, initialize=xi_plus_mean)
+        rule.xi_minus_mean = pyo.Param(self.instance.t, initialize=xi_minus_mean)
+        # Strafkosten der nicht abbildbaren Abweichung, änderbar wie die Preise (common.price_sweep)
+        rule.SHORTFALL_COST = pyo.Param(initialize=DECISION_RULE_SHORTFALL_COST, mutable=True)
+
+        rule.charge_0 = pyo.Var(self.instance.t, within=pyo.Reals)
+        rule.charge_plus = pyo.Var(self.instance.t, within=pyo.Reals)
+        rule.charge_minus = pyo.Var(self.instance.t, within=pyo.Reals)
+        rule.extension_0 = pyo.Var(self.instance.t, within=pyo.Reals)
+        rule.extension_plus = pyo.Var(self.instance.t, within=pyo.Reals)
+        rule.extension_minus = pyo.Var(self.instance.t, within=pyo.Reals)
+        rule.use_extension = pyo.Var(self.instance.t, within=pyo.Binary)
+        rule.shortfall = pyo.Var(self.instance.t, within=pyo.NonNegativeReals)
+
+        def charge(t, p):
+            xi = pyo.value(rule.xi[t, p])
+            return rule.charge_0[t] + rule.charge_plus[t] * max(xi, 0) + rule.charge_minus[t] * max(-xi, 0)
+
+        def discharge(t, p):
+            return charge(t, p) - rule.xi[t, p]
+
+        def extension(t, p):
+            xi = pyo.value(rule.xi[t, p])
+            return rule.extension_0[t] + rule.extension_plus[t] * max(xi, 0) + rule.extension_minus[t] * max(-xi, 0)
+
+        def storage_capacity(t, p):
+            return heat_storage1.heat_capacity[t] + rule.xi[t, p] - extension(t, p)
+
+        rule.charge_min_constr = pyo.Constraint(
+            self.instance.t, rule.point, rule=lambda block, t, p: charge(t, p) >= 0)
+        rule.discharge_min_constr = pyo.Constraint(
+            self.instance.t, rule.point, rule=lambda block, t, p: discharge(t, p) >= 0)
+        rule.charge_max_constr = pyo.Constraint(
+            self.instance.t, rule.point,
+            rule=lambda block, t, p: heat_storage1.heat_charge[t] + charge(t, p) <= storage.max_heat + rule.shortfall[t])
+        rule.discharge_max_constr = pyo.Constraint(
+            self.instance.t, rule.point,
+            rule=lambda block, t, p: heat_storage1.heat_discharge[t] + discharge(t, p) <= storage.max_heat + rule.shortfall[t])
+        rule.extension_min_constr = pyo.Constraint(
+            self.instance.t, rule.point, rule=lambda block, t, p: extension(t, p) >= 0)
+        rule.extension_usage_constr = pyo.Constraint(
+            self.instance.t, rule.point, rule=lambda block, t, p: extension(t, p) <= BIG_M * rule.use_extension[t])
+        rule.storage_min_constr = pyo.Constraint(
+            self.instance.t, rule.point, rule=lambda block, t, p: storage_capacity(t, p) + rule.shortfall[t] >= 0)
+        rule.storage_max_constr = pyo.Constraint(
+            self.instance.t, rule.point, rule=lambda block, t, p: storage_capacity(t, p) <= storage.max_content)
+
+        # Expected recourse cost (affine in xi+ and xi-, therefore evaluated at their means)
+        def expected_charge(t):
+            return rule.charge_0[t] + rule.charge_plus[t] * rule.xi_plus_mean[t] + rule.charge_minus[t] * rule.xi_minus_mean[t]
+
+        rule.second_stage_cost = pyo.Expression(expr=(
+            pyo.quicksum(
+                expected_charge(t) * self.config.cost_charge +
+                (expected_charge(t) - rule.xi_plus_mean[t] + rule.xi_minus_mean[t]) * self.config.cost_discharge +
+                rule.use_extension[t] * self.instance.EXTENSION_COST +
+                rule.shortfall[t] * rule.SHORTFALL_COST
+                for t in self.instance.t
+            )
+        ))
+        rule.objective = pyo.Objective(
+            expr=self.instance.first_stage_cost + rule.second_stage_cost, sense=pyo.minimize)
 
-        for scenario_name, scenario_values in scenario_data.items():
-            try:
-                probability = scenario_values['Probability']
-            
-                heat_demand_scenario = {int(hour): scenario_values[str(hour)] for hour in t_values}
-                delta_heat_demand = {
-                    int(hour): heat_demand[hour] - heat_demand_scenario[hour] for hour in t_values
-                }
-                
-                self.scenario_data[scenario_name] = {
-                    't': {None: t_values},
-                    'heat_demand': heat_demand,
-                    'heat_demand_scenario': heat_demand_scenario,
-                    'delta_heat_demand': delta_heat_demand,
-                    'probability': {None: probability}
-                }
-            except KeyError as e:
-                print(f"Fehler im Szenario {scenario_name}: fehlender Schlüssel {e}")
-            except Exception as e:
-                print(f"Allgemeiner Fehler im Szenario {scenario_name}: {e}")
+        return self.instance
+
+    def solve_decision_rule(self, solver_name, solver_options, warmstart=False):
+        """Solve the decision rule model (warmstart: current variable values as MIP start)."""
+        solver = pyo.SolverFactory(solver_name)
+        for key, value in solver_options.items():
+            solver.options[key] = value
+        # warmstart nur auf Wunsch, nicht jede Solver-Schnittstelle kennt das Argument
+        solve_kwargs = {'warmstart': True} if warmstart else {}
+        self.results = solver.solve(self.instance, tee=True, **solve_kwargs)
+        self.logger.info("Decision rule model solved successfully")
+
+    def write_decision_rule_results(self):
+        """Write root solution, timeseries and objective of the decision rule model, returns the files."""
+        prefix = 'weighted_' if self.config.use_weighted_heat_demand else ''
+        file_name = f's_{prefix}{self.start_date}_to_{self.end_date}_{self.period}{self.config.special_case}_DecisionRule'
+        rule = self.instance.decision_rule
+
+        df_root_solution = pd.DataFrame({
+            var.name: [pyo.value(var[t]) for t in self.instance.t]
+            for var in self._first_stage_vars(self.instance)
+        }, index=list(self.instance.t))
+        df_root_solution.index.name = 't'
+        df_root_solution.to_csv(self.config.path_out_root + file_name + '_rs.csv')
+
+        df_rule = pd.DataFrame({
+            var.name: [pyo.value(var[t]) for t in self.instance.t]
+            for var in [rule.charge_0, rule.charge_plus, rule.charge_minus, rule.extension_0,
+                        rule.extension_plus, rule.extension_minus, rule.use_extension, rule.shortfall]
+        }, index=list(self.instance.t))
+        for p in ['lower', 'upper']:
+            df_rule[f'decision_rule.xi_{p}'] = [pyo.value(rule.xi[t, p]) for t in self.instance.t]
+        df_output = pd.concat([df_root_solution, df_rule], axis=1)
+        df_output.index.name = 't'
+        df_output.to_csv(self.config.path_out_timeseries + file_name + '_ts.csv')
+
+        if not os.path.exists(self.config.path_out_objectives):
+            os.makedirs(self.config.path_out_objectives)
+        df_results = pd.DataFrame([{'Scenario:': 'DecisionRule', 'ObjectiveValue': pyo.value(rule.objective)}])
+        df_results.to_csv(self.config.path_out_objectives + file_name + '_obj.csv', index=False)
+
+        self.logger.info(f"Decision rule results written to file")
+        return [self.config.path_out_root + file_name + '_rs.csv', self.config.path_out_timeseries + file_name + '_ts.csv',
+                self.config.path_out_objectives + file_name + '_obj.csv']
 
     def _scenario_creator(self, scenario_name):
         """Create a scenario model."""
@@ -382,43 +571,10 @@ class Model:
         print(f"Creating scenario: {scenario_name}...")
         print("=" * 40)
         self.instance = self._build_scenario_model(scenario_name)
+        if self.shortfall_cost is not None:
+            self._add_shortfall(self.instance)
         
-        varlist = [self.instance.chp1.bin, 
-                   self.instance.chp1.power,
-                   self.instance.chp1.gas,
-                   self.instance.chp1.heat,
-                   self.instance.chp1.eta_th,
-                   self.instance.chp1.eta_el,
-                   self.instance.chp1.y1,
-                   self.instance.chp1.y2,
-                   self.instance.chp2.bin, 
-                   self.instance.chp2.power,
-                   self.instance.chp2.gas,
-                   self.instance.chp2.heat,
-                   self.instance.chp2.eta_th,
-                   self.instance.chp2.eta_el,
-                   self.instance.chp2.y1,
-                   self.instance.chp2.y2,
-                   self.instance.boiler1.bin,
-                   self.instance.boiler1.heat,
-                   self.instance.boiler1.gas,
-                   self.instance.boiler1.eta_th,
-                   self.instance.boiler1.y1,
-                   self.instance.boiler1.y2,
-                   self.instance.heat_storage1.heat_charge,
-                   self.instance.heat_storage1.bin_charge,
-                   self.instance.heat_storage1.heat_discharge,
-                   self.instance.heat_storage1.bin_discharge,
-                   self.instance.heat_storage1.heat_balance,
-                   self.instance.heat_storage1.heat_capacity,
-                   self.instance.power_grid.power_balance,
-                   self.instance.power_grid.power_supply,
-                   self.instance.power_grid.power_feedin,
-                   self.instance.ngas_grid.gas_balance,
-                   self.instance.heat_grid.heat_balance,
-                   self.instance.heat_grid.heat_supply,
-                   self.instance.heat_grid.heat_feedin
-        ]
+        varlist = self._first_stage_vars(self.instance)
 
         # Add the root node to the instance
         sputils.attach_root_node(self.instance, self.instance.first_stage_cost, varlist)
@@ -452,19 +608,107 @@ class Model:
 
         return self.instance
 
+    def _add_shortfall(self, instance):
+        """Price the deviations a scenario instance cannot take instead of forbidding them.
+
+        Deviations beyond the remaining charge or discharge power of the storage
+        and below an empty storage become shortfall at SHORTFALL_COST per kWh
+        (shortfall_cost of the model), the recourse of common.recourse_evaluator.
+        Every sampled scenario is feasible then (saa.run_saa).
+        """
+        heat_storage1 = instance.heat_storage1
+        storage = Storage('heat_storage1', self.config.path_in + 'assets/heat_storage.csv')
+
+        instance.SHORTFALL_COST = pyo.Param(initialize=self.shortfall_cost, mutable=True)
+        instance.shortfall_charge = pyo.Var(instance.t, within=pyo.NonNegativeReals)
+        instance.shortfall_discharge = pyo.Var(instance.t, within=pyo.NonNegativeReals)
+        instance.shortfall_content = pyo.Var(instance.t, within=pyo.NonNegativeReals)
+
+        for constraint in [heat_storage1.max_heat_charge_secondstagerule, heat_storage1.max_heat_discharge_secondstagerule,
+                           heat_storage1.capacity_balance_secondstage_rule]:
+            constraint.deactivate()
+        instance.max_heat_charge_shortfall_constr = pyo.Constraint(
+            instance.t, rule=lambda model, t: heat_storage1.heat_charge[t] + heat_storage1.dispatch_heat_charge[t]
+            <= storage.max_heat + model.shortfall_charge[t])
+        instance.max_heat_discharge_shortfall_constr = pyo.Constraint(
+            instance.t, rule=lambda model, t: heat_storage1.heat_discharge[t] + heat_storage1.dispatch_heat_discharge[t]
+            <= storage.max_heat + model.shortfall_discharge[t])
+        # Fehlende Wärme im leeren Speicher (dispatch_heat_capacity >= 0) als Shortfall
+        instance.capacity_balance_shortfall_constr = pyo.Constraint(
+            instance.t, rule=lambda model, t: heat_storage1.dispatch_heat_capacity[t] == heat_storage1.heat_capacity[t]
+            + heat_storage1.dispatch_heat_charge[t] - heat_storage1.dispatch_heat_discharge[t] + model.shortfall_content[t])
+
+        instance.second_stage_cost.set_value(instance.second_stage_cost.expr + pyo.quicksum(
+            (instance.shortfall_charge[t] + instance.shortfall_discharge[t] + instance.shortfall_content[t])
+            * instance.SHORTFALL_COST for t in instance.t))
+
+    def _first_stage_vars(self, instance):
+        """First-stage variables (root node) of an instance."""
+        return [instance.chp1.bin,
+                instance.chp1.power,
+                instance.chp1.gas,
+                instance.chp1.heat,
+                instance.chp1.eta_th,
+                instance.chp1.eta_el,
+                instance.chp1.y1,
+                instance.chp1.y2,
+                instance.chp2.bin, 
+                instance.chp2.power,
+                instance.chp2.gas,
+                instance.chp2.heat,
+                instance.chp2.eta_th,
+                instance.chp2.eta_el,
+                instance.chp2.y1,
+                instance.chp2.y2,
+                instance.boiler1.bin,
+                instance.boiler1.heat,
+                instance.boiler1.gas,
+                instance.boiler1.eta_th,
+                instance.boiler1.y1,
+                instance.boiler1.y2,
+                instance.heat_storage1.heat_charge,
+                instance.heat_storage1.bin_charge,
+                instance.heat_storage1.heat_discharge,
+                instance.heat_storage1.bin_discharge,
+                instance.heat_storage1.heat_balance,
+                instance.heat_storage1.heat_capacity,
+                instance.power_grid.power_balance,
+                instance.power_grid.power_supply,
+                instance.power_grid.power_feedin,
+                instance.ngas_grid.gas_balance,
+                instance.heat_grid.heat_balance,
+                instance.heat_grid.heat_supply,
+                instance.heat_grid.heat_feedin
+        ]
+
     def _build_scenario_model(self, scenario_name):
         """Build the scenario model. Each scenario has its own model."""
 
         # Load the dictionary with the heat demand scenarios
-        if scenario_name in self.scenario_data:
-            scenario_data = self.scenario_data[scenario_name]
-            # Importent for the needed format for instance creation
-            scenario_data = {
-                None: scenario_data
-            }
-        else:
+        if scenario_name not in self.scenarios.names:
             raise RuntimeError(f"Scenario: {scenario_name} not found in scenario data")
-        
+        # Importent for the needed format for instance creation
+        scenario_data = {
+            None: self._scenario_data(scenario_name)
+        }
+
+        if self.snapshots is not None:
+            # Die Zielfunktion hängt vom Sonderfall ab, die Instanz vom Szenario und seinen Daten
+            key = self.snapshots.key(SNAPSHOT_SOURCES, {
+                'scenario': scenario_name,
+                'special_case': self.config.special_case,
+                'prices': self.config.prices(),
+                'data': scenario_data[None],
+            })
+            self.instance = self.snapshots.build(
+                key, lambda: self._construct_scenario_model(scenario_name, scenario_data), f'stochastic_scenario_{len(self.heat_demand)}h'
+            )
+            return self.instance
+
+        return self._construct_scenario_model(scenario_name, scenario_data)
+
+    def _construct_scenario_model(self, scenario_name, scenario_data):
+        """Create the instance of a scenario with arcs."""
         # Create the model instance
         self.instance = self.model.create_instance(data=scenario_data, name=scenario_name)    
         
@@ -488,6 +732,8 @@ class Model:
     def create_extensive_form(self, options , all_scenario_names, scenario_creator_kwargs):
         """Create the extensive form."""
         options['LogFile'] = self.logfile_name
+        # Szenarioanzahl im Log, für die Laufzeitprognose (common.solve_scheduler)
+        self.logger.info(f"Extensive form with {len(all_scenario_names)} scenarios")
         self.ef_instance = ExtensiveForm(
             options,
             all_scenario_names,
@@ -497,8 +743,8 @@ class Model:
         )
         return self.ef_instance
 
-    def solve(self):
-        """Solve the model."""
+    def solve(self, warmstart=False):
+        """Solve the model (warmstart: current variable values as MIP start)."""
         solver_name = self.ef_instance.options['solver']
         solver_options = self.ef_instance.options.get('solver_options', {})
         solver = pyo.SolverFactory(solver_name)
@@ -506,9 +752,24 @@ class Model:
         for key, value in solver_options.items():
             solver.options[key] = value
         # Solve the extensive form
-        self.results = solver.solve(self.ef_instance.ef, tee=True)
-        logging.info("Model solved successfully")
+        solve_kwargs = {'warmstart': True} if warmstart else {}
+        self.results = solver.solve(self.ef_instance.ef, tee=True, **solve_kwargs)
+        self.logger.info("Model solved successfully")
     
+    @property
+    def status(self):
+        """Status of the last solve: 'optimal', 'feasible' (limit reached with a solution) or the termination condition."""
+        if self.results is None:
+            return None
+        termination = self.results.solver.termination_condition
+        if termination == TerminationCondition.optimal:
+            return 'optimal'
+        objective = self.instance.decision_rule.objective if self.config.use_decision_rule else self.ef_instance.ef.EF_Obj
+        if termination in LIMIT_CONDITIONS + (TerminationCondition.feasible,) and \
+                pyo.value(objective, exception=False) is not None:
+            return 'feasible'
+        return str(termination)
+
     def _extract_scenario_info(self, file):
         """Extract the start date, end date, and period from the file name."""
         base_name = os.path.basename(file)
@@ -529,7 +790,7 @@ class Model:
             return None, None, None
 
     def write_results(self, ef):
-        """Write results to file."""
+        """Write results to file, returns the written files."""
 
         # Extract the Date from the file name
         #start_date, end_date, period = self._extract_scenario_info(FILE_HEAT_DEMAND)
@@ -540,7 +801,7 @@ class Model:
 
 
         # Determine prefix based on heat demand type
-        if self.USE_WEIGHTED_HEAT_DEMAND:
+        if self.config.use_weighted_heat_demand:
             prefix = 'weighted_'
         else:
             prefix = ''
@@ -569,8 +830,9 @@ class Model:
         df_root_solution = df_root_solution.sort_index()
 
         # Save the root solution to a CSV file
-        root_output_file = f's_{prefix}{start_date}_to_{end_date}_{period}{self.SPECIAL_CASE}_rs.csv'
-        df_root_solution.to_csv(PATH_OUT_ROOT + root_output_file)
+        root_output_file = f's_{prefix}{start_date}_to_{end_date}_{period}{self.config.special_case}_rs.csv'
+        df_root_solution.to_csv(self.config.path_out_root + root_output_file)
+        written_files = [self.config.path_out_root + root_output_file]
 
 
         for sname, smodel in sputils.ef_scenarios(self.ef_instance.ef):
@@ -596,14 +858,16 @@ class Model:
             
 
   
-            output_file = f's_{prefix}{start_date}_to_{end_date}_{period}_{sname}{self.SPECIAL_CASE}_ts.csv'
-            df_output.to_csv(PATH_OUT_TIMESERIES + output_file)
+            output_file = f's_{prefix}{start_date}_to_{end_date}_{period}_{sname}{self.config.special_case}_ts.csv'
+            df_output.to_csv(self.config.path_out_timeseries + output_file)
+            written_files.append(self.config.path_out_timeseries + output_file)
             #print(f'Results for {sname} written to {output_file}')
 
-        logging.info(f"Results written to file")       
+        self.logger.info(f"Results written to file")       
+        return written_files
     
     def write_objective_values(self, ef):
-        """Writes the Objective-Value for each scenario."""
+        """Writes the Objective-Value for each scenario, returns the file name."""
         results = []
         
         #start_date, end_date, period = self._extract_scenario_info(FILE_HEAT_DEMAND)
@@ -612,7 +876,7 @@ class Model:
         period = self.period
 
         # Determine prefix based on heat demand type
-        if self.USE_WEIGHTED_HEAT_DEMAND:
+        if self.config.use_weighted_heat_demand:
             prefix = 'weighted_'
         else:
             prefix = ''
@@ -624,14 +888,15 @@ class Model:
         # Creates a DataFrame from the results list
         df_results = pd.DataFrame(results)
 
-        if not os.path.exists(PATH_OUT_OBJECTIVES):
-            os.makedirs(PATH_OUT_OBJECTIVES)
+        if not os.path.exists(self.config.path_out_objectives):
+            os.makedirs(self.config.path_out_objectives)
 
         # Speichere den DataFrame als CSV-Datei
-        output_filename = f"{PATH_OUT_OBJECTIVES}s_{prefix}{start_date}_to_{end_date}_{period}{self.SPECIAL_CASE}_obj.csv"
+        output_filename = f"{self.config.path_out_objectives}s_{prefix}{start_date}_to_{end_date}_{period}{self.config.special_case}_obj.csv"
         df_results.to_csv(output_filename, index=False)
 
-        logging.info(f"Objective values written to file")
+        self.logger.info(f"Objective values written to file")
+        return output_filename
 
     def configure_logging(self):
         """Configures logging within the model class."""
@@ -642,18 +907,23 @@ class Model:
         self.period = period
 
         # Bestimmen Sie den Präfix basierend auf der Flagge
-        if self.USE_WEIGHTED_HEAT_DEMAND:
+        if self.config.use_weighted_heat_demand:
             prefix = 'weighted_'
         else:
             prefix = ''
 
         # Erstellen Sie das Log-Verzeichnis, falls es nicht existiert
-        if not os.path.exists(PATH_OUT_LOGS):
-            os.makedirs(PATH_OUT_LOGS)
+        if not os.path.exists(self.config.path_out_logs):
+            os.makedirs(self.config.path_out_logs)
 
         # Erstellen Sie den Log-Dateinamen
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.logfile_name = f"{PATH_OUT_LOGS}{prefix}logfile_{timestamp}_{start_date}_{period}{self.SPECIAL_CASE}.log"
+        self.logfile_name = f"{self.config.path_out_logs}{prefix}logfile_{timestamp}_{start_date}_{period}{self.config.special_case}.log"
+
+        # Eigener Logger je Lauf (logging.basicConfig wirkt nur einmal je Prozess)
+        self.logger = run_logger(f'model_s.{start_date}{self.config.special_case}', self.logfile_name)
 
-        # Konfigurieren Sie das Logging
-        logging.basicConfig(filename=self.logfile_name, level=logging.INFO)
\ No newline at end of file
+    def close_logging(self):
+        """Close the log file of the run."""
+        if self.logger is not None:
+            close_run_logger(self.logger)
\ No newline at end of file
@@ -0,0 +1,157 @@
+# Standard library imports
+import os
+import sys
+
+# Third-party imports
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyo
+from pyomo.opt import TerminationCondition
+from scipy import stats
+
+# Local imports
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.demands import load_forecast_errors, load_heat_demand, sample_heat_demand
+from common.plant import Plant
+from common.recourse_evaluator import SHORTFALL_COST, evaluate
+
+
+class SAAResult:
+    """Result of the sample average approximation of one day."""
+
+    def __init__(self, n_scenarios, plan, evaluation, lower_bound, upper_bound, history):
+        self.n_scenarios = n_scenarios
+        self.plan = plan
+        self.evaluation = evaluation
+        self.lower_bound = lower_bound
+        self.upper_bound = upper_bound
+        self.history = history
+
+    @property
+    def gap(self):
+        return self.upper_bound - self.lower_bound
+
+    @property
+    def relative_gap(self):
+        return self.gap / abs(self.upper_bound)
+
+
+def root_solution_to_plan(root_solution):
+    """Convert the root solution ('chp1.gas[1]': value) into arrays per variable."""
+    root_solution_dict = {}
+    for var_name, value_root in root_solution.items():
+        base_name, index = var_name.split('[')
+        root_solution_dict.setdefault(base_name, {})[int(index.strip(']'))] = value_root
+
+    return {
+        base_name: np.array([values[t] for t in sorted(values)])
+        for base_name, values in root_solution_dict.items()
+    }
+
+
+def solve_replication(model, heat_demand_scenarios, options):
+    """Solve the EF for the given demand paths.
+
+    Returns the lower bound of the EF objective (best bound of the MIP) and the
+    first-stage plan, or None if the EF could not be solved to optimality.
+    """
+    model.set_scenarios(heat_demand_scenarios)
+    scenario_names = model.scenario_names()
+    ef_instance = model.create_extensive_form(dict(options), scenario_names, {})
+    model.solve()
+
+    if model.results.solver.termination_condition != TerminationCondition.optimal:
+        return None
+
+    objective_value = pyo.value(ef_instance.ef.EF_Obj)
+    lower_bound = model.results.problem.lower_bound
+    if lower_bound is None or not np.isfinite(lower_bound):
+        lower_bound = objective_value
+
+    return lower_bound, root_solution_to_plan(ef_instance.get_root_solution())
+
+
+def run_saa(model, options, n_start=5, n_max=80, replications=3, n_evaluation=10000,
+            gap_target=0.01, level=0.95, seed=None, shortfall_cost=SHORTFALL_COST):
+    """Sample average approximation with adaptive scenario count.
+
+    Each iteration solves `replications` independent EFs with n scenarios
+    sampled from the forecast error model (truncated to mu +/- 3 sigma). Their
+    objectives give a lower bound (one-sided confidence bound of the mean). The
+    best candidate first stage is scored out of sample with
+    common.recourse_evaluator, which gives an upper bound. Both bounds belong
+    to the same problem: the sampled EFs get the recourse of the evaluator,
+    deviations beyond the storage power or below an empty storage are a
+    shortfall priced with shortfall_cost (model_s.Model.shortfall_cost), so
+    every sample is feasible. The scenario count is doubled until the relative
+    gap of the bounds falls below gap_target or n_max is reached. Afterwards
+    the model holds the EF of the chosen candidate for write_results.
+    """
+    forecast = load_heat_demand(model.heat_demand_file)
+    forecast = [forecast[t] for t in sorted(forecast)]
+    errors = load_forecast_errors()
+    # Bewertung mit den Preisen des Modells (stündlich mit use_price_series)
+    plant = Plant.from_run_config(model.config, range(1, len(forecast) + 1))
+    rng = np.random.default_rng(seed)
+    model.shortfall_cost = shortfall_cost
+
+    # Unabhängige Stichprobe für die Bewertung der Kandidaten (Upper Bound)
+    evaluation_samples = sample_heat_demand(forecast, n_evaluation, errors, seed=rng.integers(2**32))
+
+    n_scenarios = n_start
+    history = []
+
+    while True:
+        candidates = []
+        for replication in range(replications):
+            heat_demand_scenarios = sample_heat_demand(forecast, n_scenarios, errors, seed=rng.integers(2**32))
+            result = solve_replication(model, heat_demand_scenarios, options)
+            if result is None:
+                print(f"SAA: replication {replication + 1} with {n_scenarios} scenarios not solved, skipped.")
+                continue
+            lower, plan = result
+            # Gelöste EF des Kandidaten behalten, damit der gewählte nicht erneut gelöst werden muss
+            candidates.append((lower, plan, heat_demand_scenarios, model.ef_instance, model.results))
+
+        if not candidates:
+            raise RuntimeError(f"SAA: no replication with {n_scenarios} scenarios could be solved")
+
+        lower_values = np.array([candidate[0] for candidate in candidates])
+        if len(lower_values) > 1:
+            t_quantile = stats.t.ppf(level, len(lower_values) - 1)
+            lower_bound = lower_values.mean() - t_quantile * lower_values.std(ddof=1) / np.sqrt(len(lower_values))
+        else:
+            lower_bound = lower_values[0]
+
+        evaluations = [
+            evaluate(candidate[1], evaluation_samples, plant, penalty=shortfall_cost,
+                     extension_cost=model.config.extension_cost)
+            for candidate in candidates
+        ]
+        best = int(np.argmin([evaluation.mean for evaluation in evaluations]))
+        evaluation = evaluations[best]
+        upper_bound = evaluation.confidence_interval(2 * level - 1)[1]
+
+        result = SAAResult(n_scenarios, candidates[best][1], evaluation, lower_bound, upper_bound, None)
+        history.append({
+            'Scenarios': n_scenarios,
+            'Replications': len(candidates),
+            'LowerBound': lower_bound,
+            'UpperBound': upper_bound,
+            'Gap': result.gap,
+            'RelativeGap': result.relative_gap,
+            'InfeasibleShare': evaluation.infeasible.mean(),
+        })
+        print(f"SAA: {n_scenarios} scenarios, LB {lower_bound:.2f}, UB {upper_bound:.2f}, gap {result.relative_gap:.2%}")
+
+        if result.relative_gap <= gap_target or n_scenarios >= n_max:
+            break
+        n_scenarios = min(2 * n_scenarios, n_max)
+
+    result.history = pd.DataFrame(history)
+
+    # Modell auf den gewählten Kandidaten setzen (für write_results)
+    _, _, heat_demand_scenarios, model.ef_instance, model.results = candidates[best]
+    model.set_scenarios(heat_demand_scenarios)
+
+    return result